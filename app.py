@@ -1,28 +1,33 @@
 # app.py - 重構版本
 
 import gradio as gr
-from datetime import datetime
 
 # 導入配置
-from src.config import ui_config
+from src.config import settings, ui_config
 
 # 導入服務
-from src.services import auth, deposit_service, storage
+from src.services import auth, deposit_query, deposit_service, id_migration, reminders, transfer
 
 # 導入 UI 組件
-from src.ui import components
+from src.ui import components, queue_monitor, view_model
 
 # 導入工具函數
 from src.utils import date_utils
 
-# 初始化：載入用戶資料
-storage.load_users()
+# 事件並行群組：同一群組共用一個佇列與並行上限，群組之間互不佔用名額，
+# 大量頁面載入/重新整理不會讓兌換等寫入操作排在後面
+READ_EVENTS = {'concurrency_id': 'read', 'concurrency_limit': settings.CONCURRENCY_READ}
+MUTATION_EVENTS = {'concurrency_id': 'mutation', 'concurrency_limit': settings.CONCURRENCY_MUTATION}
+AUTH_EVENTS = {'concurrency_id': 'auth', 'concurrency_limit': settings.CONCURRENCY_AUTH}
+TRANSFER_EVENTS = {'concurrency_id': 'transfer', 'concurrency_limit': settings.CONCURRENCY_TRANSFER}
 
 # 建立 Gradio 介面
 with gr.Blocks(
     title="咖啡寄杯記錄",
     theme=gr.themes.Soft(primary_hue="orange", secondary_hue="amber"),
-    css=ui_config.CUSTOM_CSS
+    css=ui_config.CUSTOM_CSS,
+    # 定期清除 Gradio 快取中的上傳檔與匯出檔複本（頻率與保留時間，秒）
+    delete_cache=(settings.EXPORT_FILE_TTL_MINUTES * 60, settings.EXPORT_FILE_TTL_MINUTES * 60)
 ) as app:
     
     current_user = gr.State(None)
@@ -107,7 +112,7 @@ with gr.Blocks(
 
             # 日期選擇器
             with gr.Column(visible=True) as date_picker_column:
-                today = datetime.now().strftime('%Y-%m-%d')
+                today = date_utils.today().strftime('%Y-%m-%d')
                 
                 expiry_date_input = gr.DateTime(
                     label="📅 到期日",
@@ -176,6 +181,7 @@ with gr.Blocks(
                 )
                 calculated_date_display = gr.Markdown(value="", visible=True)
 
+            batch_add_checkbox = gr.Checkbox(label="一次新增多個品項（品項以逗號或頓號分隔，其他欄位共用）", value=False)
             add_status = gr.Markdown()
             add_btn = gr.Button("💾 儲存記錄", variant="primary", size="lg")
         
@@ -183,57 +189,120 @@ with gr.Blocks(
         
         # 兌換/刪除寄杯記錄
         with gr.Accordion("☕ 兌換 / 刪除寄杯記錄", open=True):
-            gr.Markdown("💡 **提示：** 在下方選擇記錄後，點擊「兌換一杯」或「刪除記錄」按鈕")
+            gr.Markdown("💡 **提示：** 在下方選擇一筆或多筆記錄後，點擊「兌換」或「刪除選取」按鈕；兌換時會先扣最早到期的記錄")
             action_status = gr.Markdown()
             deposit_selector = gr.Dropdown(
-                label="📋 選擇寄杯記錄",
+                label="📋 選擇寄杯記錄（可多選）",
                 choices=[],
-                value=None,
+                value=[],
+                multiselect=True,
                 interactive=True,
                 elem_classes=["dropdown-readonly"]
             )
+            redeem_cups_input = gr.Number(label="☕ 兌換杯數", value=1, minimum=1, precision=0)
             
             with gr.Row():
-                redeem_btn = gr.Button("☕ 兌換一杯", variant="primary", size="lg", scale=2)
-                delete_btn = gr.Button("🗑️ 刪除記錄", variant="stop", size="lg", scale=1)
+                redeem_btn = gr.Button("☕ 兌換", variant="primary", size="lg", scale=2)
+                delete_btn = gr.Button("🗑️ 刪除選取", variant="stop", size="lg", scale=1)
+                purge_btn = gr.Button("🧹 清除已過期", size="lg", scale=1)
                 refresh_btn = gr.Button("🔄 重新整理", size="lg", scale=1)
         
+        # 匯入/匯出
+        with gr.Accordion("📦 匯入 / 匯出", open=False):
+            gr.Markdown("💡 **欄位：** item、quantity、store、redeemMethod、expiryDate（YYYY-MM-DD），id 與 createdAt 可省略；匯入時 id 相同的記錄會被覆蓋")
+            transfer_format = gr.Radio(
+                label="檔案格式",
+                choices=[("CSV", transfer.FORMAT_CSV), ("NDJSON（每行一筆 JSON）", transfer.FORMAT_NDJSON)],
+                value=transfer.FORMAT_CSV
+            )
+            with gr.Row():
+                export_btn = gr.Button("📤 匯出我的記錄", scale=1)
+                export_all_btn = gr.Button("🗄️ 匯出所有使用者（管理員）", scale=1)
+            export_file = gr.File(label="下載匯出檔", interactive=False)
+            import_file = gr.File(label="選擇要匯入的檔案", file_types=[".csv", ".ndjson", ".jsonl", ".json"], type="filepath")
+            import_btn = gr.Button("📥 匯入", variant="primary")
+            transfer_status = gr.Markdown()
+        
         gr.Markdown("---")
         gr.Markdown("### 📋 所有寄杯記錄")
         
-        deposits_display = gr.HTML(value=components.get_deposits_display(None))
-        statistics_display = gr.HTML(value=components.get_statistics(None))
+        # 篩選條件
+        with gr.Row():
+            status_filter = gr.Dropdown(
+                label="到期狀態",
+                choices=ui_config.STATUS_FILTER_OPTIONS,
+                value=ui_config.FILTER_ALL,
+                scale=1
+            )
+            store_filter = gr.Dropdown(
+                label="商店",
+                choices=[("全部商店", ui_config.FILTER_ALL)] + ui_config.STORE_OPTIONS,
+                value=ui_config.FILTER_ALL,
+                scale=1
+            )
+            method_filter = gr.Dropdown(
+                label="兌換途徑",
+                choices=[("全部途徑", ui_config.FILTER_ALL)] + ui_config.REDEEM_METHODS,
+                value=ui_config.FILTER_ALL,
+                scale=1
+            )
+            page_size_input = gr.Dropdown(
+                label="每頁筆數",
+                choices=ui_config.PAGE_SIZE_OPTIONS,
+                value=settings.PAGE_SIZE,
+                scale=1
+            )
+        
+        current_page = gr.State(1)
+        view_etag = gr.State(None)  # 瀏覽器目前畫面的版本標記
+        deposits_display = gr.HTML(value=components.LOGIN_PROMPT_HTML)
+        
+        # 分頁控制
+        with gr.Row():
+            prev_page_btn = gr.Button("⬅️ 上一頁", size="sm", scale=1)
+            page_info = gr.Markdown()
+            next_page_btn = gr.Button("下一頁 ➡️", size="sm", scale=1)
+        
+        statistics_display = gr.HTML(value="")
+    
+    # 篩選/分頁條件與共用的畫面輸出
+    query_inputs = [status_filter, store_filter, method_filter, page_size_input, current_page, view_etag]
+    view_outputs = [deposits_display, statistics_display, deposit_selector, page_info, current_page, view_etag]
     
     # === 事件處理器 ===
 
     # 頁面載入時自動登入
-    def on_load(request: gr.Request):
+    def on_load(status, store, method, page_size, page, etag, request: gr.Request):
         user, login_vis, main_vis = auth.auto_login(request)
         if user:
             user_display = f"👤 使用者：**{user}**"
-            deposits = components.get_deposits_display(user)
-            stats = components.get_statistics(user)
-            choices = deposit_service.get_deposit_choices(user)
-            return user, login_vis, main_vis, user_display, deposits, stats, choices
-        return None, login_vis, main_vis, "", components.get_deposits_display(None), components.get_statistics(None), gr.update(choices=[])
+            query = deposit_query.make_query(status, store, method, page_size, page)
+            return user, login_vis, main_vis, user_display, *view_model.build_view(user, query, etag)
+        return None, login_vis, main_vis, "", *view_model.empty_view()
     
     app.load(
         fn=on_load,
-        outputs=[current_user, login_area, main_area, user_info, deposits_display, statistics_display, deposit_selector]
+        inputs=query_inputs,
+        outputs=[current_user, login_area, main_area, user_info] + view_outputs,
+        **READ_EVENTS
     )
     
     # 切換輸入方式
     expiry_input_method.change(
         fn=deposit_service.toggle_expiry_input,
         inputs=[expiry_input_method],
-        outputs=[date_picker_column, days_input_column]
+        outputs=[date_picker_column, days_input_column],
+        # 只切換顯示，不讀寫資料，不必排隊
+        queue=False
     )
     
     # 天數變更時顯示計算結果
     days_until_expiry.change(
         fn=date_utils.calculate_expiry_date_display,
         inputs=[days_until_expiry],
-        outputs=[calculated_date_display]
+        outputs=[calculated_date_display],
+        # 只計算顯示文字，不讀寫資料，不必排隊
+        queue=False
     )
     
     # 註冊事件
@@ -243,111 +312,212 @@ with gr.Blocks(
     register_btn.click(
         fn=register_and_update,
         inputs=[register_username, register_password, register_confirm],
-        outputs=[register_status, login_area, main_area]
+        outputs=[register_status, login_area, main_area],
+        **AUTH_EVENTS
     )
     register_confirm.submit(
         fn=register_and_update,
         inputs=[register_username, register_password, register_confirm],
-        outputs=[register_status, login_area, main_area]
+        outputs=[register_status, login_area, main_area],
+        **AUTH_EVENTS
     )
     
     # 登入事件
-    def login_and_update(username, password, remember_me, request: gr.Request):
+    def login_and_update(username, password, remember_me, status, store, method, page_size, page, etag, request: gr.Request):
         message, login_vis, main_vis, user = auth.login_user(username, password, remember_me, request)
         if user:
             user_display = f"👤 使用者：**{user}**"
-            deposits = components.get_deposits_display(user)
-            stats = components.get_statistics(user)
-            choices = deposit_service.get_deposit_choices(user)
-            return message, login_vis, main_vis, user, user_display, deposits, stats, choices
+            query = deposit_query.make_query(status, store, method, page_size, page)
+            return message, login_vis, main_vis, user, user_display, *view_model.build_view(user, query, etag)
         else:
-            return message, login_vis, main_vis, None, "", components.get_deposits_display(None), components.get_statistics(None), gr.update(choices=[])
+            return message, login_vis, main_vis, None, "", *view_model.empty_view()
     
     login_btn.click(
         fn=login_and_update,
-        inputs=[login_username, login_password, remember_me_checkbox],
-        outputs=[login_status, login_area, main_area, current_user, user_info, deposits_display, statistics_display, deposit_selector]
+        inputs=[login_username, login_password, remember_me_checkbox] + query_inputs,
+        outputs=[login_status, login_area, main_area, current_user, user_info] + view_outputs,
+        **AUTH_EVENTS
     )
     login_username.submit(
         fn=login_and_update,
-        inputs=[login_username, login_password, remember_me_checkbox],
-        outputs=[login_status, login_area, main_area, current_user, user_info, deposits_display, statistics_display, deposit_selector]
+        inputs=[login_username, login_password, remember_me_checkbox] + query_inputs,
+        outputs=[login_status, login_area, main_area, current_user, user_info] + view_outputs,
+        **AUTH_EVENTS
     )
     login_password.submit(
         fn=login_and_update,
-        inputs=[login_username, login_password, remember_me_checkbox],
-        outputs=[login_status, login_area, main_area, current_user, user_info, deposits_display, statistics_display, deposit_selector]
+        inputs=[login_username, login_password, remember_me_checkbox] + query_inputs,
+        outputs=[login_status, login_area, main_area, current_user, user_info] + view_outputs,
+        **AUTH_EVENTS
     )
     
     # 登出事件
     def logout_and_update(request: gr.Request):
         auth.logout_user(request)
-        return gr.update(visible=True), gr.update(visible=False), None, "", components.get_deposits_display(None), components.get_statistics(None), gr.update(choices=[])
+        return gr.update(visible=True), gr.update(visible=False), None, "", *view_model.empty_view()
     
     logout_btn.click(
         fn=logout_and_update,
-        outputs=[login_area, main_area, current_user, user_info, deposits_display, statistics_display, deposit_selector]
+        outputs=[login_area, main_area, current_user, user_info] + view_outputs,
+        **AUTH_EVENTS
     )
     
     # 新增寄杯事件
-    def add_and_refresh(user, item, quantity, store, redeem_method, expiry_method, expiry_date, days_until):
-        message, _, _, _ = deposit_service.add_deposit(user, item, quantity, store, redeem_method, expiry_method, expiry_date, days_until)
-        deposits = components.get_deposits_display(user)
-        stats = components.get_statistics(user)
-        choices = deposit_service.get_deposit_choices(user)
-        return message, deposits, stats, choices
+    def add_and_refresh(user, item, quantity, store, redeem_method, expiry_method, expiry_date, days_until, batch,
+                        status_q, store_q, method_q, page_size, page, etag):
+        add_fn = deposit_service.add_many if batch else deposit_service.add_deposit
+        message, _, _, _ = add_fn(user, item, quantity, store, redeem_method, expiry_method, expiry_date, days_until)
+        query = deposit_query.make_query(status_q, store_q, method_q, page_size, page)
+        return message, *view_model.build_view(user, query, etag)
     
     add_btn.click(
         fn=add_and_refresh,
-        inputs=[current_user, item_input, quantity_input, store_input, redeem_method_input, expiry_input_method, expiry_date_input, days_until_expiry],
-        outputs=[add_status, deposits_display, statistics_display, deposit_selector]
+        inputs=[current_user, item_input, quantity_input, store_input, redeem_method_input, expiry_input_method, expiry_date_input, days_until_expiry, batch_add_checkbox] + query_inputs,
+        outputs=[add_status] + view_outputs,
+        **MUTATION_EVENTS
     )
     item_input.submit(
         fn=add_and_refresh,
-        inputs=[current_user, item_input, quantity_input, store_input, redeem_method_input, expiry_input_method, expiry_date_input, days_until_expiry],
-        outputs=[add_status, deposits_display, statistics_display, deposit_selector]
+        inputs=[current_user, item_input, quantity_input, store_input, redeem_method_input, expiry_input_method, expiry_date_input, days_until_expiry, batch_add_checkbox] + query_inputs,
+        outputs=[add_status] + view_outputs,
+        **MUTATION_EVENTS
     )
     
     # 兌換事件
-    def redeem_and_refresh(user, deposit_id):
-        message, _, _, _ = deposit_service.redeem_one(user, deposit_id)
-        deposits = components.get_deposits_display(user)
-        stats = components.get_statistics(user)
-        choices = deposit_service.get_deposit_choices(user)
-        return message, deposits, stats, choices
+    def redeem_and_refresh(user, deposit_ids, cups, status, store, method, page_size, page, etag):
+        message, _, _, _ = deposit_service.redeem_many(user, deposit_ids, cups)
+        query = deposit_query.make_query(status, store, method, page_size, page)
+        return message, *view_model.build_view(user, query, etag)
     
     redeem_btn.click(
         fn=redeem_and_refresh,
-        inputs=[current_user, deposit_selector],
-        outputs=[action_status, deposits_display, statistics_display, deposit_selector]
+        inputs=[current_user, deposit_selector, redeem_cups_input] + query_inputs,
+        outputs=[action_status] + view_outputs,
+        **MUTATION_EVENTS
     )
     
     # 刪除事件
-    def delete_and_refresh(user, deposit_id):
-        message, _, _, _ = deposit_service.delete_deposit(user, deposit_id)
-        deposits = components.get_deposits_display(user)
-        stats = components.get_statistics(user)
-        choices = deposit_service.get_deposit_choices(user)
-        return message, deposits, stats, choices
+    def delete_and_refresh(user, deposit_ids, status, store, method, page_size, page, etag):
+        message, _, _, _ = deposit_service.delete_many(user, deposit_ids)
+        query = deposit_query.make_query(status, store, method, page_size, page)
+        return message, *view_model.build_view(user, query, etag)
     
     delete_btn.click(
         fn=delete_and_refresh,
-        inputs=[current_user, deposit_selector],
-        outputs=[action_status, deposits_display, statistics_display, deposit_selector]
+        inputs=[current_user, deposit_selector] + query_inputs,
+        outputs=[action_status] + view_outputs,
+        **MUTATION_EVENTS
+    )
+    
+    # 清除已過期事件
+    def purge_and_refresh(user, status, store, method, page_size, page, etag):
+        message, _, _, _ = deposit_service.delete_expired(user)
+        query = deposit_query.make_query(status, store, method, page_size, page)
+        return message, *view_model.build_view(user, query, etag)
+    
+    purge_btn.click(
+        fn=purge_and_refresh,
+        inputs=[current_user] + query_inputs,
+        outputs=[action_status] + view_outputs,
+        **MUTATION_EVENTS
+    )
+    
+    # 匯出事件
+    def export_handler(user, fmt):
+        if not user:
+            return "❌ 請先登入", None
+        path = transfer.export_to_file(transfer.export_user(user, fmt), fmt, prefix=user)
+        return "✅ 匯出完成", path
+    
+    export_btn.click(
+        fn=export_handler,
+        inputs=[current_user, transfer_format],
+        outputs=[transfer_status, export_file],
+        **TRANSFER_EVENTS
+    )
+    
+    def export_all_handler(user, fmt):
+        if not transfer.is_admin(user):
+            return "❌ 只有管理員可以匯出所有使用者的資料", None
+        path = transfer.export_to_file(transfer.export_all(fmt), fmt, prefix='all-users')
+        return "✅ 匯出完成", path
+    
+    export_all_btn.click(
+        fn=export_all_handler,
+        inputs=[current_user, transfer_format],
+        outputs=[transfer_status, export_file],
+        **TRANSFER_EVENTS
+    )
+    
+    # 匯入事件
+    def import_and_refresh(user, path, status, store, method, page_size, page, etag):
+        message, _ = transfer.import_deposits(user, path)
+        query = deposit_query.make_query(status, store, method, page_size, page)
+        return message, *view_model.build_view(user, query, etag)
+    
+    import_btn.click(
+        fn=import_and_refresh,
+        inputs=[current_user, import_file] + query_inputs,
+        outputs=[transfer_status] + view_outputs,
+        **TRANSFER_EVENTS
     )
     
     # 重新整理事件
-    def refresh_display_handler(user):
-        deposits = components.get_deposits_display(user)
-        stats = components.get_statistics(user)
-        choices = deposit_service.get_deposit_choices(user)
-        return deposits, stats, choices
+    def refresh_display_handler(user, status, store, method, page_size, page, etag):
+        return view_model.build_view(user, deposit_query.make_query(status, store, method, page_size, page), etag)
     
     refresh_btn.click(
         fn=refresh_display_handler,
-        inputs=[current_user],
-        outputs=[deposits_display, statistics_display, deposit_selector]
+        inputs=[current_user] + query_inputs,
+        outputs=view_outputs,
+        **READ_EVENTS
     )
+    
+    # 篩選條件變更時回到第一頁
+    def filter_changed(user, status, store, method, page_size, etag):
+        return view_model.build_view(user, deposit_query.make_query(status, store, method, page_size, 1), etag)
+    
+    for filter_input in (status_filter, store_filter, method_filter, page_size_input):
+        filter_input.change(
+            fn=filter_changed,
+            inputs=[current_user, status_filter, store_filter, method_filter, page_size_input, view_etag],
+            outputs=view_outputs,
+            **READ_EVENTS
+        )
+    
+    # 換頁事件
+    def prev_page(user, status, store, method, page_size, page, etag):
+        return view_model.build_view(user, deposit_query.make_query(status, store, method, page_size, page - 1), etag)
+    
+    def next_page(user, status, store, method, page_size, page, etag):
+        return view_model.build_view(user, deposit_query.make_query(status, store, method, page_size, page + 1), etag)
+    
+    prev_page_btn.click(
+        fn=prev_page,
+        inputs=[current_user] + query_inputs,
+        outputs=view_outputs,
+        **READ_EVENTS
+    )
+    next_page_btn.click(
+        fn=next_page,
+        inputs=[current_user] + query_inputs,
+        outputs=view_outputs,
+        **READ_EVENTS
+    )
+
+app.queue(max_size=settings.QUEUE_MAX_SIZE)
+queue_monitor.monitor.attach(app)
+
+# 背景工作：舊版 id 遷移（完成後不再執行）與每日到期提醒，依設定決定是否啟動
+id_migration.start()
+reminders.start()
 
 if __name__ == "__main__":
-    app.launch()
\ No newline at end of file
+    if settings.API_ENABLED:
+        # JSON API 與介面共用同一個伺服器與連接埠
+        import uvicorn
+        from src.api import create_app
+        uvicorn.run(create_app(app, metrics={'queue': queue_monitor.monitor.metrics}),
+                    host=settings.SERVER_NAME, port=settings.SERVER_PORT)
+    else:
+        app.launch()
\ No newline at end of file
@@ -0,0 +1,145 @@
+# benchmarks/bench_api.py
+# JSON API 與 Gradio 介面路徑（佇列 + HTML）的吞吐量比較：同一位使用者反覆讀取寄杯列表
+#   python benchmarks/bench_api.py [並行數，預設 8] [每個執行緒的請求數，預設 50]
+
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 在暫存資料夾中執行並關閉遠端同步與提醒，避免碰到正式資料
+os.environ.setdefault('HYDRATION_MODE', 'off')
+os.environ.setdefault('DATA_REMOTE', tempfile.mkdtemp())
+os.environ.setdefault('REMINDER_SINKS', '')
+os.environ.setdefault('ID_MIGRATION', '0')
+os.chdir(tempfile.mkdtemp())
+
+import httpx
+import uvicorn
+
+import app as ui
+from src.api import create_app
+from src.config import settings, ui_config
+from src.services import auth, deposit_service, user_store
+
+USERNAME = 'bench'
+PASSWORD = 'password'
+DEPOSITS = 200
+
+
+def seed():
+    user_store.users.add(USERNAME, {'password': auth.hash_password(PASSWORD), 'created_at': '2025-01-01T00:00:00'})
+    items = [f'拿鐵 {i}' for i in range(DEPOSITS)]
+    deposit_service.add_many(USERNAME, items, 3, ui_config.STORE_OPTIONS[0], ui_config.REDEEM_METHODS[0],
+                             "輸入天數", None, 30)
+
+
+def start_server():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(ui.app), host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f'http://127.0.0.1:{port}'
+
+
+def fn_index(name):
+    # 同一個函式綁定多個事件時取第一個
+    return next(index for index, fn in ui.app.fns.items() if fn.name == name)
+
+
+class GradioSession:
+    """以瀏覽器相同的佇列協定（/queue/join + /queue/data 串流）呼叫介面事件；State 由伺服器端依 session 保存"""
+
+    def __init__(self, url):
+        self.http = httpx.Client(base_url=url, timeout=60)
+        self.session_hash = uuid.uuid4().hex
+
+    def call(self, name, data):
+        body = {'data': data, 'fn_index': fn_index(name), 'session_hash': self.session_hash,
+                'event_data': None, 'trigger_id': None}
+        self.http.post('/queue/join', json=body).raise_for_status()
+        with self.http.stream('GET', '/queue/data', params={'session_hash': self.session_hash}) as response:
+            for line in response.iter_lines():
+                if not line.startswith('data:'):
+                    continue
+                message = json.loads(line[5:])
+                if message.get('msg') == 'process_completed':
+                    if not message.get('success'):
+                        raise RuntimeError(message)
+                    return message['output']['data']
+        raise RuntimeError(f"{name} 沒有完成")
+
+
+def run(name, make_worker, threads, requests):
+    """每個執行緒先以 make_worker() 建立自己的連線，再連續送出 requests 次請求"""
+    workers = [make_worker() for _ in range(threads)]
+    latencies = []
+    lock = threading.Lock()
+
+    def loop(call):
+        mine = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            call()
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=loop, args=(w,)) for w in workers]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"{name:<12} {len(latencies) / elapsed:>10.1f} {p50:>10.1f} {p95:>10.1f}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    seed()
+    server, url = start_server()
+
+    def api_worker():
+        http = httpx.Client(base_url=url + settings.API_PREFIX)
+        token = http.post('/login', json={'username': USERNAME, 'password': PASSWORD}).json()['token']
+        http.headers['Authorization'] = f'Bearer {token}'
+
+        def call():
+            response = http.get('/deposits', params={'page_size': settings.PAGE_SIZE})
+            response.raise_for_status()
+        return call
+
+    def ui_worker():
+        # 每個執行緒是一個獨立的 Gradio session，登入後 current_user 存在該 session 的 State；
+        # State 輸入由伺服器端的值取代，這裡傳 None
+        session = GradioSession(url)
+        filters = [ui_config.FILTER_ALL] * 3 + [settings.PAGE_SIZE, 1, None]
+        session.call('login_and_update', [USERNAME, PASSWORD, False] + filters)
+
+        def call():
+            session.call('refresh_display_handler', [None] + filters)
+        return call
+
+    print(f"並行 {threads}，每執行緒 {requests} 次，{DEPOSITS} 筆寄杯")
+    print(f"{'路徑':<12} {'請求/秒':>10} {'p50(ms)':>10} {'p95(ms)':>10}")
+    run('JSON API', api_worker, threads, requests)
+    run('Gradio UI', ui_worker, threads, requests)
+    server.should_exit = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_formats.py
+# 比較寄杯檔各格式的讀寫時間與檔案大小
+#   python benchmarks/bench_formats.py
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import ui_config
+from src.services.backends.formats import FORMATS, encode_deposits, load_deposits_text
+
+SIZES = [10, 1_000, 50_000]
+REPEAT = 5
+
+
+def make_deposits(n):
+    random.seed(n)
+    base = datetime(2025, 1, 1)
+    deposits = []
+    for i in range(n):
+        created = base + timedelta(minutes=i)
+        deposits.append({
+            'id': str(int(created.timestamp() * 1000)),
+            'item': random.choice(['美式咖啡', '拿鐵', '卡布奇諾', '焦糖瑪奇朵']),
+            'quantity': random.randint(1, 10),
+            'store': random.choice(ui_config.STORE_OPTIONS),
+            'redeemMethod': random.choice(ui_config.REDEEM_METHODS),
+            'expiryDate': (created + timedelta(days=random.randint(1, 365))).strftime('%Y-%m-%d'),
+            'createdAt': created.isoformat()
+        })
+    return deposits
+
+
+def best_of(fn):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    print(f"{'筆數':>8} {'格式':>10} {'大小(bytes)':>12} {'寫入(ms)':>10} {'讀取(ms)':>10}")
+    for size in SIZES:
+        deposits = make_deposits(size)
+        for fmt in FORMATS:
+            path = os.path.join(directory, f'{size}.{fmt}')
+
+            def save():
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(encode_deposits(deposits, fmt))
+
+            def load():
+                with open(path, 'r', encoding='utf-8') as f:
+                    return load_deposits_text(f.read())[0]
+
+            save_time = best_of(save)
+            load_time = best_of(load)
+            assert load() == deposits
+            print(f"{size:>8} {fmt:>10} {os.path.getsize(path):>12} "
+                  f"{save_time * 1000:>10.2f} {load_time * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
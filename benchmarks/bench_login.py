@@ -0,0 +1,86 @@
+# benchmarks/bench_login.py
+# 登入查詢延遲 vs 帳號總數：舊做法（每次載入整個 users.json）與分片 + 記憶體索引
+#   python benchmarks/bench_login.py [最大帳號數，預設 1000000]
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# user_store 會載入 storage；在暫存資料夾中執行並關閉遠端同步，避免碰到正式資料
+os.environ.setdefault('HYDRATION_MODE', 'off')
+os.environ.setdefault('DATA_REMOTE', tempfile.mkdtemp())
+os.chdir(tempfile.mkdtemp())
+
+from src.services.backends import JsonBackend
+from src.services.user_store import UserRepository
+
+LOGINS = 2_000
+LEGACY_LIMIT = 100_000  # 舊做法在更大規模時每次登入要好幾秒，略過
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def make_backend(directory, sharded):
+    return JsonBackend(
+        users_file=os.path.join(directory, 'users.json'),
+        sessions_file=os.path.join(directory, 'sessions.json'),
+        user_data_dir=os.path.join(directory, 'user_records'),
+        sync_lock=threading.Lock(),
+        journal_threshold=None,
+        durability='none',
+        users_dir=os.path.join(directory, 'users') if sharded else None
+    )
+
+
+def per_login_us(login, count, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        login(f'user{(i * 7919) % count}', 'password')
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    max_users = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [n for n in (100, 10_000, 100_000, 1_000_000) if n <= max_users]
+    hashed = hash_password('password')
+    print(f"{'帳號數':>10} {'舊做法(us/次)':>14} {'索引(us/次)':>12} {'單點查詢(us/次)':>16} {'建索引(s)':>10}")
+    for count in sizes:
+        users = {f'user{i}': {'password': hashed, 'created_at': '2025-01-01T00:00:00'} for i in range(count)}
+
+        legacy_us = float('nan')
+        if count <= LEGACY_LIMIT:
+            legacy = make_backend(tempfile.mkdtemp(), sharded=False)
+            legacy.save_users(users)
+
+            def legacy_login(username, password):
+                all_users = legacy.load_users()
+                return username in all_users and all_users[username]['password'] == hash_password(password)
+
+            legacy_us = per_login_us(legacy_login, count, max(3, min(LOGINS, 200_000 // count)))
+
+        sharded = make_backend(tempfile.mkdtemp(), sharded=True)
+        sharded.save_users(users)
+        del users
+        repo = UserRepository(sharded.load_users, sharded.get_user, sharded.add_user)
+
+        def login(username, password):
+            info = repo.get(username)
+            return info is not None and info['password'] == hash_password(password)
+
+        point_us = per_login_us(login, count, min(LOGINS, 500))
+        start = time.perf_counter()
+        repo.build_index()
+        build_s = time.perf_counter() - start
+        index_us = per_login_us(login, count, LOGINS)
+        print(f"{count:>10} {legacy_us:>14.1f} {index_us:>12.1f} {point_us:>16.1f} {build_s:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
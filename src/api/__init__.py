@@ -0,0 +1,24 @@
+# src/api/__init__.py
+
+from fastapi import FastAPI
+import gradio as gr
+from .routes import register_metrics, router
+
+
+def create_app(blocks, metrics=None):
+    """建立同時提供 JSON API 與 Gradio 介面的 FastAPI app（介面掛在根路徑）
+
+    metrics 為 /metrics 額外回報的 {名稱: 統計函式}，例如介面佇列的監看。
+    """
+    for name, metrics_fn in (metrics or {}).items():
+        register_metrics(name, metrics_fn)
+    api = FastAPI(title="咖啡寄杯記錄 API")
+    api.include_router(router)
+    return gr.mount_gradio_app(api, blocks, path='/')
+
+
+__all__ = [
+    'router',
+    'register_metrics',
+    'create_app'
+]
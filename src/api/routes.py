@@ -0,0 +1,159 @@
+# src/api/routes.py
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from ..config import settings
+from ..services import auth, deposit_query, deposit_service, stats_store, storage, transfer
+
+# 不經過 Gradio 佇列、不產生 HTML 的 JSON API，直接呼叫 deposit_service。
+# 以 POST /login 取得 Token，之後在 Authorization: Bearer <token> 帶上；Token 存在既有的 Session 儲存。
+
+router = APIRouter(prefix=settings.API_PREFIX)
+
+# deposit_service 的錯誤種類對應的 HTTP 狀態碼
+_ERROR_STATUS = {
+    deposit_service.ERROR_UNAUTHORIZED: 401,
+    deposit_service.ERROR_INVALID: 400,
+    deposit_service.ERROR_NOT_FOUND: 404,
+    deposit_service.ERROR_CONFLICT: 409,
+    deposit_service.ERROR_SAVE_FAILED: 500
+}
+
+# /metrics 額外回報的統計來源：名稱 -> 無參數函式（例如介面佇列的監看，由 app 啟動時註冊）
+_metrics_sources = {}
+
+def register_metrics(name, metrics_fn):
+    """註冊 /metrics 回應中的一個欄位；API 不直接依賴介面層的模組"""
+    _metrics_sources[name] = metrics_fn
+
+
+class LoginBody(BaseModel):
+    username: str
+    password: str
+
+
+class AddBody(BaseModel):
+    items: List[str]
+    quantity: int = 1
+    store: str
+    redeemMethod: str
+    expiryDate: Optional[str] = None  # 與 days 擇一；兩者都有時以 expiryDate 為準
+    days: Optional[int] = None
+
+
+class RedeemBody(BaseModel):
+    cups: int = 1
+
+
+class BatchRedeemBody(BaseModel):
+    ids: List[str]
+    cups: int = 1
+
+
+class BatchDeleteBody(BaseModel):
+    ids: List[str]
+
+
+def current_user(authorization: Optional[str] = Header(None)):
+    """由 Authorization: Bearer <token> 取得使用者名稱；只接受 /login 發出的 API Token，無效或過期時回應 401"""
+    scheme, _, token = (authorization or '').partition(' ')
+    username = auth.validate_api_token(token.strip()) if scheme.lower() == 'bearer' and token.strip() else None
+    if not username:
+        raise HTTPException(status_code=401, detail="❌ 請先登入", headers={'WWW-Authenticate': 'Bearer'})
+    return username
+
+def _result(operation, *args):
+    """呼叫 deposit_service 的操作並轉為 JSON 回應；DepositError 依錯誤種類轉為對應的 HTTP 錯誤"""
+    try:
+        message = operation.strict(*args)
+    except deposit_service.DepositError as e:
+        raise HTTPException(status_code=_ERROR_STATUS.get(e.code, 400), detail=e.message)
+    return {'ok': True, 'message': message}
+
+# === 登入 ===
+
+@router.post('/login')
+def login(body: LoginBody):
+    error = auth.check_credentials(body.username, body.password)
+    if error:
+        raise HTTPException(status_code=401, detail=error)
+    return {
+        'token': auth.create_api_token(body.username),
+        'username': body.username,
+        'expiresInDays': settings.SESSION_TTL_DAYS
+    }
+
+@router.post('/logout')
+def logout(authorization: Optional[str] = Header(None), username: str = Depends(current_user)):
+    auth.revoke_api_token(authorization.partition(' ')[2].strip())
+    return {'ok': True}
+
+# === 查詢 ===
+
+@router.get('/deposits')
+def list_deposits(status: Optional[str] = None, store: Optional[str] = None, method: Optional[str] = None,
+                  page: int = 1, page_size: Optional[int] = None, username: str = Depends(current_user)):
+    """依到期日排序的寄杯記錄，可依到期狀態、商店、兌換途徑篩選並分頁（條件與介面相同）"""
+    query = deposit_query.make_query(status, store, method, page_size, page)
+    result = deposit_query.query_deposits(username, query)
+    return {
+        'deposits': [
+            {**deposit, 'status': str(deposit_status)}
+            for deposit, deposit_status in zip(result.page_deposits, result.page_statuses)
+        ],
+        'page': result.page,
+        'pages': result.pages,
+        'total': result.total,
+        'revision': result.revision
+    }
+
+@router.get('/statistics')
+def statistics(username: str = Depends(current_user)):
+    return stats_store.stats.get(username)
+
+@router.get('/metrics')
+def metrics(username: str = Depends(current_user)):
+    """儲存層的統計，以及註冊的其他統計（例如介面佇列各並行群組的深度與等待時間；管理員用）"""
+    if not transfer.is_admin(username):
+        raise HTTPException(status_code=403, detail="❌ 只有管理員可以查看")
+    return {
+        **{name: metrics_fn() for name, metrics_fn in _metrics_sources.items()},
+        'mutations': storage.get_mutation_metrics(),
+        'depositCache': storage.get_deposit_cache_stats(),
+        'sync': storage.get_sync_metrics()
+    }
+
+# === 異動 ===
+
+@router.post('/deposits')
+def add_deposits(body: AddBody, username: str = Depends(current_user)):
+    expiry_method = "選擇日期" if body.expiryDate else "輸入天數"
+    return _result(
+        deposit_service.add_many, username, body.items, body.quantity, body.store, body.redeemMethod,
+        expiry_method, body.expiryDate, body.days
+    )
+
+# 批次路徑需先於 /deposits/{deposit_id} 註冊，否則 batch 會被當成 id
+@router.post('/deposits/batch/redeem')
+def batch_redeem(body: BatchRedeemBody, username: str = Depends(current_user)):
+    return _result(deposit_service.redeem_many, username, body.ids, body.cups)
+
+@router.post('/deposits/batch/delete')
+def batch_delete(body: BatchDeleteBody, username: str = Depends(current_user)):
+    return _result(deposit_service.delete_many, username, body.ids)
+
+@router.post('/deposits/batch/delete-expired')
+def batch_delete_expired(username: str = Depends(current_user)):
+    return _result(deposit_service.delete_expired, username)
+
+@router.post('/deposits/{deposit_id}/redeem')
+def redeem(deposit_id: str, body: Optional[RedeemBody] = None, username: str = Depends(current_user)):
+    cups = body.cups if body is not None else 1
+    if cups == 1:
+        return _result(deposit_service.redeem_one, username, deposit_id)
+    return _result(deposit_service.redeem_many, username, [deposit_id], cups)
+
+@router.delete('/deposits/{deposit_id}')
+def delete(deposit_id: str, username: str = Depends(current_user)):
+    return _result(deposit_service.delete_deposit, username, deposit_id)
@@ -4,15 +4,59 @@ from .settings import (
     HF_TOKEN,
     HF_REPO,
     DATA_REPO,
+    HYDRATION_MODE,
+    DATA_REMOTE,
+    SYNC_INTERVAL_MINUTES,
     DATA_DIR,
     USERS_FILE,
+    USERS_DIR,
+    USER_SHARDS,
     SESSIONS_FILE,
-    USER_DATA_DIR
+    MIGRATIONS_FILE,
+    USER_DATA_DIR,
+    USER_STATS_DIR,
+    STORAGE_BACKEND,
+    SQLITE_PATH,
+    DEPOSIT_FORMAT,
+    DEPOSIT_CACHE_SIZE,
+    DEPOSIT_JOURNAL,
+    JOURNAL_COMPACT_BYTES,
+    STORAGE_LOCK_STRIPES,
+    MUTATION_RETRIES,
+    CARD_CACHE_USERS,
+    PAGE_SIZE,
+    STATS_VERIFY,
+    TRANSFER_CHUNK_ROWS,
+    EXPORT_FILE_TTL_MINUTES,
+    ID_MIGRATION,
+    ADMIN_USERS,
+    STORAGE_DURABILITY,
+    GROUP_COMMIT_WINDOW_MS,
+    SESSION_TTL_DAYS,
+    SESSION_FLUSH_SECONDS,
+    APP_TIMEZONE,
+    REMINDER_SINKS,
+    REMINDER_FILE,
+    REMINDER_LEAD_DAYS,
+    REMINDER_CHECK_MINUTES,
+    CONCURRENCY_READ,
+    CONCURRENCY_MUTATION,
+    CONCURRENCY_AUTH,
+    CONCURRENCY_TRANSFER,
+    QUEUE_MAX_SIZE,
+    QUEUE_METRICS_SECONDS,
+    API_ENABLED,
+    API_PREFIX,
+    SERVER_NAME,
+    SERVER_PORT
 )
 
 from .ui_config import (
     STORE_OPTIONS,
     REDEEM_METHODS,
+    FILTER_ALL,
+    STATUS_FILTER_OPTIONS,
+    PAGE_SIZE_OPTIONS,
     REDEEM_LINKS,
     CUSTOM_CSS,
     JS_INIT_SCRIPT
@@ -22,12 +66,56 @@ __all__ = [
     'HF_TOKEN',
     'HF_REPO',
     'DATA_REPO',
+    'HYDRATION_MODE',
+    'DATA_REMOTE',
+    'SYNC_INTERVAL_MINUTES',
     'DATA_DIR',
     'USERS_FILE',
+    'USERS_DIR',
+    'USER_SHARDS',
     'SESSIONS_FILE',
+    'MIGRATIONS_FILE',
     'USER_DATA_DIR',
+    'USER_STATS_DIR',
+    'STORAGE_BACKEND',
+    'SQLITE_PATH',
+    'DEPOSIT_FORMAT',
+    'DEPOSIT_CACHE_SIZE',
+    'DEPOSIT_JOURNAL',
+    'JOURNAL_COMPACT_BYTES',
+    'STORAGE_LOCK_STRIPES',
+    'MUTATION_RETRIES',
+    'CARD_CACHE_USERS',
+    'PAGE_SIZE',
+    'STATS_VERIFY',
+    'TRANSFER_CHUNK_ROWS',
+    'EXPORT_FILE_TTL_MINUTES',
+    'ID_MIGRATION',
+    'ADMIN_USERS',
+    'STORAGE_DURABILITY',
+    'GROUP_COMMIT_WINDOW_MS',
+    'SESSION_TTL_DAYS',
+    'SESSION_FLUSH_SECONDS',
+    'APP_TIMEZONE',
+    'REMINDER_SINKS',
+    'REMINDER_FILE',
+    'REMINDER_LEAD_DAYS',
+    'REMINDER_CHECK_MINUTES',
+    'CONCURRENCY_READ',
+    'CONCURRENCY_MUTATION',
+    'CONCURRENCY_AUTH',
+    'CONCURRENCY_TRANSFER',
+    'QUEUE_MAX_SIZE',
+    'QUEUE_METRICS_SECONDS',
+    'API_ENABLED',
+    'API_PREFIX',
+    'SERVER_NAME',
+    'SERVER_PORT',
     'STORE_OPTIONS',
     'REDEEM_METHODS',
+    'FILTER_ALL',
+    'STATUS_FILTER_OPTIONS',
+    'PAGE_SIZE_OPTIONS',
     'REDEEM_LINKS',
     'CUSTOM_CSS',
     'JS_INIT_SCRIPT'
@@ -8,9 +8,70 @@ HF_REPO = os.getenv("SPACE_ID")  # 這是程式碼所在的 Space
 # 資料儲存專用的 Dataset ID
 DATA_REPO = "ShuanWu/coffee-data"
 
+# 啟動同步模式：'lazy'（背景同步、按需下載）、'eager'（啟動時同步完成）、'off'
+HYDRATION_MODE = os.getenv('HYDRATION_MODE', 'lazy')
+# 以本機資料夾取代 Dataset 作為遠端（開發/測試用），未設定時使用 DATA_REPO
+DATA_REMOTE = os.getenv('DATA_REMOTE')
+SYNC_INTERVAL_MINUTES = float(os.getenv('SYNC_INTERVAL_MINUTES', '1'))  # 背景上傳間隔
+
 # 檔案路徑設定
 # 統一將所有資料放在 data 資料夾下，方便同步
-DATA_DIR = 'data' 
-USERS_FILE = os.path.join(DATA_DIR, 'users.json')
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+USERS_FILE = os.path.join(DATA_DIR, 'users.json')  # 舊版單一帳號檔，啟動後搬移到 USERS_DIR 分片
+USERS_DIR = os.path.join(DATA_DIR, 'users')  # 帳號分片資料夾
+USER_SHARDS = int(os.getenv('USER_SHARDS', '256'))  # 帳號分片數量（已有資料後請勿更改）
 SESSIONS_FILE = os.path.join(DATA_DIR, 'sessions.json')
-USER_DATA_DIR = os.path.join(DATA_DIR, 'user_records')  # 用戶個別資料夾
\ No newline at end of file
+MIGRATIONS_FILE = os.path.join(DATA_DIR, 'migrations.json')  # 已完成的一次性資料遷移
+USER_DATA_DIR = os.path.join(DATA_DIR, 'user_records')  # 用戶個別資料夾
+USER_STATS_DIR = os.path.join(DATA_DIR, 'user_stats')  # 每位使用者的統計彙總
+
+# 儲存後端：'json'（每位使用者一個 JSON 檔）或 'sqlite'
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+SQLITE_PATH = os.path.join(DATA_DIR, 'coffee.db')
+# 寄杯檔格式：'columnar'（緊湊欄式，預設）或 'json'（舊版縮排 JSON）；舊檔於下次寫入時轉換
+DEPOSIT_FORMAT = os.getenv('DEPOSIT_FORMAT', 'columnar')
+
+# 到期日以此時區的日期計算（伺服器為 UTC，使用者在台灣）
+APP_TIMEZONE = os.getenv('APP_TIMEZONE', 'Asia/Taipei')
+
+# 效能設定
+DEPOSIT_CACHE_SIZE = int(os.getenv('DEPOSIT_CACHE_SIZE', '256'))  # 寄杯快取最多保留的使用者數
+DEPOSIT_JOURNAL = os.getenv('DEPOSIT_JOURNAL', '1') == '1'  # 寄杯異動改寫入 append-only 日誌
+JOURNAL_COMPACT_BYTES = int(os.getenv('JOURNAL_COMPACT_BYTES', str(64 * 1024)))  # 日誌超過此大小即壓縮
+STORAGE_LOCK_STRIPES = int(os.getenv('STORAGE_LOCK_STRIPES', '64'))  # 本地寫入分段鎖數量
+MUTATION_RETRIES = int(os.getenv('MUTATION_RETRIES', '10'))  # 寄杯異動遇到版本衝突時的重試次數
+CARD_CACHE_USERS = int(os.getenv('CARD_CACHE_USERS', '256'))  # 卡片 HTML 快取最多保留的使用者數
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', '20'))  # 寄杯列表與下拉選單每頁筆數
+STATS_VERIFY = os.getenv('STATS_VERIFY', '0') == '1'  # 每次取得統計時以完整重算交叉比對（除錯用）
+TRANSFER_CHUNK_ROWS = int(os.getenv('TRANSFER_CHUNK_ROWS', '10000'))  # 匯入/匯出每塊處理的筆數
+EXPORT_FILE_TTL_MINUTES = int(os.getenv('EXPORT_FILE_TTL_MINUTES', '60'))  # 匯出檔（含 Gradio 快取中的複本）保留時間
+ID_MIGRATION = os.getenv('ID_MIGRATION', '1') == '1'  # 啟動時在背景將舊版時間戳 id 轉為 ULID 並修正重複 id
+# 寫入落地保證：'none'（不 fsync）、'fsync'（每次寫入 fsync）、'group'（群組提交，合併短時間內的 fsync）
+STORAGE_DURABILITY = os.getenv('STORAGE_DURABILITY', 'fsync')
+GROUP_COMMIT_WINDOW_MS = float(os.getenv('GROUP_COMMIT_WINDOW_MS', '5'))
+SESSION_TTL_DAYS = int(os.getenv('SESSION_TTL_DAYS', '30'))  # 記住我的有效天數
+SESSION_FLUSH_SECONDS = float(os.getenv('SESSION_FLUSH_SECONDS', '2'))  # Session 異動寫回間隔
+
+# 到期提醒：輸出方式（逗號分隔：log、file；留空則停用）
+REMINDER_SINKS = os.getenv('REMINDER_SINKS', 'log')
+REMINDER_FILE = os.getenv('REMINDER_FILE', 'reminders.ndjson')  # file 輸出的路徑（不放在 data 下，避免上傳）
+REMINDER_LEAD_DAYS = int(os.getenv('REMINDER_LEAD_DAYS', '1'))  # 提醒今天起幾天內到期的記錄
+REMINDER_CHECK_MINUTES = float(os.getenv('REMINDER_CHECK_MINUTES', '10'))  # 檢查是否換日的間隔
+
+# 介面事件的並行群組：讀取（載入/重新整理/篩選/換頁）、寫入（新增/兌換/刪除）、登入註冊、匯入匯出
+# 各自排隊、各自有並行上限；總和需小於 Gradio 的 worker 數（預設 40），群組之間才不會互相搶佔
+CONCURRENCY_READ = int(os.getenv('CONCURRENCY_READ', '8'))
+CONCURRENCY_MUTATION = int(os.getenv('CONCURRENCY_MUTATION', '4'))
+CONCURRENCY_AUTH = int(os.getenv('CONCURRENCY_AUTH', '2'))
+CONCURRENCY_TRANSFER = int(os.getenv('CONCURRENCY_TRANSFER', '1'))
+QUEUE_MAX_SIZE = int(os.getenv('QUEUE_MAX_SIZE', '0')) or None  # 佇列最多等待的事件數，0 為不限制
+QUEUE_METRICS_SECONDS = float(os.getenv('QUEUE_METRICS_SECONDS', '1'))  # 佇列深度/等待時間的取樣間隔
+
+# JSON API：與 Gradio 介面掛在同一個伺服器（API_ENABLED=0 時改用 Gradio 自帶的伺服器啟動）
+API_ENABLED = os.getenv('API_ENABLED', '1') == '1'
+API_PREFIX = os.getenv('API_PREFIX', '/api/v1')
+SERVER_NAME = os.getenv('GRADIO_SERVER_NAME', '0.0.0.0')
+SERVER_PORT = int(os.getenv('GRADIO_SERVER_PORT', '7860'))
+
+# 管理員帳號（逗號分隔），可匯出所有使用者的資料
+ADMIN_USERS = {name.strip() for name in os.getenv('ADMIN_USERS', '').split(',') if name.strip()}
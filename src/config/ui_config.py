@@ -4,6 +4,17 @@
 STORE_OPTIONS = ['7-11', '全家', '星巴克']
 REDEEM_METHODS = ['7-11', '全家', 'Line禮物', '全家酷碰劵', '遠傳', '星巴克']
 
+# 列表篩選與分頁選項（值對應 date_utils 的到期狀態）
+FILTER_ALL = 'all'
+STATUS_FILTER_OPTIONS = [
+    ('全部狀態', FILTER_ALL),
+    ('已過期', 'expired'),
+    ('今天到期', 'today'),
+    ('即將到期', 'soon'),
+    ('有效', 'valid')
+]
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+
 # 兌換連結對應
 REDEEM_LINKS = {
     '7-11': {
@@ -2,8 +2,9 @@
 
 import gradio as gr
 import hashlib
-from datetime import datetime, timedelta
-from . import storage
+import secrets
+from datetime import datetime
+from . import session_store, storage, user_store
 
 def hash_password(password):
     """密碼加密"""
@@ -11,21 +12,8 @@ def hash_password(password):
 
 def create_session(username, request: gr.Request):
     """創建 Session Token"""
-    client_id = f"{request.client.host}_{request.headers.get('user-agent', '')}"
-    session_id = hashlib.sha256(client_id.encode()).hexdigest()[:16]
-    
-    sessions = storage.load_sessions()
-    
-    now = datetime.now()
-    sessions = {k: v for k, v in sessions.items() 
-                if datetime.fromisoformat(v['expires_at']) > now}
-    
-    sessions[session_id] = {
-        'username': username,
-        'created_at': datetime.now().isoformat(),
-        'expires_at': (datetime.now() + timedelta(days=30)).isoformat()
-    }
-    storage.save_sessions(sessions)
+    session_id = get_session_id(request)
+    session_store.sessions.create(session_id, username, session_store.SESSION_TTL)
     
     print(f"✅ 創建 Session: {session_id} for {username}")
     return session_id
@@ -36,32 +24,30 @@ def get_session_id(request: gr.Request):
     session_id = hashlib.sha256(client_id.encode()).hexdigest()[:16]
     return session_id
 
+# API Token 在 Session 儲存中的種類標記；瀏覽器的 Session id 可由 IP 與 User-Agent 推算，不可當作 Token
+API_TOKEN_KIND = 'api'
+
+def create_api_token(username):
+    """創建 API 用的 Token（隨機產生，與瀏覽器的 Session 存在同一個 Session 儲存、同樣的有效期限）"""
+    token = secrets.token_urlsafe(32)
+    session_store.sessions.create(token, username, session_store.SESSION_TTL, kind=API_TOKEN_KIND)
+    return token
+
+def validate_api_token(token):
+    """驗證 API Token，只接受 create_api_token 建立的 Token，回傳使用者名稱或 None"""
+    return session_store.sessions.get(token, kind=API_TOKEN_KIND)
+
+def revoke_api_token(token):
+    """撤銷 API Token；不是 API Token 的 Session 不受影響"""
+    session_store.sessions.delete(token, kind=API_TOKEN_KIND)
+
 def validate_session(session_id):
     """驗證 Session（快速檢查）"""
-    sessions = storage.load_sessions()
-    
-    if session_id not in sessions:
-        return None
-    
-    session = sessions[session_id]
-    try:
-        expires_at = datetime.fromisoformat(session['expires_at'])
-        
-        if datetime.now() > expires_at:
-            del sessions[session_id]
-            storage.save_sessions(sessions)
-            return None
-        
-        return session['username']
-    except:
-        return None
+    return session_store.sessions.get(session_id)
 
 def delete_session(session_id):
     """刪除 Session"""
-    sessions = storage.load_sessions()
-    if session_id in sessions:
-        del sessions[session_id]
-        storage.save_sessions(sessions)
+    session_store.sessions.delete(session_id)
 
 def register_user(username, password, confirm_password):
     """註冊新使用者"""
@@ -77,34 +63,40 @@ def register_user(username, password, confirm_password):
     if password != confirm_password:
         return "❌ 兩次密碼輸入不一致", gr.update(visible=True), gr.update(visible=False)
     
-    users = storage.load_users()
-    
-    if username in users:
+    if user_store.users.exists(username):
         return "❌ 使用者名稱已存在", gr.update(visible=True), gr.update(visible=False)
     
-    users[username] = {
+    user_info = {
         'password': hash_password(password),
         'created_at': datetime.now().isoformat()
     }
     
-    if storage.save_users(users):
+    if user_store.users.add(username, user_info):
         storage.save_deposits(username, [])
         return "✅ 註冊成功！請登入", gr.update(visible=True), gr.update(visible=False)
     else:
         return "❌ 註冊失敗，請稍後再試", gr.update(visible=True), gr.update(visible=False)
 
-def login_user(username, password, remember_me, request: gr.Request):
-    """使用者登入"""
+def check_credentials(username, password):
+    """檢查帳號密碼，正確時回傳 None，否則回傳錯誤訊息"""
     if not username or not password:
-        return "❌ 請填寫使用者名稱和密碼", gr.update(visible=True), gr.update(visible=False), None
+        return "❌ 請填寫使用者名稱和密碼"
+    
+    user_info = user_store.users.get(username)
     
-    users = storage.load_users()
+    if user_info is None:
+        return "❌ 使用者不存在"
     
-    if username not in users:
-        return "❌ 使用者不存在", gr.update(visible=True), gr.update(visible=False), None
+    if user_info['password'] != hash_password(password):
+        return "❌ 密碼錯誤"
     
-    if users[username]['password'] != hash_password(password):
-        return "❌ 密碼錯誤", gr.update(visible=True), gr.update(visible=False), None
+    return None
+
+def login_user(username, password, remember_me, request: gr.Request):
+    """使用者登入"""
+    error = check_credentials(username, password)
+    if error:
+        return error, gr.update(visible=True), gr.update(visible=False), None
     
     if remember_me:
         create_session(username, request)
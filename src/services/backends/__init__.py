@@ -0,0 +1,29 @@
+# src/services/backends/__init__.py
+
+from .base import RevisionConflict, StorageBackend
+from .json_backend import JsonBackend
+from .sqlite_backend import SQLiteBackend
+
+
+def migrate_backend(source, target):
+    """將 source 後端的所有資料一次性複製到 target 後端，回傳各類筆數"""
+    users = source.load_users()
+    target.save_users(users)
+    sessions = source.load_sessions()
+    target.save_sessions(sessions)
+    deposit_count = 0
+    usernames = source.list_usernames()
+    for username in usernames:
+        deposits = source.load_deposits(username)
+        target.save_deposits(username, deposits)
+        deposit_count += len(deposits)
+    return {'users': len(users), 'sessions': len(sessions), 'deposits': deposit_count}
+
+
+__all__ = [
+    'RevisionConflict',
+    'StorageBackend',
+    'JsonBackend',
+    'SQLiteBackend',
+    'migrate_backend'
+]
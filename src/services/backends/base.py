@@ -0,0 +1,169 @@
+# src/services/backends/base.py
+
+from .journal import apply_op
+
+
+class RevisionConflict(Exception):
+    """寫入時指定的 expected_revision 與目前的修訂號不符（期間已有其他寫入）"""
+
+    def __init__(self, username, expected, current):
+        super().__init__(f"{username} 的寄杯資料已被更新（預期修訂 {expected}，目前 {current}）")
+        self.username = username
+        self.expected = expected
+        self.current = current
+
+
+class StorageBackend:
+    """儲存後端介面
+
+    子類別至少需實作 users / sessions / deposits 的整批讀寫，
+    語意與原本的 JSON 函式相同：load_* 回傳新的 dict/list，save_* 整批覆寫並回傳是否成功。
+    單筆寄杯操作預設以「讀取 → 修改 → 整批寫回」實作，支援更細粒度操作的後端可覆寫。
+
+    每位使用者的寄杯資料帶有修訂號（revision），每次寫入加一。
+    save_deposits / batch_deposits 指定 expected_revision 時為 compare-and-swap：
+    修訂號不符就不寫入並拋出 RevisionConflict，由呼叫端重新讀取後再試。
+    """
+
+    name = 'base'
+    rewrite_retries = 5  # 預設的「讀取 → 修改 → 寫回」遇到版本衝突時的重試次數
+
+    # === 使用者 ===
+
+    def load_users(self):
+        raise NotImplementedError
+
+    def save_users(self, users):
+        raise NotImplementedError
+
+    def get_user(self, username):
+        """查詢單一帳號，不存在時回傳 None"""
+        return self.load_users().get(username)
+
+    def add_user(self, username, info):
+        """新增單一帳號；帳號已存在或寫入失敗時回傳 False"""
+        users = self.load_users()
+        if username in users:
+            return False
+        users[username] = info
+        return self.save_users(users)
+
+    def user_files(self, username):
+        """該帳號資料所在的本機檔案（供啟動同步時按需下載）"""
+        return []
+
+    # === Session ===
+
+    def load_sessions(self):
+        raise NotImplementedError
+
+    def save_sessions(self, sessions):
+        raise NotImplementedError
+
+    # === 寄杯記錄 ===
+
+    def load_deposits(self, username):
+        raise NotImplementedError
+
+    def load_versioned(self, username):
+        """回傳 (deposits, revision)；不支援修訂號的後端 revision 為 None（寫入時不比對）"""
+        return self.load_deposits(username), None
+
+    def revision(self, username):
+        """目前的修訂號；不支援修訂號的後端為 None"""
+        return self.load_versioned(username)[1]
+
+    def data_version(self, username):
+        """寄杯資料目前的版本標記（字串），資料有任何變動時都會改變；預設即為修訂號"""
+        return str(self.revision(username))
+
+    def save_deposits(self, username, deposits, expected_revision=None):
+        raise NotImplementedError
+
+    def data_files(self, username):
+        """該使用者的資料所在的本機檔案（供啟動同步時按需下載）"""
+        return []
+
+    def list_usernames(self):
+        """列出所有有寄杯資料的使用者"""
+        return list(self.load_users().keys())
+
+    def iter_all_deposits(self):
+        """逐一產生 (username, deposit)，供跨使用者查詢使用"""
+        for username in self.list_usernames():
+            for deposit in self.load_deposits(username):
+                yield username, deposit
+
+    def _rewrite(self, username, modify, expected_revision=None):
+        """讀取 → modify(deposits)（原地修改，回傳值為真才寫回）→ 比對修訂號後整批寫回
+
+        寫回前被其他寫入搶先時重新讀取再套用；指定 expected_revision 時則不重試，直接拋出 RevisionConflict。
+        回傳 (modify 的回傳值, 是否寫入成功)。
+        """
+        for _ in range(self.rewrite_retries):
+            deposits, revision = self.load_versioned(username)
+            if expected_revision is not None and revision != expected_revision:
+                raise RevisionConflict(username, expected_revision, revision)
+            result = modify(deposits)
+            if not result:
+                return result, True
+            try:
+                return result, self.save_deposits(username, deposits, expected_revision=revision)
+            except RevisionConflict:
+                if expected_revision is not None:
+                    raise
+        print(f"寫入 {username} 的寄杯資料時持續發生版本衝突，放棄寫入")
+        return result, False
+
+    def add_deposits(self, username, new_deposits):
+        """新增寄杯記錄（可一次多筆）；id 已存在時覆蓋該筆，與日誌的 add 及 SQLite 的 INSERT OR REPLACE 相同"""
+        op = {'op': 'add', 'deposits': list(new_deposits)}
+        _, ok = self._rewrite(username, lambda deposits: apply_op(deposits, op) or True)
+        return ok
+
+    def update_deposit(self, username, deposit_id, changes):
+        """更新單筆寄杯記錄的欄位，找不到記錄時回傳 False"""
+        def modify(deposits):
+            for deposit in deposits:
+                if deposit['id'] == deposit_id:
+                    deposit.update(changes)
+                    return True
+            return False
+        found, ok = self._rewrite(username, modify)
+        return found and ok
+
+    def delete_deposits(self, username, deposit_ids):
+        """刪除指定 id 的寄杯記錄，回傳實際刪除的筆數"""
+        ids = set(deposit_ids)
+        def modify(deposits):
+            before = len(deposits)
+            deposits[:] = [d for d in deposits if d['id'] not in ids]
+            return before - len(deposits)
+        removed, ok = self._rewrite(username, modify)
+        return removed if ok else 0
+
+    # === 統計彙總 ===
+
+    def load_stats(self, username):
+        """讀取該使用者保存的統計彙總，沒有時回傳 None"""
+        return None
+
+    def save_stats(self, username, stats):
+        """保存統計彙總；不支援保存的後端回傳 False（每次啟動後重新計算）"""
+        return False
+
+    def batch_deposits(self, username, ops, expected_revision=None):
+        """一次套用多個寄杯異動並只寫入一次
+
+        ops 的格式與異動日誌相同（add / update / delete），依序套用，全部成功或全部不生效。
+        指定 expected_revision 時修訂號不符會拋出 RevisionConflict。
+        """
+        def modify(deposits):
+            for op in ops:
+                apply_op(deposits, op)
+            return True
+        _, ok = self._rewrite(username, modify, expected_revision)
+        return ok
+
+    def close(self):
+        pass
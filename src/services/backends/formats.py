@@ -0,0 +1,83 @@
+# src/services/backends/formats.py
+
+import json
+from itertools import repeat
+
+# 寄杯檔的版本化儲存格式
+#
+# v1 'json'     ：舊格式，縮排 2 格的 deposit dict 陣列（保留相容，可讀可寫）
+# v2 'columnar' ：緊湊的欄式格式，帶版本標頭，欄位名稱只出現一次、沒有多餘空白：
+#   {"format":"deposits","version":2,"layout":"columnar","count":N,"revision":R,
+#    "columns":{"id":[...],"item":[...],...}}
+#   若各筆記錄的欄位不一致，改用 "layout":"records"（緊湊的 dict 陣列）以免遺失欄位。
+#
+# 讀取時自動判斷格式；寫入一律使用設定的格式，舊檔在下次寫入時自然轉換（lazy migration）。
+# revision 是該使用者寄杯資料的修訂號（每次寫入加一），供寫入時比對版本；v1 沒有標頭，視為 0。
+
+FORMAT_JSON = 'json'
+FORMAT_COLUMNAR = 'columnar'
+FORMATS = (FORMAT_JSON, FORMAT_COLUMNAR)
+
+FORMAT_TAG = 'deposits'
+FORMAT_VERSION = 2
+
+_COMPACT = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def encode_deposits(deposits, fmt=FORMAT_COLUMNAR, revision=0):
+    """將寄杯列表編碼成指定格式的字串（v1 格式不保存 revision）"""
+    if fmt == FORMAT_JSON:
+        return json.dumps(deposits, ensure_ascii=False, indent=2)
+    if fmt != FORMAT_COLUMNAR:
+        raise ValueError(f"未知的寄杯檔格式: {fmt}")
+
+    keys = list(deposits[0].keys()) if deposits else []
+    key_set = set(keys)
+    if all(len(d) == len(keys) and key_set.issuperset(d) for d in deposits):
+        payload = {
+            'format': FORMAT_TAG,
+            'version': FORMAT_VERSION,
+            'layout': 'columnar',
+            'count': len(deposits),
+            'revision': revision,
+            'columns': {key: [d[key] for d in deposits] for key in keys}
+        }
+    else:
+        payload = {
+            'format': FORMAT_TAG,
+            'version': FORMAT_VERSION,
+            'layout': 'records',
+            'count': len(deposits),
+            'revision': revision,
+            'records': deposits
+        }
+    return json.dumps(payload, **_COMPACT)
+
+
+def decode_deposits(data):
+    """將已解析的 JSON 內容還原成寄杯列表，回傳 (deposits, 格式名稱)"""
+    if isinstance(data, list):
+        return data, FORMAT_JSON
+    if not isinstance(data, dict) or data.get('format') != FORMAT_TAG:
+        raise ValueError("無法辨識的寄杯檔格式")
+    version = data.get('version')
+    if version != FORMAT_VERSION:
+        raise ValueError(f"不支援的寄杯檔版本: {version}")
+    if data.get('layout') == 'records':
+        return data['records'], FORMAT_COLUMNAR
+    columns = data['columns']
+    keys = list(columns.keys())
+    rows = zip(*columns.values())
+    return list(map(dict, map(zip, repeat(keys), rows))), FORMAT_COLUMNAR
+
+
+def decode_revision(data):
+    """取出已解析內容中的 revision；v1 格式或舊的 v2 檔沒有時為 0"""
+    return data.get('revision', 0) if isinstance(data, dict) else 0
+
+
+def load_deposits_text(text):
+    """解析寄杯檔內容（自動判斷格式），回傳 (deposits, 格式名稱, revision)"""
+    data = json.loads(text)
+    deposits, fmt = decode_deposits(data)
+    return deposits, fmt, decode_revision(data)
@@ -0,0 +1,121 @@
+# src/services/backends/journal.py
+
+import os
+import json
+import queue
+import threading
+
+# 寄杯異動日誌（append-only）
+#
+# 每位使用者的寄杯檔 <username>.json 是 checkpoint，<username>.journal 逐行記錄之後的異動：
+#   {"op": "add", "deposits": [...]}          新增（id 已存在時覆蓋該筆）
+#   {"op": "update", "id": ..., "changes": {...}}  以絕對值更新欄位
+#   {"op": "delete", "ids": [...]}            刪除
+#   {"op": "reset", "deposits": [...]}        整批覆寫
+#   {"op": "batch", "ops": [...]}             依序套用多個操作；整行寫入才生效，達成整批原子性
+# 每行另帶 "rev"：寫入這一行之後的修訂號。
+# 所有操作都是冪等的：對已套用過的狀態重播同一段日誌結果不變，
+# 因此壓縮時「先寫 checkpoint 再清空日誌」即使中途當機，重播也不會重複套用；
+# 修訂號同樣取 checkpoint 與最後一行 rev 的較大者，而不是累加行數，重播不會讓修訂號再增加。
+
+def apply_op(deposits, op):
+    """將單筆日誌操作套用到寄杯列表（原地修改並回傳）"""
+    kind = op.get('op')
+    if kind == 'add':
+        positions = {d['id']: i for i, d in enumerate(deposits)}
+        for deposit in op['deposits']:
+            if deposit['id'] in positions:
+                deposits[positions[deposit['id']]] = dict(deposit)
+            else:
+                positions[deposit['id']] = len(deposits)
+                deposits.append(dict(deposit))
+    elif kind == 'update':
+        for deposit in deposits:
+            if deposit['id'] == op['id']:
+                deposit.update(op['changes'])
+                break
+    elif kind == 'delete':
+        ids = set(op['ids'])
+        deposits[:] = [d for d in deposits if d['id'] not in ids]
+    elif kind == 'reset':
+        deposits[:] = [dict(d) for d in op['deposits']]
+    elif kind == 'batch':
+        for sub_op in op['ops']:
+            apply_op(deposits, sub_op)
+    return deposits
+
+def replay_revision(revision, op):
+    """checkpoint 的修訂號依序經過日誌各行後的修訂號；舊版沒有 rev 的行每行加一"""
+    if 'rev' in op:
+        return max(revision, op['rev'])
+    return revision + 1
+
+def read_journal(path):
+    """讀取日誌中的所有操作；當機造成的殘缺行（無法解析）會被略過"""
+    ops = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except ValueError:
+                    print(f"略過殘缺的日誌行: {path}")
+    except FileNotFoundError:
+        pass
+    return ops
+
+def append_op(path, op):
+    """在日誌尾端附加一筆操作，成本與使用者的寄杯數量無關"""
+    line = json.dumps(op, ensure_ascii=False, separators=(',', ':')) + '\n'
+    with open(path, 'a+b') as f:
+        # 上次寫入若在行中途當機，先補上換行，避免新記錄接在殘缺行後面
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                line = '\n' + line
+        f.write(line.encode('utf-8'))
+        f.flush()
+
+def journal_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class Compactor:
+    """背景壓縮工作者：日誌超過門檻時，把壓縮工作排入佇列由單一執行緒處理"""
+
+    def __init__(self, compact_fn):
+        self._compact_fn = compact_fn
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='journal-compactor', daemon=True)
+        self._thread.start()
+
+    def submit(self, username):
+        with self._pending_lock:
+            if username in self._pending:
+                return
+            self._pending.add(username)
+        self._queue.put(username)
+
+    def _run(self):
+        while True:
+            username = self._queue.get()
+            with self._pending_lock:
+                self._pending.discard(username)
+            try:
+                self._compact_fn(username)
+            except Exception as e:
+                print(f"日誌壓縮失敗 ({username}): {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """等待目前排入的壓縮工作完成"""
+        self._queue.join()
@@ -0,0 +1,493 @@
+# src/services/backends/json_backend.py
+
+import os
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from .atomic import GroupCommitter, fsync_path, publish, write_temp
+from .base import RevisionConflict, StorageBackend
+from .formats import FORMAT_COLUMNAR, encode_deposits, load_deposits_text
+from ..locks import StripedLock
+from .journal import Compactor, append_op, apply_op, journal_size, read_journal, replay_revision
+
+# === 通用讀寫函式 ===
+
+def _load_json(filepath, default=None):
+    if os.path.exists(filepath):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"讀取 {filepath} 失敗，使用預設值: {e}")
+            return default if default is not None else {}
+    return default if default is not None else {}
+
+def _load_deposit_file(filepath):
+    # 自動判斷寄杯檔格式（舊版 JSON 陣列或 v2 欄式格式），回傳 (deposits, revision)
+    if not os.path.exists(filepath):
+        return [], 0
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            deposits, _, revision = load_deposits_text(f.read())
+        return deposits, revision
+    except Exception as e:
+        print(f"讀取 {filepath} 失敗，使用預設值: {e}")
+        return [], 0
+
+def _file_signature(filepath):
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _copy_deposits(deposits):
+    # 每筆寄杯都是扁平 dict，淺層複製即可避免呼叫端修改到快取內容
+    return [dict(d) for d in deposits]
+
+
+class DepositCache:
+    """已解析寄杯列表的 LRU 快取
+
+    以使用者名稱為 key，寫入時同步更新（write-through）；讀取時比對檔案 mtime/size，
+    檔案被外部修改或由 Dataset 同步覆蓋時會自動失效重新載入。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()  # username -> (檔案簽章, 寄杯列表)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, username, signature):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(username)
+                self._stats['hits'] += 1
+                return _copy_deposits(entry[1])
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, username, signature, deposits):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[username] = (signature, _copy_deposits(deposits))
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def apply(self, username, old_signature, new_signature, fn):
+        """就地套用異動到快取項目；快取已過期時直接丟棄該項目"""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return
+            if entry[0] != old_signature:
+                del self._entries[username]
+                return
+            fn(entry[1])
+            self._entries[username] = (new_signature, entry[1])
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'size': len(self._entries), 'capacity': self.capacity}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+class JsonBackend(StorageBackend):
+    """原本的 JSON 檔案儲存：users.json、sessions.json 與每位使用者一個寄杯檔
+
+    journal_threshold 不為 None 時啟用異動日誌：寄杯異動改為附加到 <username>.journal，
+    日誌超過 journal_threshold 位元組後由背景執行緒壓縮回 <username>.json。
+
+    本地寫入以分段鎖（每位使用者 / 每個檔案）互斥，不同使用者可以同時寫入；
+    sync_lock（CommitScheduler 的 lock）只包住真正落地到檔案的那一小段，
+    序列化等較慢的工作都在它外面完成，避免和背景上傳互相卡住。
+
+    所有檔案都以「暫存檔 + rename」原子取代。durability 控制落地保證：
+    'none' 不 fsync、'fsync' 每次寫入都 fsync、'group' 把 group_window 秒內的寫入合併成一批 fsync。
+
+    寄杯檔以 deposit_format 寫入（見 formats.py），讀取時自動判斷格式。
+
+    指定 users_dir 時，使用者帳號依名稱雜湊分散到 users_dir 下的 user_shards 個分片檔，
+    查詢/新增單一帳號只需讀寫一個分片；舊的 users.json 會在第一次存取時搬進分片後刪除。
+
+    指定 stats_dir 時，每位使用者的統計彙總存放在 stats_dir/<username>.json。
+
+    寄杯的修訂號每次寫入（含附加一行日誌）加一：寫在 checkpoint 標頭的 revision 與每行日誌的 rev，
+    讀取時取最後一行的 rev（見 journal.replay_revision），壓縮時寫進新的 checkpoint。
+    第一次用到時從檔案取得，之後連同檔案簽章在記憶體維護；檔案被同步下載或外部修改而簽章不符時重新讀取。
+    比對與寫入都在該使用者的分段鎖內，不需要全域鎖。
+    v1 格式沒有標頭，日誌壓縮掉之後重新啟動會從 0 起算。
+    """
+
+    name = 'json'
+
+    def __init__(self, users_file, sessions_file, user_data_dir, sync_lock, cache_size=256,
+                 journal_threshold=None, lock_stripes=64, durability='fsync', group_window=0.005,
+                 on_write=None, deposit_format=FORMAT_COLUMNAR, users_dir=None, user_shards=256,
+                 stats_dir=None):
+        self.users_file = users_file
+        self.sessions_file = sessions_file
+        self.user_data_dir = user_data_dir
+        self.sync_lock = sync_lock
+        self.locks = StripedLock(lock_stripes)
+        self.cache = DepositCache(cache_size)
+        self.journal_threshold = journal_threshold
+        self.compactor = Compactor(self.compact) if journal_threshold is not None else None
+        self.durability = durability
+        self.committer = GroupCommitter(sync_lock, group_window) if durability == 'group' else None
+        self.deposit_format = deposit_format
+        self.on_write = on_write  # 檔案異動（含刪除）後的通知，供同步排程追蹤需上傳的檔案
+        self.users_dir = users_dir
+        self.user_shards = user_shards
+        self.stats_dir = stats_dir
+        self._revisions = {}  # username -> (檔案簽章, 修訂號)；簽章不符時表示檔案被外部更動，重新讀取
+        # 舊版 users.json 的搬移專用鎖：搬移期間要逐一取得分片檔的分段鎖，
+        # 若改用 users.json 的分段鎖，兩者落在同一段時不可重入的鎖會自己卡死
+        self._users_migration_lock = threading.Lock()
+        os.makedirs(user_data_dir, exist_ok=True)
+        if users_dir:
+            os.makedirs(users_dir, exist_ok=True)
+        if stats_dir:
+            os.makedirs(stats_dir, exist_ok=True)
+
+    def _write_text(self, filepath, text):
+        # 暫存檔在鎖外寫好；只有 rename 時持有 CommitScheduler 的 lock
+        tmp_path = write_temp(filepath, text)
+        if self.committer is not None:
+            self.committer.commit([tmp_path], [(tmp_path, filepath)])
+        else:
+            publish([tmp_path], [(tmp_path, filepath)], self.sync_lock,
+                    durable=self.durability == 'fsync')
+        self._notify(filepath)
+
+    def _notify(self, filepath):
+        if self.on_write is not None:
+            self.on_write(filepath)
+
+    def _sync_journal(self, journal_file):
+        if self.committer is not None:
+            self.committer.commit([journal_file])
+        elif self.durability == 'fsync':
+            fsync_path(journal_file)
+
+    def _save_json(self, filepath, data, key=None):
+        # 序列化在鎖外完成；key 決定使用哪一把分段鎖，預設為檔案路徑
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        with self.locks.for_key(key or filepath):
+            self._write_text(filepath, text)
+
+    # === 使用者 ===
+
+    def get_user_shard_file(self, username):
+        shard = zlib.crc32(username.encode('utf-8')) % self.user_shards
+        return os.path.join(self.users_dir, f'{shard:03x}.json')
+
+    def user_files(self, username):
+        if not self.users_dir:
+            return [self.users_file]
+        return [self.users_file, self.get_user_shard_file(username)]
+
+    def _shard_files(self):
+        return [
+            os.path.join(self.users_dir, name) for name in sorted(os.listdir(self.users_dir))
+            if name.endswith('.json')
+        ]
+
+    def _migrate_legacy_users(self):
+        # 舊版 users.json 一次性搬進分片；分片內已有的帳號優先
+        if not self.users_dir or not os.path.exists(self.users_file):
+            return
+        with self._users_migration_lock:
+            if not os.path.exists(self.users_file):
+                return
+            grouped = {}
+            for username, info in _load_json(self.users_file, {}).items():
+                grouped.setdefault(self.get_user_shard_file(username), {})[username] = info
+            for shard_file, legacy_users in grouped.items():
+                with self.locks.for_key(shard_file):
+                    shard = {**legacy_users, **_load_json(shard_file, {})}
+                    self._write_text(shard_file, json.dumps(shard, ensure_ascii=False, indent=2))
+            with self.sync_lock:
+                os.remove(self.users_file)
+            self._notify(self.users_file)
+            print(f"已將 users.json 的 {sum(len(g) for g in grouped.values())} 個帳號搬移到分片")
+
+    def load_users(self):
+        if not self.users_dir:
+            return _load_json(self.users_file, {})
+        self._migrate_legacy_users()
+        users = {}
+        for shard_file in self._shard_files():
+            users.update(_load_json(shard_file, {}))
+        return users
+
+    def save_users(self, users):
+        try:
+            if not self.users_dir:
+                self._save_json(self.users_file, users)
+                return True
+            self._migrate_legacy_users()
+            grouped = {shard_file: {} for shard_file in self._shard_files()}
+            for username, info in users.items():
+                grouped.setdefault(self.get_user_shard_file(username), {})[username] = info
+            for shard_file, shard in grouped.items():
+                self._save_json(shard_file, shard)
+            return True
+        except Exception as e:
+            print(f"儲存用戶錯誤: {e}")
+            return False
+
+    def get_user(self, username):
+        if not self.users_dir:
+            return super().get_user(username)
+        self._migrate_legacy_users()
+        return _load_json(self.get_user_shard_file(username), {}).get(username)
+
+    def add_user(self, username, info):
+        if not self.users_dir:
+            return super().add_user(username, info)
+        self._migrate_legacy_users()
+        shard_file = self.get_user_shard_file(username)
+        try:
+            with self.locks.for_key(shard_file):
+                shard = _load_json(shard_file, {})
+                if username in shard:
+                    return False
+                shard[username] = info
+                self._write_text(shard_file, json.dumps(shard, ensure_ascii=False, indent=2))
+            return True
+        except Exception as e:
+            print(f"儲存用戶錯誤: {e}")
+            return False
+
+    # === Session ===
+
+    def load_sessions(self):
+        return _load_json(self.sessions_file, {})
+
+    def save_sessions(self, sessions):
+        try:
+            self._save_json(self.sessions_file, sessions)
+            return True
+        except:
+            return False
+
+    # === 寄杯記錄 ===
+
+    def get_user_data_file(self, username):
+        return os.path.join(self.user_data_dir, f'{username}.json')
+
+    def get_journal_file(self, username):
+        return os.path.join(self.user_data_dir, f'{username}.journal')
+
+    def get_stats_file(self, username):
+        return os.path.join(self.stats_dir, f'{username}.json')
+
+    def data_files(self, username):
+        files = [self.get_user_data_file(username), self.get_journal_file(username)]
+        if self.stats_dir:
+            files.append(self.get_stats_file(username))
+        return files
+
+    def _signature(self, username):
+        snapshot = _file_signature(self.get_user_data_file(username))
+        if self.compactor is None:
+            return snapshot
+        return (snapshot, _file_signature(self.get_journal_file(username)))
+
+    def _read_deposits(self, username):
+        # 回傳 (deposits, revision)
+        deposits, revision = _load_deposit_file(self.get_user_data_file(username))
+        if self.compactor is not None:
+            ops = read_journal(self.get_journal_file(username))
+            for op in ops:
+                apply_op(deposits, op)
+                revision = replay_revision(revision, op)
+        return deposits, revision
+
+    def load_deposits(self, username):
+        signature = self._signature(username)
+        cached = self.cache.get(username, signature)
+        if cached is not None:
+            return cached
+        deposits, revision = self._read_deposits(username)
+        self.cache.put(username, signature, deposits)
+        # 讀取期間若有寫入，簽章會與檔案不符，之後取修訂號時重新讀取
+        self._revisions[username] = (signature, revision)
+        return deposits
+
+    def _revision(self, username):
+        # 呼叫端需持有該使用者的分段鎖
+        signature = self._signature(username)
+        entry = self._revisions.get(username)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        _, revision = self._read_deposits(username)
+        self._revisions[username] = (signature, revision)
+        return revision
+
+    def revision(self, username):
+        with self.locks.for_key(username):
+            return self._revision(username)
+
+    def data_version(self, username):
+        # 直接修改檔案時修訂號可能不變（例如沒有標頭的 v1 檔），因此連同檔案簽章一起作為版本
+        with self.locks.for_key(username):
+            return f"{self._revision(username)}:{self._signature(username)}"
+
+    def _check_revision(self, username, expected_revision):
+        revision = self._revision(username)
+        if expected_revision is not None and expected_revision != revision:
+            raise RevisionConflict(username, expected_revision, revision)
+        return revision
+
+    def load_versioned(self, username):
+        # 在使用者鎖內同時取得資料與修訂號，兩者一定對應同一個版本
+        with self.locks.for_key(username):
+            return self.load_deposits(username), self._revision(username)
+
+    def save_deposits(self, username, deposits, expected_revision=None):
+        try:
+            if self.compactor is not None:
+                self._append(username, {'op': 'reset', 'deposits': deposits}, expected_revision)
+                return True
+            filepath = self.get_user_data_file(username)
+            with self.locks.for_key(username):
+                # 修訂號寫在標頭裡，序列化必須在比對之後，因此放在使用者鎖內
+                revision = self._check_revision(username, expected_revision) + 1
+                self._write_text(filepath, encode_deposits(deposits, self.deposit_format, revision))
+                self._revisions[username] = (self._signature(username), revision)
+                self.cache.put(username, _file_signature(filepath), deposits)
+            return True
+        except RevisionConflict:
+            raise
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def list_usernames(self):
+        if not os.path.isdir(self.user_data_dir):
+            return []
+        usernames = set()
+        for name in os.listdir(self.user_data_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == '.json' or (ext == '.journal' and self.compactor is not None):
+                usernames.add(stem)
+        return sorted(usernames)
+
+    # === 異動日誌 ===
+
+    def _append(self, username, op, expected_revision=None):
+        with self.locks.for_key(username):
+            revision = self._check_revision(username, expected_revision) + 1
+            op = {**op, 'rev': revision}
+            old_signature = self._signature(username)
+            with self.sync_lock:
+                append_op(self.get_journal_file(username), op)
+            new_signature = self._signature(username)
+            self._revisions[username] = (new_signature, revision)
+            self._sync_journal(self.get_journal_file(username))
+            self._notify(self.get_journal_file(username))
+            self.cache.apply(username, old_signature, new_signature,
+                             lambda deposits: apply_op(deposits, op))
+        if journal_size(self.get_journal_file(username)) > self.journal_threshold:
+            self.compactor.submit(username)
+
+    def add_deposits(self, username, new_deposits):
+        if self.compactor is None:
+            return super().add_deposits(username, new_deposits)
+        try:
+            self._append(username, {'op': 'add', 'deposits': list(new_deposits)})
+            return True
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def update_deposit(self, username, deposit_id, changes):
+        if self.compactor is None:
+            return super().update_deposit(username, deposit_id, changes)
+        if not any(d['id'] == deposit_id for d in self.load_deposits(username)):
+            return False
+        try:
+            self._append(username, {'op': 'update', 'id': deposit_id, 'changes': dict(changes)})
+            return True
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def delete_deposits(self, username, deposit_ids):
+        if self.compactor is None:
+            return super().delete_deposits(username, deposit_ids)
+        ids = set(deposit_ids)
+        removed = sum(1 for d in self.load_deposits(username) if d['id'] in ids)
+        if not removed:
+            return 0
+        try:
+            self._append(username, {'op': 'delete', 'ids': sorted(ids)})
+            return removed
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return 0
+
+    def batch_deposits(self, username, ops, expected_revision=None):
+        if self.compactor is None:
+            return super().batch_deposits(username, ops, expected_revision)
+        try:
+            self._append(username, {'op': 'batch', 'ops': list(ops)}, expected_revision)
+            return True
+        except RevisionConflict:
+            raise
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def compact(self, username):
+        """把日誌折疊回 checkpoint 檔並清空日誌"""
+        journal_file = self.get_journal_file(username)
+        with self.locks.for_key(username):
+            if not os.path.exists(journal_file):
+                return
+            deposits, _ = self._read_deposits(username)
+            # checkpoint 帶上目前的修訂號，清空日誌後修訂號不變
+            revision = self._revision(username)
+            text = encode_deposits(deposits, self.deposit_format, revision)
+            # 先確實寫好 checkpoint 再清空日誌；兩步之間當機時重播冪等的日誌不會改變結果
+            tmp_path = write_temp(self.get_user_data_file(username), text)
+            publish([tmp_path], [(tmp_path, self.get_user_data_file(username))], self.sync_lock,
+                    durable=self.durability != 'none')
+            with self.sync_lock:
+                os.remove(journal_file)
+            self._notify(self.get_user_data_file(username))
+            self._notify(journal_file)
+            self._revisions[username] = (self._signature(username), revision)
+            self.cache.put(username, self._signature(username), deposits)
+
+    # === 統計彙總 ===
+
+    def load_stats(self, username):
+        if not self.stats_dir:
+            return None
+        return _load_json(self.get_stats_file(username))
+
+    def save_stats(self, username, stats):
+        if not self.stats_dir:
+            return False
+        try:
+            text = json.dumps(stats, ensure_ascii=False)
+            with self.locks.for_key(username):
+                self._write_text(self.get_stats_file(username), text)
+            return True
+        except Exception as e:
+            print(f"儲存統計錯誤: {e}")
+            return False
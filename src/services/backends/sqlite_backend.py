@@ -0,0 +1,374 @@
+# src/services/backends/sqlite_backend.py
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from .base import RevisionConflict, StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username   TEXT PRIMARY KEY,
+    password   TEXT NOT NULL,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    username   TEXT NOT NULL,
+    created_at TEXT,
+    expires_at TEXT NOT NULL,
+    kind       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);
+
+CREATE TABLE IF NOT EXISTS deposits (
+    username      TEXT NOT NULL,
+    id            TEXT NOT NULL,
+    item          TEXT NOT NULL,
+    quantity      INTEGER NOT NULL,
+    store         TEXT,
+    redeem_method TEXT,
+    expiry_date   TEXT,
+    created_at    TEXT,
+    PRIMARY KEY (username, id)
+);
+CREATE INDEX IF NOT EXISTS idx_deposits_user_expiry ON deposits (username, expiry_date);
+CREATE INDEX IF NOT EXISTS idx_deposits_expiry ON deposits (expiry_date);
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    username TEXT PRIMARY KEY,
+    data     TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS deposit_revisions (
+    username TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+"""
+
+# deposit dict 欄位 <-> 資料表欄位
+DEPOSIT_COLUMNS = [
+    ('id', 'id'),
+    ('item', 'item'),
+    ('quantity', 'quantity'),
+    ('store', 'store'),
+    ('redeemMethod', 'redeem_method'),
+    ('expiryDate', 'expiry_date'),
+    ('createdAt', 'created_at'),
+]
+_SELECT_DEPOSIT = ', '.join(col for _, col in DEPOSIT_COLUMNS)
+_INSERT_DEPOSIT = (
+    f"INSERT OR REPLACE INTO deposits (username, {_SELECT_DEPOSIT}) "
+    f"VALUES (?, {', '.join('?' for _ in DEPOSIT_COLUMNS)})"
+)
+_COLUMN_BY_KEY = dict(DEPOSIT_COLUMNS)
+
+
+def _row_to_deposit(row):
+    return {key: row[i] for i, (key, _) in enumerate(DEPOSIT_COLUMNS)}
+
+def _deposit_params(username, deposit):
+    return (username, *(deposit.get(key) for key, _ in DEPOSIT_COLUMNS))
+
+def _bump_revision(conn, username, expected_revision=None):
+    # 修訂號加一；指定 expected_revision 時以 UPDATE ... WHERE revision = ? 做 compare-and-swap（須在同一個交易內）
+    conn.execute('INSERT OR IGNORE INTO deposit_revisions (username, revision) VALUES (?, 0)', (username,))
+    if expected_revision is None:
+        conn.execute('UPDATE deposit_revisions SET revision = revision + 1 WHERE username = ?', (username,))
+        return
+    cursor = conn.execute(
+        'UPDATE deposit_revisions SET revision = revision + 1 WHERE username = ? AND revision = ?',
+        (username, expected_revision)
+    )
+    if cursor.rowcount == 0:
+        row = conn.execute('SELECT revision FROM deposit_revisions WHERE username = ?', (username,)).fetchone()
+        raise RevisionConflict(username, expected_revision, row[0] if row else 0)
+
+
+class SQLiteBackend(StorageBackend):
+    """SQLite 儲存：users / sessions / deposits 三張表
+
+    寄杯以 (username, id) 為主鍵並在 (username, expiry_date) 建索引，
+    單筆兌換/刪除只需一條 UPDATE/DELETE，跨使用者查詢也不必逐一開檔。
+    資料庫採用預設的 rollback journal（非 WAL），確保提交後 db 檔本身即為最新，
+    讓背景同步上傳的檔案內容完整；寫入交易期間持有 sync_lock，上傳讀檔時不會讀到交易中途的內容。
+    寄杯的修訂號存在 deposit_revisions 表，與寄杯異動在同一個交易內更新與比對。
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, db_path, sync_lock=None, on_write=None):
+        self.db_path = db_path
+        self.sync_lock = sync_lock or threading.Lock()
+        self.on_write = on_write
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        # 舊版資料庫的 sessions 表沒有 kind 欄位
+        if 'kind' not in {row[1] for row in conn.execute('PRAGMA table_info(sessions)')}:
+            with conn:
+                conn.execute('ALTER TABLE sessions ADD COLUMN kind TEXT')
+
+    def _conn(self):
+        # sqlite3 連線不可跨執行緒共用，每個執行緒各自建立一條
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        # 交易沒有改到任何資料列（例如更新/刪除不存在的記錄）時不通知 on_write，不排程上傳
+        with self.sync_lock:
+            conn = self._conn()
+            before = conn.total_changes
+            with conn:
+                yield conn
+            changed = conn.total_changes != before
+        if changed and self.on_write is not None:
+            self.on_write(self.db_path)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def is_empty(self):
+        conn = self._conn()
+        for table in ('users', 'sessions', 'deposits'):
+            if conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone():
+                return False
+        return True
+
+    # === 使用者 ===
+
+    def load_users(self):
+        rows = self._conn().execute('SELECT username, password, created_at FROM users')
+        return {
+            username: {'password': password, 'created_at': created_at}
+            for username, password, created_at in rows
+        }
+
+    def save_users(self, users):
+        try:
+            with self._write() as conn:
+                conn.execute('DELETE FROM users')
+                conn.executemany(
+                    'INSERT INTO users (username, password, created_at) VALUES (?, ?, ?)',
+                    [(u, info['password'], info.get('created_at')) for u, info in users.items()]
+                )
+            return True
+        except Exception as e:
+            print(f"儲存用戶錯誤: {e}")
+            return False
+
+    def get_user(self, username):
+        row = self._conn().execute(
+            'SELECT password, created_at FROM users WHERE username = ?', (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'password': row[0], 'created_at': row[1]}
+
+    def add_user(self, username, info):
+        try:
+            with self._write() as conn:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO users (username, password, created_at) VALUES (?, ?, ?)',
+                    (username, info['password'], info.get('created_at'))
+                )
+            return cursor.rowcount > 0
+        except Exception as e:
+            print(f"儲存用戶錯誤: {e}")
+            return False
+
+    def user_files(self, username):
+        return [self.db_path]
+
+    # === Session ===
+
+    def load_sessions(self):
+        rows = self._conn().execute('SELECT session_id, username, created_at, expires_at, kind FROM sessions')
+        sessions = {}
+        for session_id, username, created_at, expires_at, kind in rows:
+            sessions[session_id] = {'username': username, 'created_at': created_at, 'expires_at': expires_at}
+            if kind:
+                sessions[session_id]['kind'] = kind
+        return sessions
+
+    def save_sessions(self, sessions):
+        try:
+            with self._write() as conn:
+                conn.execute('DELETE FROM sessions')
+                conn.executemany(
+                    'INSERT INTO sessions (session_id, username, created_at, expires_at, kind) VALUES (?, ?, ?, ?, ?)',
+                    [(sid, s['username'], s.get('created_at'), s['expires_at'], s.get('kind'))
+                     for sid, s in sessions.items()]
+                )
+            return True
+        except:
+            return False
+
+    # === 寄杯記錄 ===
+
+    def load_deposits(self, username):
+        # id 依時間遞增，直接沿主鍵 (username, id) 的順序讀出即為建立順序，不需額外排序
+        rows = self._conn().execute(
+            f'SELECT {_SELECT_DEPOSIT} FROM deposits WHERE username = ? ORDER BY id',
+            (username,)
+        )
+        return [_row_to_deposit(row) for row in rows]
+
+    def _read_revision(self, username):
+        row = self._conn().execute('SELECT revision FROM deposit_revisions WHERE username = ?', (username,)).fetchone()
+        return row[0] if row else 0
+
+    def revision(self, username):
+        return self._read_revision(username)
+
+    def load_versioned(self, username):
+        # 先讀修訂號再讀資料：兩者之間若有寫入，拿到的是較舊的修訂號，寫入時只會判定衝突而重試，不會遺失更新
+        revision = self._read_revision(username)
+        return self.load_deposits(username), revision
+
+    def save_deposits(self, username, deposits, expected_revision=None):
+        try:
+            with self._write() as conn:
+                _bump_revision(conn, username, expected_revision)
+                conn.execute('DELETE FROM deposits WHERE username = ?', (username,))
+                conn.executemany(_INSERT_DEPOSIT, [_deposit_params(username, d) for d in deposits])
+            return True
+        except RevisionConflict:
+            raise
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def data_files(self, username):
+        return [self.db_path]
+
+    def list_usernames(self):
+        rows = self._conn().execute(
+            'SELECT username FROM users UNION SELECT DISTINCT username FROM deposits ORDER BY 1'
+        )
+        return [row[0] for row in rows]
+
+    def iter_all_deposits(self):
+        rows = self._conn().execute(
+            f'SELECT username, {_SELECT_DEPOSIT} FROM deposits ORDER BY expiry_date'
+        )
+        for row in rows:
+            yield row[0], _row_to_deposit(row[1:])
+
+    def add_deposits(self, username, new_deposits):
+        try:
+            with self._write() as conn:
+                _bump_revision(conn, username)
+                conn.executemany(_INSERT_DEPOSIT, [_deposit_params(username, d) for d in new_deposits])
+            return True
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def update_deposit(self, username, deposit_id, changes):
+        columns = [(_COLUMN_BY_KEY[key], value) for key, value in changes.items()
+                   if key in _COLUMN_BY_KEY and key != 'id']
+        if not columns:
+            return False
+        assignments = ', '.join(f'{col} = ?' for col, _ in columns)
+        try:
+            with self._write() as conn:
+                cursor = conn.execute(
+                    f'UPDATE deposits SET {assignments} WHERE username = ? AND id = ?',
+                    (*(value for _, value in columns), username, deposit_id)
+                )
+                # 找不到記錄時不改修訂號，ETag 與畫面快取維持有效
+                updated = cursor.rowcount
+                if updated:
+                    _bump_revision(conn, username)
+            return updated > 0
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def delete_deposits(self, username, deposit_ids):
+        try:
+            with self._write() as conn:
+                cursor = conn.executemany(
+                    'DELETE FROM deposits WHERE username = ? AND id = ?',
+                    [(username, deposit_id) for deposit_id in deposit_ids]
+                )
+                removed = cursor.rowcount
+                if removed:
+                    _bump_revision(conn, username)
+            return removed
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return 0
+
+    def batch_deposits(self, username, ops, expected_revision=None):
+        try:
+            # 同一個交易內依序執行，任一步失敗（含版本衝突）整批回滾
+            with self._write() as conn:
+                _bump_revision(conn, username, expected_revision)
+                for op in ops:
+                    kind = op.get('op')
+                    if kind == 'add':
+                        conn.executemany(_INSERT_DEPOSIT, [_deposit_params(username, d) for d in op['deposits']])
+                    elif kind == 'update':
+                        columns = [(_COLUMN_BY_KEY[key], value) for key, value in op['changes'].items()
+                                   if key in _COLUMN_BY_KEY and key != 'id']
+                        if columns:
+                            assignments = ', '.join(f'{col} = ?' for col, _ in columns)
+                            conn.execute(
+                                f'UPDATE deposits SET {assignments} WHERE username = ? AND id = ?',
+                                (*(value for _, value in columns), username, op['id'])
+                            )
+                    elif kind == 'delete':
+                        conn.executemany(
+                            'DELETE FROM deposits WHERE username = ? AND id = ?',
+                            [(username, deposit_id) for deposit_id in op['ids']]
+                        )
+                    else:
+                        raise ValueError(f"不支援的批次操作: {kind}")
+            return True
+        except RevisionConflict:
+            raise
+        except Exception as e:
+            print(f"儲存寄杯錯誤: {e}")
+            return False
+
+    def find_expiring(self, start_date, end_date):
+        """跨使用者查詢到期日落在 [start_date, end_date] 的寄杯"""
+        rows = self._conn().execute(
+            f'SELECT username, {_SELECT_DEPOSIT} FROM deposits '
+            'WHERE expiry_date BETWEEN ? AND ? ORDER BY expiry_date',
+            (start_date, end_date)
+        )
+        return [(row[0], _row_to_deposit(row[1:])) for row in rows]
+
+    # === 統計彙總 ===
+
+    def load_stats(self, username):
+        row = self._conn().execute('SELECT data FROM user_stats WHERE username = ?', (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_stats(self, username, stats):
+        try:
+            with self._write() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO user_stats (username, data) VALUES (?, ?)',
+                    (username, json.dumps(stats, ensure_ascii=False))
+                )
+            return True
+        except Exception as e:
+            print(f"儲存統計錯誤: {e}")
+            return False
@@ -0,0 +1,76 @@
+# src/services/deposit_query.py
+
+import math
+from collections import namedtuple
+import numpy as np
+from ..config import settings, ui_config
+from ..utils import date_utils
+from . import storage
+
+# 寄杯列表的查詢（篩選、排序、分頁），介面（ui/view_model）與 JSON API 共用
+
+# 列表篩選與分頁條件；page 從 1 開始
+ViewQuery = namedtuple(
+    'ViewQuery',
+    ['status', 'store', 'method', 'page_size', 'page'],
+    defaults=(ui_config.FILTER_ALL, ui_config.FILTER_ALL, ui_config.FILTER_ALL, settings.PAGE_SIZE, 1)
+)
+
+# 一次查詢的結果：全部記錄（依到期日排序）與其狀態、讀取時的修訂號，以及篩選後當頁的記錄與分頁資訊
+DepositPage = namedtuple(
+    'DepositPage',
+    ['deposits', 'statuses', 'revision', 'total', 'page_deposits', 'page_statuses', 'page', 'pages', 'start', 'end']
+)
+
+def make_query(status=None, store=None, method=None, page_size=None, page=None):
+    """由 UI 元件或 API 參數的值建立查詢條件，空值視為不篩選/預設值"""
+    try:
+        page_size = max(1, int(page_size))
+    except (TypeError, ValueError):
+        page_size = settings.PAGE_SIZE
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        page = 1
+    return ViewQuery(
+        status or ui_config.FILTER_ALL,
+        store or ui_config.FILTER_ALL,
+        method or ui_config.FILTER_ALL,
+        page_size,
+        page
+    )
+
+def filter_deposits(deposits, statuses, query):
+    """依到期狀態、商店、兌換途徑篩選，回傳 (記錄, 狀態陣列)"""
+    keep = np.ones(len(deposits), dtype=bool)
+    if query.status != ui_config.FILTER_ALL:
+        keep &= statuses == query.status
+    if query.store != ui_config.FILTER_ALL:
+        keep &= np.fromiter((d.get('store') == query.store for d in deposits), dtype=bool, count=len(deposits))
+    if query.method != ui_config.FILTER_ALL:
+        keep &= np.fromiter((d.get('redeemMethod') == query.method for d in deposits), dtype=bool, count=len(deposits))
+    if keep.all():
+        return deposits, statuses
+    indices = np.flatnonzero(keep)
+    return [deposits[i] for i in indices], statuses[indices]
+
+def paginate(total, page_size, page):
+    """回傳 (頁碼, 總頁數, 起始索引, 結束索引)；頁碼超出範圍時夾回有效範圍"""
+    pages = max(1, math.ceil(total / page_size))
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return page, pages, start, min(start + page_size, total)
+
+def query_deposits(username, query, today=None):
+    """讀取一次使用者的寄杯記錄，依到期日排序、分類一次，再篩選出查詢的那一頁"""
+    today = today or date_utils.today()
+    deposits, revision = storage.load_versioned(username)
+    deposits.sort(key=lambda x: x.get('expiryDate', '9999-12-31'))
+    statuses, _ = date_utils.classify_deposits(deposits, today)
+    matched, matched_statuses = filter_deposits(deposits, statuses, query)
+    page, pages, start, end = paginate(len(matched), query.page_size, query.page)
+    return DepositPage(
+        deposits, statuses, revision, len(matched),
+        matched[start:end], matched_statuses[start:end],
+        page, pages, start, end
+    )
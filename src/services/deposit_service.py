@@ -1,12 +1,48 @@
 # src/services/deposit_service.py
 
+import functools
+import re
 import gradio as gr
 from datetime import datetime, timedelta
-from . import storage
-from ..utils import date_utils
+from . import expiry_index, stats_store, storage
+from ..utils import date_utils, ids
 
-# 全域變數用於儲存 label 到 id 的映射
-deposit_label_to_id = {}
+class DepositError(Exception):
+    """寄杯操作失敗：code 為錯誤種類（ERROR_*），message 為顯示給使用者的訊息"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+ERROR_UNAUTHORIZED = 'unauthorized'  # 未登入
+ERROR_INVALID = 'invalid'            # 欄位空白或格式錯誤
+ERROR_NOT_FOUND = 'not_found'        # 找不到記錄
+ERROR_CONFLICT = 'conflict'          # 記錄目前的狀態不允許（例如杯數不足）
+ERROR_SAVE_FAILED = 'save_failed'    # 寫入失敗（含版本衝突重試用盡）
+
+def _message_result(fn):
+    """介面用的包裝：回傳 (訊息, None, None, None)，DepositError 轉為它的訊息
+
+    原函式成功時回傳訊息、失敗時拋出 DepositError，以 .strict 提供給需要錯誤種類的呼叫端（JSON API）。
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            message = fn(*args, **kwargs)
+        except DepositError as e:
+            message = e.message
+        return message, None, None, None
+    wrapper.strict = fn
+    return wrapper
+
+# 下拉選單中的到期狀態標籤
+STATUS_TAGS = {
+    date_utils.STATUS_EXPIRED: " [已過期]",
+    date_utils.STATUS_TODAY: " [今天到期]",
+    date_utils.STATUS_SOON: " [即將到期]"
+}
 
 def toggle_expiry_input(method):
     """切換到期日輸入方式"""
@@ -18,61 +54,75 @@ def toggle_expiry_input(method):
 def get_deposit_choices(username):
     """取得寄杯記錄選項"""
     if not username:
-        return gr.update(choices=[], value=None)
+        return gr.update(choices=[], value=[])
     
     deposits = storage.load_deposits(username)
+    statuses, _ = date_utils.classify_deposits(deposits)
+    return build_deposit_choices(deposits, statuses)
+
+def build_deposit_choices(deposits, statuses):
+    """以已分類的記錄產生寄杯記錄選項"""
     if not deposits:
-        return gr.update(choices=[], value=None)
+        return gr.update(choices=[], value=[])
     
-    global deposit_label_to_id
-    deposit_label_to_id = {}
     choices_list = []
     
-    for d in deposits:
+    for d, status in zip(deposits, statuses):
         # 判斷狀態標籤
-        if date_utils.is_expired(d['expiryDate']):
-            status_tag = " [已過期]"
-        elif date_utils.is_expiring_today(d['expiryDate']):
-            status_tag = " [今天到期]"
-        elif date_utils.is_expiring_soon(d['expiryDate']):
-            status_tag = " [即將到期]"
-        else:
-            status_tag = ""
+        status_tag = STATUS_TAGS.get(status, "")
         
         label = f"{d['item']} - {d['store']} ({d['quantity']}杯) - 到期:{date_utils.format_date(d['expiryDate'])}{status_tag}"
         
-        deposit_label_to_id[label] = d['id']
-        choices_list.append(label)
+        # 選項值直接帶 deposit id，不依賴共用的 label 對照表，相同 label 也不會互相覆蓋
+        choices_list.append((label, d['id']))
     
-    return gr.update(choices=choices_list, value=None)
+    return gr.update(choices=choices_list, value=[])
+
+def _index_by_id(deposits):
+    """以 plan 收到的快照建立 id -> 記錄 對照表；每個 plan 開頭建立一次，之後的查詢為 O(1)"""
+    return {d.get('id'): d for d in deposits}
 
+@_message_result
 def add_deposit(username, item, quantity, store, redeem_method, expiry_method, expiry_date, days_until):
     """新增寄杯記錄"""
+    items = [item] if item and item.strip() else []
+    return _add_items(username, items, quantity, store, redeem_method, expiry_method, expiry_date, days_until)
+
+@_message_result
+def add_many(username, items_text, quantity, store, redeem_method, expiry_method, expiry_date, days_until):
+    """一次新增多個品項（以逗號、頓號或換行分隔，或直接傳入品項列表），其他欄位共用，整批寫入一次"""
+    if isinstance(items_text, (list, tuple)):
+        items = [name for name in items_text if name and name.strip()]
+    else:
+        items = [name for name in re.split(r'[,，、\n]', items_text or '') if name.strip()]
+    return _add_items(username, items, quantity, store, redeem_method, expiry_method, expiry_date, days_until)
+
+def _add_items(username, items, quantity, store, redeem_method, expiry_method, expiry_date, days_until):
     if not username:
-        return "❌ 請先登入", None, None, None
+        raise DepositError(ERROR_UNAUTHORIZED, "❌ 請先登入")
     
-    if not all([item, store, redeem_method]):
-        return "❌ 請填寫所有欄位", None, None, None
+    if not all([items, store, redeem_method]):
+        raise DepositError(ERROR_INVALID, "❌ 請填寫所有欄位")
     
     # 處理到期日
     if expiry_method == "選擇日期":
         final_expiry_date = expiry_date
         if not final_expiry_date or final_expiry_date.strip() == "":
-            return "❌ 請選擇到期日", None, None, None
+            raise DepositError(ERROR_INVALID, "❌ 請選擇到期日")
     else:
         if not days_until or days_until < 1:
-            return "❌ 請輸入有效的天數（至少 1 天）", None, None, None
+            raise DepositError(ERROR_INVALID, "❌ 請輸入有效的天數（至少 1 天）")
         try:
-            final_expiry_date = (datetime.now() + timedelta(days=int(days_until))).strftime('%Y-%m-%d')
+            final_expiry_date = (date_utils.today() + timedelta(days=int(days_until))).strftime('%Y-%m-%d')
         except:
-            return "❌ 天數格式錯誤", None, None, None
+            raise DepositError(ERROR_INVALID, "❌ 天數格式錯誤")
     
     try:
         quantity = int(quantity)
         if quantity < 1:
-            return "❌ 數量必須大於 0", None, None, None
+            raise DepositError(ERROR_INVALID, "❌ 數量必須大於 0")
     except:
-        return "❌ 數量格式錯誤", None, None, None
+        raise DepositError(ERROR_INVALID, "❌ 數量格式錯誤")
     
     # 驗證並清理日期格式
     try:
@@ -88,86 +138,232 @@ def add_deposit(username, item, quantity, store, redeem_method, expiry_method, e
         elif hasattr(final_expiry_date, 'strftime'):
             final_expiry_date = final_expiry_date.strftime('%Y-%m-%d')
         else:
-            return "❌ 日期格式錯誤", None, None, None
+            raise DepositError(ERROR_INVALID, "❌ 日期格式錯誤")
     except Exception as e:
         print(f"日期處理錯誤: {e}, 收到的日期: {final_expiry_date}")
-        return f"❌ 日期格式錯誤（請確認已選擇日期）", None, None, None
+        raise DepositError(ERROR_INVALID, f"❌ 日期格式錯誤（請確認已選擇日期）")
     
-    deposits = storage.load_deposits(username)
-    new_deposit = {
-        'id': str(int(datetime.now().timestamp() * 1000)),
-        'item': item.strip(),
-        'quantity': quantity,
-        'store': store,
-        'redeemMethod': redeem_method,
-        'expiryDate': final_expiry_date,
-        'createdAt': datetime.now().isoformat()
-    }
-    deposits.append(new_deposit)
-    
-    if storage.save_deposits(username, deposits):
-        return "✅ 新增成功！", None, None, None
-    else:
-        return "❌ 儲存失敗", None, None, None
+    now = datetime.now()
+    # id 為單調遞增的 ULID：同一毫秒內的多筆（批次新增、重複送出）也不會重複
+    new_deposits = [
+        {
+            'id': ids.new_id(),
+            'item': item.strip(),
+            'quantity': quantity,
+            'store': store,
+            'redeemMethod': redeem_method,
+            'expiryDate': final_expiry_date,
+            'createdAt': now.isoformat()
+        }
+        for item in items
+    ]
+    with stats_store.stats.mutation(username) as delta:
+        ok, _ = storage.mutate_deposits(
+            username, lambda deposits: ([{'op': 'add', 'deposits': new_deposits}], None), on_commit=delta.committed
+        )
+        if not ok:
+            raise DepositError(ERROR_SAVE_FAILED, "❌ 儲存失敗")
+        delta.added(new_deposits)
+    expiry_index.index.add(username, new_deposits)
+    if len(new_deposits) == 1:
+        return "✅ 新增成功！"
+    return f"✅ 已新增 {len(new_deposits)} 筆記錄"
 
-def redeem_one(username, deposit_label):
+@_message_result
+def redeem_one(username, deposit_id):
     """兌換一杯"""
     if not username:
-        return "❌ 請先登入", None, None, None
-    
-    if not deposit_label:
-        return "❌ 請選擇要兌換的記錄", None, None, None
+        raise DepositError(ERROR_UNAUTHORIZED, "❌ 請先登入")
     
-    deposit_id = deposit_label_to_id.get(deposit_label)
     if not deposit_id:
-        return "❌ 找不到該記錄", None, None, None
+        raise DepositError(ERROR_INVALID, "❌ 請選擇要兌換的記錄")
     
-    deposits = storage.load_deposits(username)
-    updated = False
-    deposit_name = ""
-    
-    for i, deposit in enumerate(deposits):
-        if deposit['id'] == deposit_id:
-            deposit_name = deposit['item']
-            if deposit['quantity'] > 1:
-                deposits[i]['quantity'] -= 1
-                message = f"✅ 已兌換一杯 {deposit_name}，剩餘 {deposits[i]['quantity']} 杯"
-            else:
-                deposits = [d for d in deposits if d['id'] != deposit_id]
-                message = f"✅ 已兌換最後一杯 {deposit_name}，記錄已刪除"
-            updated = True
-            break
+    def plan(deposits):
+        deposit = _index_by_id(deposits).get(deposit_id)
+        if deposit is None:
+            return [], None
+        # 只更新/刪除這一筆，不必整批覆寫使用者的所有記錄
+        if deposit['quantity'] > 1:
+            return [{'op': 'update', 'id': deposit_id, 'changes': {'quantity': deposit['quantity'] - 1}}], deposit
+        return [{'op': 'delete', 'ids': [deposit_id]}], deposit
     
-    if updated:
-        storage.save_deposits(username, deposits)
-        return message, None, None, None
-    else:
-        return "❌ 找不到該記錄", None, None, None
+    # 寫入以修訂號比對，其他分頁/裝置搶先寫入時以最新資料重新計算；
+    # 寫入所依據的修訂號交給統計彙總，用來判斷能否以增量更新
+    with stats_store.stats.mutation(username) as delta:
+        ok, deposit = storage.mutate_deposits(username, plan, on_commit=delta.committed)
+        if deposit is None:
+            raise DepositError(ERROR_NOT_FOUND, "❌ 找不到該記錄")
+        if not ok:
+            raise DepositError(ERROR_SAVE_FAILED, "❌ 儲存失敗")
+        
+        deposit_name = deposit['item']
+        if deposit['quantity'] > 1:
+            delta.redeemed(deposit)
+            message = f"✅ 已兌換一杯 {deposit_name}，剩餘 {deposit['quantity'] - 1} 杯"
+        else:
+            delta.removed([deposit])
+            expiry_index.index.remove(username, [deposit_id])
+            message = f"✅ 已兌換最後一杯 {deposit_name}，記錄已刪除"
+    
+    return message
 
-def delete_deposit(username, deposit_label):
+@_message_result
+def delete_deposit(username, deposit_id):
     """刪除寄杯記錄"""
     if not username:
-        return "❌ 請先登入", None, None, None
+        raise DepositError(ERROR_UNAUTHORIZED, "❌ 請先登入")
     
-    if not deposit_label:
-        return "❌ 請選擇要刪除的記錄", None, None, None
-    
-    deposit_id = deposit_label_to_id.get(deposit_label)
     if not deposit_id:
-        return "❌ 找不到該記錄", None, None, None
+        raise DepositError(ERROR_INVALID, "❌ 請選擇要刪除的記錄")
     
-    deposits = storage.load_deposits(username)
-    deposit_name = ""
+    def plan(deposits):
+        deposit = _index_by_id(deposits).get(deposit_id)
+        if deposit is None:
+            return [], None
+        return [{'op': 'delete', 'ids': [deposit_id]}], deposit
+    
+    with stats_store.stats.mutation(username) as delta:
+        ok, deposit = storage.mutate_deposits(username, plan, on_commit=delta.committed)
+        if deposit is None:
+            raise DepositError(ERROR_NOT_FOUND, "❌ 找不到該記錄")
+        if not ok:
+            raise DepositError(ERROR_SAVE_FAILED, "❌ 儲存失敗")
+        delta.removed([deposit])
+    expiry_index.index.remove(username, [deposit_id])
+    
+    return f"✅ 已刪除 {deposit['item']} 的記錄"
+
+def _selected_ids(deposit_ids):
+    """多選下拉選單的值（單一 id 或 id 列表）轉為不重複的 id 列表"""
+    if not deposit_ids:
+        return []
+    if isinstance(deposit_ids, str):
+        deposit_ids = [deposit_ids]
+    return list(dict.fromkeys(deposit_ids))
+
+def _plan_redeem(ids, cups):
+    """兌換的純函式：回傳 plan(deposits) -> (ops, (DepositError 或 None, 用完的記錄, [(記錄, 扣除杯數)]))"""
+    def plan(deposits):
+        by_id = _index_by_id(deposits)
+        selected = [by_id.get(deposit_id) for deposit_id in ids]
+        if any(d is None for d in selected):
+            return [], (DepositError(ERROR_NOT_FOUND, "❌ 找不到該記錄"), [], [])
+        
+        available = sum(d['quantity'] for d in selected)
+        if cups > available:
+            return [], (DepositError(ERROR_CONFLICT, f"❌ 選取的記錄只剩 {available} 杯"), [], [])
+        
+        # 先扣未過期的記錄、依到期日由近到遠，已過期的最後才扣；用完的記錄整筆刪除
+        statuses, _ = date_utils.classify_deposits(selected)
+        order = sorted(
+            range(len(selected)),
+            key=lambda i: (statuses[i] == date_utils.STATUS_EXPIRED, selected[i].get('expiryDate', '9999-12-31'))
+        )
+        selected = [selected[i] for i in order]
+        ops = []
+        used_up = []
+        redeemed = []
+        left = cups
+        for deposit in selected:
+            if left == 0:
+                break
+            take = min(deposit['quantity'], left)
+            left -= take
+            if take == deposit['quantity']:
+                used_up.append(deposit)
+            else:
+                ops.append({'op': 'update', 'id': deposit['id'], 'changes': {'quantity': deposit['quantity'] - take}})
+                redeemed.append((deposit, take))
+        if used_up:
+            ops.append({'op': 'delete', 'ids': [d['id'] for d in used_up]})
+        return ops, (None, used_up, redeemed)
+    return plan
+
+@_message_result
+def redeem_many(username, deposit_ids, cups=1):
+    """從選取的記錄中兌換 cups 杯（先扣未過期中最早到期的），整批寫入一次"""
+    if not username:
+        raise DepositError(ERROR_UNAUTHORIZED, "❌ 請先登入")
+    
+    ids = _selected_ids(deposit_ids)
+    if not ids:
+        raise DepositError(ERROR_INVALID, "❌ 請選擇要兌換的記錄")
     
-    for d in deposits:
-        if d['id'] == deposit_id:
-            deposit_name = d['item']
-            break
+    try:
+        cups = int(cups)
+        if cups < 1:
+            raise DepositError(ERROR_INVALID, "❌ 兌換杯數必須大於 0")
+    except (TypeError, ValueError):
+        raise DepositError(ERROR_INVALID, "❌ 兌換杯數格式錯誤")
+    
+    with stats_store.stats.mutation(username) as delta:
+        ok, result = storage.mutate_deposits(username, _plan_redeem(ids, cups), on_commit=delta.committed)
+        if result is None:
+            raise DepositError(ERROR_SAVE_FAILED, "❌ 儲存失敗")
+        error, used_up, redeemed = result
+        if error:
+            raise error
+        if not ok:
+            raise DepositError(ERROR_SAVE_FAILED, "❌ 儲存失敗")
+        delta.removed(used_up)
+        for deposit, take in redeemed:
+            delta.redeemed(deposit, take)
+    
+    if used_up:
+        expiry_index.index.remove(username, [d['id'] for d in used_up])
+        return f"✅ 已兌換 {cups} 杯，其中 {len(used_up)} 筆記錄已用完並刪除"
+    return f"✅ 已兌換 {cups} 杯"
+
+def _delete_where(username, select):
+    """刪除 select(deposits) 挑出的記錄，以修訂號比對整批寫入一次；回傳 (是否成功, 被刪除的記錄)"""
+    def plan(deposits):
+        chosen = select(deposits)
+        return ([{'op': 'delete', 'ids': [d['id'] for d in chosen]}] if chosen else []), chosen
+    
+    with stats_store.stats.mutation(username) as delta:
+        ok, chosen = storage.mutate_deposits(username, plan, on_commit=delta.committed)
+        if ok and chosen:
+            delta.removed(chosen)
+    if ok and chosen:
+        expiry_index.index.remove(username, [d['id'] for d in chosen])
+    return ok, chosen
+
+@_message_result
+def delete_many(username, deposit_ids):
+    """刪除所有選取的記錄，整批寫入一次"""
+    if not username:
+        raise DepositError(ERROR_UNAUTHORIZED, "❌ 請先登入")
+    
+    ids = _selected_ids(deposit_ids)
+    if not ids:
+        raise DepositError(ERROR_INVALID, "❌ 請選擇要刪除的記錄")
+    
+    ok, selected = _delete_where(
+        username,
+        lambda deposits: [d for d in map(_index_by_id(deposits).get, ids) if d is not None]
+    )
+    if not selected:
+        raise DepositError(ERROR_NOT_FOUND, "❌ 找不到該記錄")
+    if not ok:
+        raise DepositError(ERROR_SAVE_FAILED, "❌ 儲存失敗")
+    return f"✅ 已刪除 {len(selected)} 筆記錄"
+
+@_message_result
+def delete_expired(username):
+    """刪除所有已過期的記錄，整批寫入一次"""
+    if not username:
+        raise DepositError(ERROR_UNAUTHORIZED, "❌ 請先登入")
     
-    deposits = [d for d in deposits if d['id'] != deposit_id]
-    storage.save_deposits(username, deposits)
+    def select(deposits):
+        statuses, _ = date_utils.classify_deposits(deposits)
+        return [d for d, status in zip(deposits, statuses) if status == date_utils.STATUS_EXPIRED]
     
-    return f"✅ 已刪除 {deposit_name} 的記錄", None, None, None
+    ok, expired = _delete_where(username, select)
+    if not expired:
+        return "ℹ️ 沒有已過期的記錄"
+    if not ok:
+        raise DepositError(ERROR_SAVE_FAILED, "❌ 儲存失敗")
+    return f"✅ 已刪除 {len(expired)} 筆過期記錄"
 
 def refresh_display(username):
     """重新整理顯示"""
@@ -0,0 +1,121 @@
+# src/services/expiry_index.py
+
+import heapq
+import threading
+from datetime import timedelta
+from . import storage
+from ..utils import date_utils
+
+
+class ExpiryIndex:
+    """跨使用者的到期索引
+
+    以到期日為單位分桶（每日一格的 time-wheel）：date -> {(username, id): 品項}，
+    另以 min-heap 記錄有資料的日期，可直接找到最早的到期日。
+    查詢某段期間的到期記錄只需走訪該期間的日期桶，成本為 O(天數 + 符合筆數)，不必讀取任何使用者檔案。
+    啟動時在背景從儲存層建立一次，之後由 deposit_service 在新增/兌換/刪除時同步維護。
+    """
+
+    def __init__(self, iter_all_fn):
+        self._iter_all_fn = iter_all_fn
+        self._buckets = {}   # 到期日 date -> {(username, deposit_id): item}
+        self._where = {}     # (username, deposit_id) -> 到期日 date
+        self._days = []      # 有資料的到期日（min-heap，空桶延遲刪除，舊項目過多時重建）
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._removed_during_build = set()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.build, name='expiry-index', daemon=True)
+        self._thread.start()
+        return self
+
+    def build(self):
+        count = 0
+        for username, deposit in self._iter_all_fn():
+            key = (username, deposit.get('id'))
+            with self._lock:
+                # 建索引期間已被移除或已由 add 加入的記錄不再覆蓋
+                if key in self._removed_during_build or key in self._where:
+                    continue
+                if self._insert(key, deposit):
+                    count += 1
+        with self._lock:
+            self._removed_during_build = set()
+            self._ready.set()
+        print(f"到期索引建立完成，共 {count} 筆")
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def _insert(self, key, deposit):
+        expiry = date_utils.parse_date(deposit.get('expiryDate'))
+        if expiry is None:
+            return False
+        bucket = self._buckets.get(expiry)
+        if bucket is None:
+            bucket = self._buckets[expiry] = {}
+            heapq.heappush(self._days, expiry)
+        bucket[key] = deposit.get('item', '')
+        self._where[key] = expiry
+        return True
+
+    def _discard(self, key):
+        expiry = self._where.pop(key, None)
+        if expiry is None:
+            return
+        bucket = self._buckets.get(expiry)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._buckets[expiry]
+                # 空桶在 heap 中的舊項目累積過多（新增/刪除反覆進出同一天）時重建，避免 heap 無限成長
+                if len(self._days) > 2 * len(self._buckets) + 64:
+                    self._days = list(self._buckets)
+                    heapq.heapify(self._days)
+
+    def add(self, username, deposits):
+        """加入（或更新）一位使用者的多筆記錄"""
+        with self._lock:
+            for deposit in deposits:
+                key = (username, deposit.get('id'))
+                self._discard(key)
+                self._insert(key, deposit)
+
+    def remove(self, username, deposit_ids):
+        """移除一位使用者的多筆記錄"""
+        with self._lock:
+            for deposit_id in deposit_ids:
+                key = (username, deposit_id)
+                self._discard(key)
+                if not self._ready.is_set():
+                    self._removed_during_build.add(key)
+
+    def due(self, start, end):
+        """回傳到期日介於 start 與 end（含）之間的 [(到期日, username, deposit_id, item)]，依到期日排序"""
+        result = []
+        with self._lock:
+            day = start
+            while day <= end:
+                bucket = self._buckets.get(day)
+                if bucket:
+                    result.extend((day, username, deposit_id, item) for (username, deposit_id), item in bucket.items())
+                day += timedelta(days=1)
+        return result
+
+    def next_expiry(self):
+        """最早的到期日（沒有記錄時為 None）"""
+        with self._lock:
+            while self._days and self._days[0] not in self._buckets:
+                heapq.heappop(self._days)
+            return self._days[0] if self._days else None
+
+    def __len__(self):
+        return len(self._where)
+
+
+index = ExpiryIndex(storage.iter_all_deposits).start()
@@ -0,0 +1,142 @@
+# src/services/hydration.py
+
+import os
+import shutil
+import threading
+import time
+from .locks import StripedLock
+
+# 啟動時的資料同步（hydration）
+#
+# 'eager'：啟動時同步下載全部資料後才繼續（舊行為）
+# 'lazy' ：立即以本機現有資料開始服務，背景下載全部資料；
+#          某位使用者第一次被存取時，先單獨下載他的檔案
+# 'off'  ：不從遠端同步
+#
+# 背景合併時會略過已經按需下載過（之後可能已在本機修改）的檔案，避免舊資料覆蓋新資料。
+#
+# 下載全部資料失敗（state 為 'failed'）時不算就緒：按需下載照常進行，背景以遞增間隔重試，
+# 背景上傳也會等到 state 為 'ready' 才開始，避免本機空白或過時的檔案覆蓋遠端資料。
+
+
+class Hydrator:
+    def __init__(self, remote, local_dir, mode='lazy', retry_initial=5, retry_max=300):
+        self.remote = remote
+        self.local_dir = local_dir
+        self.mode = mode
+        self.retry_initial = retry_initial  # 下載全部資料失敗後第一次重試的等待秒數，之後每次加倍
+        self.retry_max = retry_max
+        self._fetched = set()  # 已從遠端取得或已確認的相對路徑
+        self._locks = StripedLock(64)
+        self._ready = threading.Event()    # 全部資料已同步（或不需同步）
+        self._settled = threading.Event()  # 第一次嘗試已結束（成功或失敗）
+        self._thread = None
+        self._status = {
+            'mode': mode,
+            'state': 'pending',
+            'files_hydrated': 0,
+            'on_demand_fetches': 0,
+            'attempts': 0,
+            'error': None,
+            'started_at': None,
+            'finished_at': None
+        }
+
+    def start(self):
+        """依模式開始同步；'eager' 會阻塞直到完成"""
+        if self.mode == 'off':
+            self._finish('ready')
+        elif self.mode == 'eager':
+            if not self.hydrate_all():
+                self._start_thread()
+        else:
+            self._start_thread()
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._run, name='hydration', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """下載全部資料直到成功，失敗時以加倍的間隔重試"""
+        delay = self.retry_initial
+        while not self._ready.is_set() and not self.hydrate_all():
+            time.sleep(delay)
+            delay = min(delay * 2, self.retry_max)
+
+    def hydrate_all(self):
+        """下載全部資料並合併到本機，回傳是否成功"""
+        self._status['state'] = 'hydrating'
+        self._status['attempts'] += 1
+        self._status['started_at'] = time.time()
+        print("正在從 Dataset 同步資料...")
+        try:
+            snapshot_dir = self.remote.snapshot()
+            for root, _, files in os.walk(snapshot_dir):
+                for name in files:
+                    src = os.path.join(root, name)
+                    relpath = os.path.relpath(src, snapshot_dir).replace(os.sep, '/')
+                    if relpath.startswith('.'):  # .gitattributes、.cache 等
+                        continue
+                    self._merge(relpath, src)
+            print("資料同步完成")
+            self._status['error'] = None
+            self._finish('ready')
+            return True
+        except Exception as e:
+            print(f"從 Dataset 同步資料失敗，稍後重試: {e}")
+            self._status['error'] = str(e)
+            # 遠端不可用時仍以本機資料與按需下載繼續服務，但不視為就緒
+            self._finish('failed')
+            return False
+
+    def _merge(self, relpath, src):
+        with self._locks.for_key(relpath):
+            if relpath in self._fetched:
+                return
+            target = os.path.join(self.local_dir, relpath)
+            os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+            tmp_path = f'{target}.fetch.tmp'
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, target)
+            self._fetched.add(relpath)
+            self._status['files_hydrated'] += 1
+
+    def _finish(self, state):
+        self._status['state'] = state
+        self._status['finished_at'] = time.time()
+        if state == 'ready':
+            self._ready.set()
+        self._settled.set()
+
+    def ensure(self, relpaths):
+        """確保這些檔案已從遠端取得；背景同步完成後直接返回
+
+        下載失敗（例如遠端暫時無法連線）時使用本機資料，下次存取時再試。
+        """
+        if self._ready.is_set():
+            return
+        for relpath in relpaths:
+            if relpath in self._fetched:
+                continue
+            with self._locks.for_key(relpath):
+                if relpath in self._fetched:
+                    continue
+                try:
+                    if self.remote.fetch(relpath, os.path.join(self.local_dir, relpath)):
+                        self._status['on_demand_fetches'] += 1
+                except Exception as e:
+                    print(f"按需下載 {relpath} 失敗，使用本機資料: {e}")
+                    continue
+                self._fetched.add(relpath)
+
+    def is_ready(self):
+        """全部資料是否已同步；背景上傳以此為準，失敗時為 False"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """等待第一次同步結束；失敗時不再等待重試，改以本機資料繼續（回傳 False）"""
+        self._settled.wait(timeout)
+        return self._ready.is_set()
+
+    def status(self):
+        return {**self._status, 'ready': self._ready.is_set()}
@@ -0,0 +1,98 @@
+# src/services/id_migration.py
+
+import threading
+from ..config import settings
+from ..utils import ids
+from . import expiry_index, storage
+from .backends import RevisionConflict
+
+
+def _legacy_timestamp(deposit_id):
+    """舊版 id 為毫秒時間戳字串，回傳其毫秒數；不是舊版格式時回傳 None"""
+    if isinstance(deposit_id, str) and deposit_id.isdigit() and 12 <= len(deposit_id) <= 14:
+        return int(deposit_id)
+    return None
+
+def normalize_ids(deposits):
+    """將舊版時間戳 id 轉為同一時間的 ULID，並為重複或空白的 id 重新編號
+
+    舊版 id 保留原本的毫秒時間，轉換後依 id 排序仍是建立順序；
+    重複的 id 由第一筆保留，其餘各自取得新 id。其他格式的 id（例如匯入時指定的）不變。
+    回傳 (新的記錄列表, 被換掉的舊 id 集合)；不需要變更時集合為空。
+    """
+    seen = set()
+    replaced = set()
+    result = []
+    for deposit in deposits:
+        old_id = deposit.get('id')
+        new_id = old_id
+        legacy_ms = _legacy_timestamp(old_id)
+        if legacy_ms is not None:
+            new_id = ids.id_for_timestamp(legacy_ms)
+        elif not old_id or old_id in seen:
+            new_id = ids.new_id()
+        seen.add(old_id)
+        if new_id != old_id:
+            replaced.add(old_id)
+            deposit = {**deposit, 'id': new_id}
+        result.append(deposit)
+    return result, replaced
+
+# 完成後記錄在 storage 的遷移標記中，之後啟動不再掃描
+MIGRATION_NAME = 'ulid-ids'
+
+def migrate_user(username):
+    """遷移一位使用者的寄杯 id，回傳被換掉的舊 id 數；期間有其他異動而放棄時回傳 None"""
+    _, replaced = normalize_ids(storage.load_deposits(username))
+    if not replaced:
+        return 0
+    # 以修訂號比對後覆寫，期間有其他異動時放棄，下次啟動再遷移（不記錄完成）；
+    # 記錄內容不變，統計彙總下次讀取時因修訂號改變而重算一次
+    deposits, revision = storage.load_versioned(username)
+    deposits, replaced = normalize_ids(deposits)
+    if not replaced:
+        return 0
+    try:
+        if not storage.save_deposits(username, deposits, expected_revision=revision):
+            return None
+    except RevisionConflict:
+        return None
+    expiry_index.index.remove(username, replaced)
+    expiry_index.index.add(username, deposits)
+    return len(replaced)
+
+def migrate_all():
+    """遷移所有使用者，回傳 (遷移的使用者數, 換掉的 id 數)
+
+    已完成過時直接略過；所有使用者都遷移成功後才記錄完成，有失敗時下次啟動再試。
+    """
+    if storage.migration_done(MIGRATION_NAME):
+        return 0, 0
+    users = 0
+    total = 0
+    complete = True
+    for username in storage.list_usernames():
+        try:
+            count = migrate_user(username)
+        except Exception as e:
+            print(f"id 遷移失敗（{username}）: {e}")
+            complete = False
+            continue
+        if count is None:
+            complete = False
+        elif count:
+            users += 1
+            total += count
+    if total:
+        print(f"id 遷移完成：{users} 位使用者，{total} 筆記錄取得新 id")
+    if complete:
+        storage.mark_migration_done(MIGRATION_NAME)
+    return users, total
+
+def start():
+    """ID_MIGRATION 開啟時在背景執行 migrate_all，回傳執行緒（未啟動時為 None）"""
+    if not settings.ID_MIGRATION:
+        return None
+    thread = threading.Thread(target=migrate_all, name='id-migration', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,22 @@
+# src/services/locks.py
+
+import threading
+import zlib
+
+
+class StripedLock:
+    """分段鎖：以 key（使用者名稱或檔案路徑）雜湊到固定數量的鎖之一
+
+    不同使用者的寫入大多落在不同的鎖上，可以同時進行；
+    同一個 key 永遠對應同一把鎖，保證對同一個檔案的寫入依序執行。
+    """
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(max(1, stripes))]
+
+    def for_key(self, key):
+        # 使用 crc32 而非內建 hash，讓對應關係在不同行程間也保持一致
+        return self._locks[zlib.crc32(str(key).encode('utf-8')) % len(self._locks)]
+
+    def __len__(self):
+        return len(self._locks)
@@ -0,0 +1,121 @@
+# src/services/reminders.py
+
+import json
+import os
+import threading
+from datetime import timedelta
+from ..config import settings
+from ..utils import date_utils
+from . import expiry_index
+
+
+class LogSink:
+    """將到期提醒輸出到 log"""
+
+    def send(self, reminder):
+        print(f"⏰ 到期提醒: {reminder['username']} 的 {reminder['item']} 將於 {reminder['expiryDate']} 到期（剩 {reminder['daysLeft']} 天）")
+
+
+class FileSink:
+    """將到期提醒以一行一筆 JSON 附加寫入檔案"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminder):
+        line = json.dumps(reminder, ensure_ascii=False) + '\n'
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def create_sinks(config):
+    """依 REMINDER_SINKS（逗號分隔：log、file）建立提醒輸出"""
+    sinks = []
+    for name in config.REMINDER_SINKS.split(','):
+        name = name.strip()
+        if name == 'log':
+            sinks.append(LogSink())
+        elif name == 'file':
+            sinks.append(FileSink(config.REMINDER_FILE))
+        elif name:
+            print(f"未知的提醒輸出 {name}，略過")
+    return sinks
+
+
+class ReminderScheduler:
+    """每日一次，從到期索引取出即將到期的記錄並送到各個 sink
+
+    每次只查詢 [今天, 今天 + lead_days] 的日期桶，成本與到期筆數成正比。
+    背景執行緒每隔 interval 秒檢查是否已換日，換日後才執行當天的提醒。
+    """
+
+    def __init__(self, index, sinks, lead_days=1, interval=60.0, clock=None):
+        self.index = index
+        self.sinks = list(sinks)
+        self.lead_days = lead_days
+        self.interval = interval
+        self._clock = clock
+        self._last_day = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def _today(self):
+        return self._clock.today() if self._clock is not None else date_utils.today()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='reminders', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.index.wait_ready()
+        while not self._stop.is_set():
+            today = self._today()
+            if today != self._last_day:
+                self.run_once(today)
+            self._stop.wait(self.interval)
+
+    def run_once(self, today=None):
+        """執行一次提醒，回傳送出的提醒筆數"""
+        today = today or self._today()
+        self._last_day = today
+        due = self.index.due(today, today + timedelta(days=self.lead_days))
+        for expiry, username, deposit_id, item in due:
+            reminder = {
+                'username': username,
+                'depositId': deposit_id,
+                'item': item,
+                'expiryDate': expiry.isoformat(),
+                'daysLeft': (expiry - today).days
+            }
+            for sink in self.sinks:
+                try:
+                    sink.send(reminder)
+                except Exception as e:
+                    print(f"提醒輸出失敗: {e}")
+        return len(due)
+
+
+reminders = ReminderScheduler(
+    expiry_index.index,
+    create_sinks(settings),
+    lead_days=settings.REMINDER_LEAD_DAYS,
+    interval=settings.REMINDER_CHECK_MINUTES * 60
+)
+
+def start():
+    """有設定提醒輸出（REMINDER_SINKS）時啟動每日提醒，回傳排程"""
+    if settings.REMINDER_SINKS.strip():
+        reminders.start()
+    return reminders
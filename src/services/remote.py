@@ -0,0 +1,121 @@
+# src/services/remote.py
+
+import os
+import shutil
+import tempfile
+from huggingface_hub import CommitOperationAdd, CommitOperationDelete, HfApi, hf_hub_download, snapshot_download
+from huggingface_hub.utils import EntryNotFoundError, RepositoryNotFoundError
+
+# 遠端資料來源：正式環境是 Hugging Face Dataset，測試時可以用本機資料夾代替。
+# 兩者提供相同介面：
+#   snapshot()              回傳一個包含遠端全部檔案的本機資料夾路徑
+#   fetch(relpath, target)  下載單一檔案到 target，遠端沒有該檔案時回傳 False
+#   upload(files, deletions) 上傳 {relpath: bytes} 並刪除 deletions 中的相對路徑
+
+def _copy_atomic(src, target):
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    tmp_path = f'{target}.fetch.tmp'
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, target)
+
+
+class HubRemote:
+    """Hugging Face Dataset 遠端"""
+
+    def __init__(self, repo_id, token=None, repo_type='dataset'):
+        self.repo_id = repo_id
+        self.token = token
+        self.repo_type = repo_type
+        self._api = HfApi(token=token)
+        self._repo_created = False
+
+    def snapshot(self):
+        try:
+            return snapshot_download(repo_id=self.repo_id, repo_type=self.repo_type, token=self.token)
+        except RepositoryNotFoundError:
+            # 第一次啟動、Dataset 尚未建立：視為空的遠端（第一次上傳時建立）
+            return tempfile.mkdtemp()
+
+    def fetch(self, relpath, target):
+        try:
+            cached = hf_hub_download(
+                repo_id=self.repo_id,
+                repo_type=self.repo_type,
+                filename=relpath,
+                token=self.token
+            )
+        except (EntryNotFoundError, RepositoryNotFoundError):
+            return False
+        _copy_atomic(cached, target)
+        return True
+
+    def upload(self, files, deletions=()):
+        if not self._repo_created:
+            self._api.create_repo(repo_id=self.repo_id, repo_type=self.repo_type, exist_ok=True)
+            self._repo_created = True
+        operations = [
+            CommitOperationAdd(path_in_repo=relpath, path_or_fileobj=content)
+            for relpath, content in files.items()
+        ]
+        # 遠端不存在的檔案不能刪除（例如建立後在上傳前就被壓縮掉的日誌）；
+        # 有刪除時取得一次遠端檔案清單在本機比對，不逐一查詢
+        if deletions:
+            remote_files = set(self._api.list_repo_files(self.repo_id, repo_type=self.repo_type))
+            operations += [
+                CommitOperationDelete(path_in_repo=relpath)
+                for relpath in deletions
+                if relpath in remote_files
+            ]
+        if not operations:
+            return
+        self._api.create_commit(
+            repo_id=self.repo_id,
+            repo_type=self.repo_type,
+            operations=operations,
+            commit_message="Scheduled Commit"
+        )
+
+    def __repr__(self):
+        return f'HubRemote({self.repo_id!r})'
+
+
+class LocalFolderRemote:
+    """以本機資料夾模擬 Dataset 遠端（開發與測試用）"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def snapshot(self):
+        return self.root
+
+    def fetch(self, relpath, target):
+        src = os.path.join(self.root, relpath)
+        if not os.path.isfile(src):
+            return False
+        _copy_atomic(src, target)
+        return True
+
+    def upload(self, files, deletions=()):
+        for relpath, content in files.items():
+            target = os.path.join(self.root, relpath)
+            os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+            tmp_path = f'{target}.upload.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, target)
+        for relpath in deletions:
+            try:
+                os.remove(os.path.join(self.root, relpath))
+            except FileNotFoundError:
+                pass
+
+    def __repr__(self):
+        return f'LocalFolderRemote({self.root!r})'
+
+
+def create_remote(settings):
+    """依設定建立遠端：DATA_REMOTE 指向本機資料夾時使用 LocalFolderRemote"""
+    if settings.DATA_REMOTE:
+        return LocalFolderRemote(settings.DATA_REMOTE)
+    return HubRemote(settings.DATA_REPO, token=settings.HF_TOKEN)
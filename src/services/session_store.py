@@ -0,0 +1,152 @@
+# src/services/session_store.py
+
+import atexit
+import heapq
+import threading
+from datetime import datetime, timedelta
+from ..config import settings
+from . import storage
+
+
+class SessionStore:
+    """記憶體中的 Session 索引
+
+    以 dict 做 O(1) 查詢，另以 expires_at 排序的 min-heap 追蹤到期時間；
+    過期的 Session 在查詢時或定期清理時移除（heap 中的舊項目採延遲刪除）。
+    異動先標記為 dirty，由背景執行緒合併後整批寫回儲存（write-behind）。
+    """
+
+    def __init__(self, load_fn, save_fn, flush_interval=2.0):
+        self._load_fn = load_fn
+        self._save_fn = save_fn
+        self.flush_interval = flush_interval
+        self._sessions = {}  # session_id -> 原始記錄（與 sessions.json 格式相同）
+        self._expires = {}   # session_id -> 到期時間 timestamp
+        self._heap = []      # (到期時間 timestamp, session_id)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._thread = None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for session_id, session in self._load_fn().items():
+                try:
+                    expires_at = datetime.fromisoformat(session['expires_at']).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self._put(session_id, session, expires_at)
+            self._loaded = True
+
+    def _put(self, session_id, session, expires_at):
+        self._sessions[session_id] = session
+        self._expires[session_id] = expires_at
+        heapq.heappush(self._heap, (expires_at, session_id))
+
+    def _remove(self, session_id):
+        self._sessions.pop(session_id, None)
+        self._expires.pop(session_id, None)
+        self._dirty = True
+
+    def create(self, session_id, username, ttl, kind=None):
+        """建立 Session；kind 標記種類（例如 API Token），瀏覽器的 Session 不帶 kind"""
+        self._ensure_loaded()
+        now = datetime.now()
+        expires = now + ttl
+        session = {
+            'username': username,
+            'created_at': now.isoformat(),
+            'expires_at': expires.isoformat()
+        }
+        if kind:
+            session['kind'] = kind
+        with self._lock:
+            self._put(session_id, session, expires.timestamp())
+            self._dirty = True
+        return session
+
+    def get(self, session_id, kind=None):
+        """回傳 Session 對應的使用者名稱；不存在、已過期或 kind 不符時回傳 None"""
+        self._ensure_loaded()
+        with self._lock:
+            expires_at = self._expires.get(session_id)
+            if expires_at is None:
+                return None
+            if datetime.now().timestamp() > expires_at:
+                self._remove(session_id)
+                return None
+            session = self._sessions[session_id]
+            if kind is not None and session.get('kind') != kind:
+                return None
+            return session['username']
+
+    def delete(self, session_id, kind=None):
+        """刪除 Session；指定 kind 時只刪除該種類的 Session"""
+        self._ensure_loaded()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and (kind is None or session.get('kind') == kind):
+                self._remove(session_id)
+
+    def purge_expired(self, now=None):
+        """移除所有已過期的 Session，回傳移除數量；成本只與過期數量相關"""
+        self._ensure_loaded()
+        now = now if now is not None else datetime.now().timestamp()
+        removed = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, session_id = heapq.heappop(self._heap)
+                # heap 中可能留有被覆蓋或已刪除 Session 的舊項目
+                if self._expires.get(session_id) == expires_at:
+                    self._remove(session_id)
+                    removed += 1
+            # 舊項目累積過多時重建 heap，避免無限成長
+            if len(self._heap) > 2 * len(self._expires) + 64:
+                self._heap = [(exp, sid) for sid, exp in self._expires.items()]
+                heapq.heapify(self._heap)
+        return removed
+
+    def flush(self):
+        """把異動寫回儲存；沒有異動時不寫"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            snapshot = dict(self._sessions)
+            self._dirty = False
+        if not self._save_fn(snapshot):
+            with self._lock:
+                self._dirty = True
+            return False
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='session-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+        return self
+
+    def _run(self):
+        stopped = threading.Event()
+        while not stopped.wait(self.flush_interval):
+            try:
+                self.purge_expired()
+                self.flush()
+            except Exception as e:
+                print(f"Session 寫回失敗: {e}")
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._sessions)
+
+
+sessions = SessionStore(
+    storage.load_sessions,
+    storage.save_sessions,
+    flush_interval=settings.SESSION_FLUSH_SECONDS
+).start()
+
+SESSION_TTL = timedelta(days=settings.SESSION_TTL_DAYS)
@@ -0,0 +1,182 @@
+# src/services/stats_store.py
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from ..config import settings
+from ..utils import date_utils
+from .locks import StripedLock
+from . import storage
+
+
+def summarize(deposits, statuses, today):
+    """以已分類的記錄計算統計彙總"""
+    stats = date_utils.count_statuses(statuses)
+    stats['records'] = len(deposits)
+    stats['cups'] = sum(d.get('quantity', 0) for d in deposits)
+    stats['date'] = today.isoformat()
+    return stats
+
+def count_deposits(deposits, today):
+    """完整重算一位使用者的統計彙總"""
+    statuses, _ = date_utils.classify_deposits(deposits, today)
+    return summarize(deposits, statuses, today)
+
+
+class StatsDelta:
+    """一次異動對統計彙總造成的變化，由 StatsStore.mutation 在結束時套用"""
+
+    def __init__(self):
+        self.changes = []  # (deposit, 筆數變化, 杯數變化)
+        self.revision = None  # 這次寫入所依據的修訂號
+
+    def committed(self, revision):
+        """寫入成功後由 storage.mutate_deposits 的 on_commit 呼叫"""
+        self.revision = revision
+
+    def added(self, deposits):
+        for deposit in deposits:
+            self.changes.append((deposit, 1, deposit.get('quantity', 0)))
+
+    def removed(self, deposits):
+        for deposit in deposits:
+            self.changes.append((deposit, -1, -deposit.get('quantity', 0)))
+
+    def redeemed(self, deposit, cups=1):
+        self.changes.append((deposit, 0, -cups))
+
+
+class StatsStore:
+    """每位使用者的統計彙總（總杯數、記錄數與各到期狀態筆數）
+
+    彙總記錄了它對應的寄杯修訂號與計算當天的日期。讀取時先取得目前的修訂號（不讀取記錄），
+    修訂號或日期不符（其他行程寫入、同步下載、日誌重播、當機時增量沒有套用、換日）就以完整重算校正。
+    新增/兌換/刪除以 O(1) 的增量更新記憶體中的彙總：只有彙總的修訂號正好是該次寫入所依據的版本時才套用，
+    否則丟棄，下次讀取時重算。彙總只在完整重算後保存，異動本身不多一次寫檔。
+    verify 為 True 時每次讀取都會完整重算並比對，不一致時印出警告並改用重算結果。
+    """
+
+    def __init__(self, load_fn, save_fn, load_versioned_fn, revision_fn, verify=False, capacity=256,
+                 lock_stripes=64):
+        self._load_fn = load_fn
+        self._save_fn = save_fn
+        self._load_versioned_fn = load_versioned_fn
+        self._revision_fn = revision_fn
+        self.verify = verify
+        self.capacity = capacity
+        self._entries = OrderedDict()  # username -> 彙總
+        self._entries_lock = threading.Lock()
+        self.locks = StripedLock(lock_stripes)
+        self.mismatches = 0
+
+    def _cached(self, username):
+        with self._entries_lock:
+            stats = self._entries.get(username)
+            if stats is not None:
+                self._entries.move_to_end(username)
+            return stats
+
+    def _store(self, username, stats, persist=True):
+        with self._entries_lock:
+            self._entries[username] = stats
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        if persist:
+            self._save_fn(username, stats)
+
+    def _drop(self, username):
+        with self._entries_lock:
+            self._entries.pop(username, None)
+
+    def _recount(self, username, today):
+        deposits, revision = self._load_versioned_fn(username)
+        stats = count_deposits(deposits, today)
+        stats['revision'] = revision
+        return stats
+
+    def get(self, username, today=None, snapshot=None):
+        """取得統計彙總（回傳副本）
+
+        snapshot 為呼叫端已讀取並分類的 (deposits, statuses, revision)：彙總的修訂號與快照相同時直接回傳，
+        不同時以這份快照重算（不再讀取記錄），回傳的統計與快照一致。
+        """
+        today = today or date_utils.today()
+        revision = snapshot[2] if snapshot is not None else self._revision_fn(username)
+        with self.locks.for_key(username):
+            stats = self._cached(username)
+            if stats is None:
+                stats = self._load_fn(username) or None
+                if stats is not None:
+                    self._store(username, stats, persist=False)
+            stale = (stats is None or revision is None or stats.get('date') != today.isoformat()
+                     or stats.get('revision') != revision)
+            if stale and snapshot is not None:
+                deposits, statuses, _ = snapshot
+                counted = summarize(deposits, statuses, today)
+                counted['revision'] = revision
+                # 快照比彙總舊（讀取後已有寫入套用了增量）時只回傳重算結果，不覆蓋較新的彙總
+                if revision is not None and (stats is None or stats.get('date') != today.isoformat()
+                                             or not isinstance(stats.get('revision'), int)
+                                             or stats['revision'] < revision):
+                    self._store(username, counted)
+                stats = counted
+            elif stale:
+                stats = self._recount(username, today)
+                self._store(username, stats)
+            elif self.verify:
+                expected = self._recount(username, today)
+                if expected != stats:
+                    self.mismatches += 1
+                    print(f"統計彙總不一致（{username}）：保存值 {stats}，重算值 {expected}")
+                    self._store(username, expected)
+                    stats = expected
+            return dict(stats)
+
+    @contextmanager
+    def mutation(self, username):
+        """包住一次寄杯異動；區塊內記錄的變化在結束時套用到彙總
+
+        寄杯的寫入不持有彙總的鎖（並行的寫入由修訂號比對處理），只有最後套用增量時短暫持有。
+        """
+        delta = StatsDelta()
+        yield delta
+        if delta.changes:
+            with self.locks.for_key(username):
+                self._apply(username, delta)
+
+    def _apply(self, username, delta):
+        stats = self._cached(username)
+        if stats is None:
+            stats = self._load_fn(username) or None
+        if stats is None:
+            return  # 尚未建立彙總，下次讀取時完整計算
+        today = date_utils.parse_date(stats.get('date'))
+        if today is None or delta.revision is None or stats.get('revision') != delta.revision:
+            # 彙總不是這次寫入前的版本（其他寫入先套用、或修訂號未知），無法以增量更新
+            self._drop(username)
+            return
+        stats = dict(stats)
+        for deposit, records, cups in delta.changes:
+            stats['records'] += records
+            stats['cups'] += cups
+            if records:
+                stats[date_utils.expiry_status(deposit.get('expiryDate'), today)] += records
+        stats['revision'] = delta.revision + 1
+        self._store(username, stats, persist=False)
+
+    def invalidate(self, username):
+        """無法以增量描述的異動（整批覆寫等）後呼叫，下次讀取時完整重算"""
+        with self.locks.for_key(username):
+            self._drop(username)
+
+
+stats = StatsStore(
+    storage.load_stats,
+    storage.save_stats,
+    storage.load_versioned,
+    storage.deposit_revision,
+    verify=settings.STATS_VERIFY,
+    capacity=settings.DEPOSIT_CACHE_SIZE,
+    lock_stripes=settings.STORAGE_LOCK_STRIPES
+)
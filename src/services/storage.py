@@ -1,91 +1,280 @@
 # src/services/storage.py
 
-import os
 import json
-from pathlib import Path
-from huggingface_hub import CommitScheduler, snapshot_download
+import os
+import random
+import time
+from datetime import datetime
 from ..config import settings
+from .backends import JsonBackend, RevisionConflict, SQLiteBackend, migrate_backend
+from .backends.atomic import publish, write_temp
+from .hydration import Hydrator
+from .remote import create_remote
+from .sync import SyncScheduler
 
 # 1. 確保本地資料目錄存在
 os.makedirs(settings.USER_DATA_DIR, exist_ok=True)
 
-# 2. 初始化：從 Dataset 下載現有資料 (啟動時執行一次)
-try:
-    print("正在從 Dataset 同步資料...")
-    snapshot_download(
-        repo_id=settings.DATA_REPO,
-        repo_type="dataset",
-        local_dir=settings.DATA_DIR,
-        token=settings.HF_TOKEN
-    )
-    print("資料同步完成")
-except Exception as e:
-    print(f"初次下載資料略過 (可能是第一次建立): {e}")
-
-# 3. 設定 CommitScheduler (自動背景同步)
-scheduler = CommitScheduler(
-    repo_id=settings.DATA_REPO,
-    repo_type="dataset",
+# 2. 初始化：從 Dataset 同步現有資料
+# 預設為 lazy：不阻塞啟動，背景下載全部資料，使用者第一次被存取時先單獨下載他的檔案。
+# SQLite 資料庫是單一檔案，無法按使用者下載，因此一律在啟動時同步完成。
+remote = create_remote(settings)
+_hydration_mode = settings.HYDRATION_MODE
+if settings.STORAGE_BACKEND == 'sqlite' and _hydration_mode == 'lazy':
+    _hydration_mode = 'eager'
+hydrator = Hydrator(remote, settings.DATA_DIR, _hydration_mode)
+hydrator.start()
+
+# 3. 設定背景上傳排程：只上傳有變動的檔案，遠端同步完成前不上傳
+scheduler = SyncScheduler(
+    remote,
     folder_path=settings.DATA_DIR,
-    path_in_repo=".",
-    every=1,
-    token=settings.HF_TOKEN
-)
+    every=settings.SYNC_INTERVAL_MINUTES,
+    ready_fn=hydrator.is_ready
+).start()
+if _hydration_mode == 'off':
+    # 沒有從遠端同步時，本機既有的檔案都視為待上傳
+    scheduler.mark_all_dirty()
 
-# === 通用讀寫函式 ===
+# 4. 建立儲存後端（預設為原本的 JSON 檔案，可透過 STORAGE_BACKEND 切換為 sqlite）
+def _create_json_backend():
+    return JsonBackend(
+        users_file=settings.USERS_FILE,
+        sessions_file=settings.SESSIONS_FILE,
+        user_data_dir=settings.USER_DATA_DIR,
+        sync_lock=scheduler.lock,
+        cache_size=settings.DEPOSIT_CACHE_SIZE,
+        journal_threshold=settings.JOURNAL_COMPACT_BYTES if settings.DEPOSIT_JOURNAL else None,
+        lock_stripes=settings.STORAGE_LOCK_STRIPES,
+        durability=settings.STORAGE_DURABILITY,
+        group_window=settings.GROUP_COMMIT_WINDOW_MS / 1000,
+        on_write=scheduler.mark_dirty,
+        deposit_format=settings.DEPOSIT_FORMAT,
+        users_dir=settings.USERS_DIR,
+        user_shards=settings.USER_SHARDS,
+        stats_dir=settings.USER_STATS_DIR
+    )
 
-def _load_json(filepath, default=None):
-    if os.path.exists(filepath):
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return default if default is not None else {}
-    return default if default is not None else {}
-
-def _save_json(filepath, data):
-    # 使用 CommitScheduler 的 lock 確保線程安全
-    with scheduler.lock:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+def _has_json_users():
+    if os.path.exists(settings.USERS_FILE):
+        return True
+    return os.path.isdir(settings.USERS_DIR) and any(
+        name.endswith('.json') for name in os.listdir(settings.USERS_DIR)
+    )
+
+def _create_backend(name):
+    if name == 'sqlite':
+        backend = SQLiteBackend(settings.SQLITE_PATH, sync_lock=scheduler.lock, on_write=scheduler.mark_dirty)
+        if backend.is_empty() and _has_json_users():
+            print("偵測到舊版 JSON 資料，開始遷移至 SQLite...")
+            counts = migrate_backend(_create_json_backend(), backend)
+            print(f"遷移完成: {counts}")
+        return backend
+    if name != 'json':
+        print(f"未知的儲存後端 {name}，改用 json")
+    return _create_json_backend()
+
+backend = _create_backend(settings.STORAGE_BACKEND)
+
+def migrate_json_to_sqlite(db_path=None):
+    """一次性將 data/ 下的 JSON 資料遷移到 SQLite，回傳各類筆數"""
+    target = SQLiteBackend(db_path or settings.SQLITE_PATH, sync_lock=scheduler.lock, on_write=scheduler.mark_dirty)
+    try:
+        return migrate_backend(_create_json_backend(), target)
+    finally:
+        target.close()
+
+def get_deposit_cache_stats():
+    """取得寄杯快取的命中/未命中/淘汰統計"""
+    cache = getattr(backend, 'cache', None)
+    return cache.stats() if cache is not None else {}
+
+def clear_deposit_cache():
+    """清空寄杯快取（統計數字一併歸零）"""
+    cache = getattr(backend, 'cache', None)
+    if cache is not None:
+        cache.clear()
+
+def get_hydration_status():
+    """取得啟動資料同步狀態（state、已同步檔案數、按需下載次數等）"""
+    return hydrator.status()
+
+def get_sync_metrics():
+    """取得背景上傳的統計（每輪檔案數、位元組、耗時與待上傳數量）"""
+    return scheduler.metrics()
+
+# 5. 每位使用者寄杯資料的版本號，供介面判斷畫面是否需要重新產生
+def data_version(username):
+    """使用者寄杯資料目前的版本（ETag），由後端的修訂號等資訊組成；
+    經由其他行程、同步下載或直接修改檔案造成的變動也會反映在版本上"""
+    if not username: return None
+    _ensure_user(username)
+    return backend.data_version(username)
+
+def _relpath(path):
+    return os.path.relpath(path, settings.DATA_DIR).replace(os.sep, '/')
+
+def _ensure_files(*paths):
+    hydrator.ensure([_relpath(p) for p in paths])
+
+def _ensure_user(username):
+    hydrator.ensure([_relpath(p) for p in backend.data_files(username)])
 
 # === 業務邏輯函式 ===
 
 def load_users():
-    return _load_json(settings.USERS_FILE, {})
+    # 需要完整的帳號清單，等待背景同步完成
+    hydrator.wait_ready()
+    return backend.load_users()
 
 def save_users(users):
-    try:
-        _save_json(settings.USERS_FILE, users)
-        return True
-    except Exception as e:
-        print(f"儲存用戶錯誤: {e}")
-        return False
+    hydrator.wait_ready()
+    return backend.save_users(users)
+
+def get_user(username):
+    if not username: return None
+    _ensure_files(*backend.user_files(username))
+    return backend.get_user(username)
+
+def add_user(username, info):
+    if not username: return False
+    _ensure_files(*backend.user_files(username))
+    return backend.add_user(username, info)
 
 def load_sessions():
-    return _load_json(settings.SESSIONS_FILE, {})
+    _ensure_files(settings.SESSIONS_FILE)
+    return backend.load_sessions()
 
 def save_sessions(sessions):
-    try:
-        _save_json(settings.SESSIONS_FILE, sessions)
-        return True
-    except:
-        return False
+    _ensure_files(settings.SESSIONS_FILE)
+    return backend.save_sessions(sessions)
 
 def get_user_data_file(username):
     return os.path.join(settings.USER_DATA_DIR, f'{username}.json')
 
 def load_deposits(username):
     if not username: return []
-    filepath = get_user_data_file(username)
-    return _load_json(filepath, [])
+    _ensure_user(username)
+    return backend.load_deposits(username)
+
+def load_versioned(username):
+    """回傳 (deposits, revision)，revision 可傳給 save_deposits / batch_deposits 做 compare-and-swap"""
+    if not username: return [], None
+    _ensure_user(username)
+    return backend.load_versioned(username)
+
+def deposit_revision(username):
+    """目前的修訂號（不讀取寄杯資料）；每次寫入加一"""
+    if not username: return None
+    _ensure_user(username)
+    return backend.revision(username)
+
+def save_deposits(username, deposits, expected_revision=None):
+    """整批覆寫；指定 expected_revision 且修訂號不符時拋出 RevisionConflict"""
+    if not username: return False
+    _ensure_user(username)
+    return backend.save_deposits(username, deposits, expected_revision)
+
+def add_deposits(username, new_deposits):
+    if not username: return False
+    _ensure_user(username)
+    return backend.add_deposits(username, new_deposits)
+
+def update_deposit(username, deposit_id, changes):
+    if not username: return False
+    _ensure_user(username)
+    return backend.update_deposit(username, deposit_id, changes)
+
+def delete_deposits(username, deposit_ids):
+    if not username: return 0
+    _ensure_user(username)
+    return backend.delete_deposits(username, deposit_ids)
+
+def batch_deposits(username, ops, expected_revision=None):
+    """一次套用多個異動；指定 expected_revision 且修訂號不符時拋出 RevisionConflict"""
+    if not username: return False
+    _ensure_user(username)
+    return backend.batch_deposits(username, ops, expected_revision)
 
-def save_deposits(username, deposits):
+# 樂觀並行控制的統計：成功提交、版本衝突（重試）、重試用盡
+_mutation_metrics = {'commits': 0, 'conflicts': 0, 'exhausted': 0}
+
+def get_mutation_metrics():
+    return dict(_mutation_metrics)
+
+def mutate_deposits(username, plan, retries=None, on_commit=None):
+    """以樂觀並行控制套用一次寄杯異動
+
+    plan(deposits) 必須是純函式：依讀到的快照回傳 (ops, result)，不修改 deposits、沒有其他副作用。
+    ops（格式同 batch_deposits）以比對修訂號的方式一次寫入；期間有其他寫入搶先時，
+    隨機退避後重新讀取並重新呼叫 plan，因此 ops 可以放心使用由快照算出的絕對值（例如剩餘杯數）。
+    寫入成功後呼叫 on_commit(revision)，revision 為 ops 所依據的修訂號（寫入後為 revision + 1）。
+    回傳 (是否成功, 最後一次 plan 的 result)；ops 為空時不寫入，視為成功。
+    retries 為最多嘗試次數（預設 MUTATION_RETRIES），小於 1 時仍嘗試一次。
+    """
+    if not username: return False, None
+    result = None
+    # 至少嘗試一次；retries 為 0 時也一樣
+    attempts = max(1, settings.MUTATION_RETRIES if retries is None else retries)
+    for attempt in range(attempts):
+        if attempt:
+            # 衝突後隨機退避（上限隨次數加倍，最多 50 毫秒），避免同時重試的寫入再次互相搶先
+            time.sleep(random.uniform(0, min(0.05, 0.002 * 2 ** attempt)))
+        deposits, revision = load_versioned(username)
+        ops, result = plan(deposits)
+        if not ops:
+            return True, result
+        try:
+            ok = batch_deposits(username, ops, expected_revision=revision)
+        except RevisionConflict:
+            _mutation_metrics['conflicts'] += 1
+            continue
+        if ok:
+            _mutation_metrics['commits'] += 1
+            if on_commit is not None:
+                on_commit(revision)
+        return ok, result
+    _mutation_metrics['exhausted'] += 1
+    print(f"寫入 {username} 的寄杯資料時持續發生版本衝突，放棄寫入")
+    return False, result
+
+def load_stats(username):
+    if not username: return None
+    _ensure_user(username)
+    return backend.load_stats(username)
+
+def save_stats(username, stats):
     if not username: return False
-    filepath = get_user_data_file(username)
+    _ensure_user(username)
+    return backend.save_stats(username, stats)
+
+def migration_done(name):
+    """一次性資料遷移是否已完成（記錄在 MIGRATIONS_FILE，隨資料一起同步）"""
+    _ensure_files(settings.MIGRATIONS_FILE)
     try:
-        _save_json(filepath, deposits)
-        return True
-    except Exception as e:
-        print(f"儲存寄杯錯誤: {e}")
-        return False
\ No newline at end of file
+        with open(settings.MIGRATIONS_FILE, 'r', encoding='utf-8') as f:
+            return name in json.load(f)
+    except (OSError, ValueError):
+        return False
+
+def mark_migration_done(name):
+    _ensure_files(settings.MIGRATIONS_FILE)
+    try:
+        with open(settings.MIGRATIONS_FILE, 'r', encoding='utf-8') as f:
+            done = json.load(f)
+    except (OSError, ValueError):
+        done = {}
+    done[name] = datetime.now().isoformat()
+    tmp_path = write_temp(settings.MIGRATIONS_FILE, json.dumps(done, ensure_ascii=False, indent=2))
+    publish([tmp_path], [(tmp_path, settings.MIGRATIONS_FILE)], scheduler.lock)
+    scheduler.mark_dirty(settings.MIGRATIONS_FILE)
+
+def list_usernames():
+    # 需要完整的使用者清單，等待背景同步完成
+    hydrator.wait_ready()
+    return backend.list_usernames()
+
+def iter_all_deposits():
+    """逐一產生所有使用者的 (username, deposit)"""
+    hydrator.wait_ready()
+    return backend.iter_all_deposits()
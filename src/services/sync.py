@@ -0,0 +1,128 @@
+# src/services/sync.py
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+# 背景上傳排程（取代 huggingface_hub 的 CommitScheduler）
+#
+# CommitScheduler 每一輪都要掃描整個 data/ 資料夾、逐一比對檔案 mtime，
+# 使用者一多成本就很可觀。這裡改由儲存層在寫入後呼叫 mark_dirty()，
+# 每一輪只上傳上次成功推送後有變動的檔案；已被刪除的檔案會在遠端一併刪除。
+# 行程結束時（atexit）會停止排程並同步上傳剩下的變動，重新啟動前寫入的資料不會遺失。
+
+
+class SyncScheduler:
+    def __init__(self, remote, folder_path, every=1, ready_fn=None, history=20):
+        self.remote = remote
+        self.folder_path = folder_path
+        self.every = every  # 分鐘
+        self.ready_fn = ready_fn
+        # 寫入落地時持有的 lock；上傳讀取檔案內容時也持有，避免讀到寫到一半的檔案
+        self.lock = threading.Lock()
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._push_lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._totals = {'cycles': 0, 'files': 0, 'bytes': 0, 'failures': 0}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sync-scheduler', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def shutdown(self, timeout=None):
+        """停止背景排程，等待進行中的上傳結束後，同步上傳剩下的變動"""
+        self.stop()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        try:
+            return self.push()
+        except Exception as e:
+            print(f"結束前上傳失敗: {e}")
+            return None
+
+    def _run(self):
+        while not self._stopped.wait(self.every * 60):
+            try:
+                self.push()
+            except Exception as e:
+                print(f"背景上傳失敗: {e}")
+
+    def mark_dirty(self, path):
+        """標記本機檔案已變動（新增、修改或刪除），下一輪上傳"""
+        with self._dirty_lock:
+            self._dirty.add(os.path.abspath(path))
+
+    def mark_all_dirty(self):
+        """把資料夾內所有檔案標記為待上傳（例如未從遠端同步就啟動時）"""
+        for root, _, files in os.walk(self.folder_path):
+            for name in files:
+                if not name.endswith('.tmp'):
+                    self.mark_dirty(os.path.join(root, name))
+
+    def pending(self):
+        with self._dirty_lock:
+            return len(self._dirty)
+
+    def push(self):
+        """上傳目前所有變動的檔案，回傳本輪的統計；沒有變動或尚未就緒時回傳 None"""
+        if self.ready_fn is not None and not self.ready_fn():
+            return None
+        with self._push_lock:
+            with self._dirty_lock:
+                paths, self._dirty = self._dirty, set()
+            if not paths:
+                return None
+
+            started = time.time()
+            files, deletions = {}, []
+            for path in sorted(paths):
+                relpath = os.path.relpath(path, self.folder_path).replace(os.sep, '/')
+                with self.lock:
+                    try:
+                        with open(path, 'rb') as f:
+                            files[relpath] = f.read()
+                    except FileNotFoundError:
+                        deletions.append(relpath)
+
+            cycle = {
+                'started_at': started,
+                'files': len(files),
+                'deletions': len(deletions),
+                'bytes': sum(len(content) for content in files.values()),
+                'duration': 0.0,
+                'error': None
+            }
+            try:
+                self.remote.upload(files, deletions)
+            except Exception as e:
+                # 上傳失敗：放回待上傳集合，下一輪重試
+                with self._dirty_lock:
+                    self._dirty.update(paths)
+                cycle['error'] = str(e)
+                self._totals['failures'] += 1
+            cycle['duration'] = time.time() - started
+            self._history.append(cycle)
+            self._totals['cycles'] += 1
+            if cycle['error'] is None:
+                self._totals['files'] += cycle['files'] + cycle['deletions']
+                self._totals['bytes'] += cycle['bytes']
+            return cycle
+
+    def metrics(self):
+        """每輪上傳的檔案數、位元組、耗時，以及累計統計"""
+        return {
+            **self._totals,
+            'pending': self.pending(),
+            'last_cycle': self._history[-1] if self._history else None,
+            'history': list(self._history)
+        }
@@ -0,0 +1,208 @@
+# src/services/transfer.py
+
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+import pandas as pd
+from ..config import settings
+from ..utils import ids as id_utils
+from .backends.formats import load_deposits_text
+from . import expiry_index, stats_store, storage
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+FORMAT_JSON = 'json'  # 只供匯入：JSON 陣列或本系統的寄杯檔（user_records/*.json）
+FORMATS = (FORMAT_CSV, FORMAT_NDJSON)
+
+# 匯出/匯入的欄位（與寄杯記錄的 key 相同）
+EXPORT_COLUMNS = ['id', 'item', 'quantity', 'store', 'redeemMethod', 'expiryDate', 'createdAt']
+_EXTENSIONS = {'.csv': FORMAT_CSV, '.ndjson': FORMAT_NDJSON, '.jsonl': FORMAT_NDJSON, '.json': FORMAT_JSON}
+
+# 匯出檔放在專用的暫存資料夾：每次匯出時清掉超過保留時間的舊檔，行程結束時整個刪除。
+# Gradio 回傳檔案時會複製到自己的快取，下載不依賴這裡的檔案
+_export_dir = None
+
+
+def detect_format(path):
+    """依副檔名判斷格式，無法判斷時視為 CSV"""
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), FORMAT_CSV)
+
+# === 匯出 ===
+
+def iter_export(records, fmt=FORMAT_CSV, columns=EXPORT_COLUMNS, chunk_size=None):
+    """將記錄逐塊轉為 CSV 或 NDJSON 文字，每次只持有 chunk_size 筆"""
+    chunk_size = chunk_size or settings.TRANSFER_CHUNK_ROWS
+    records = iter(records)
+    first = True
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            if first and fmt == FORMAT_CSV:
+                yield ','.join(columns) + '\n'  # 沒有資料時仍輸出標題列
+            return
+        frame = pd.DataFrame.from_records(chunk, columns=columns)
+        if fmt == FORMAT_NDJSON:
+            yield frame.to_json(orient='records', lines=True, force_ascii=False)
+        else:
+            yield frame.to_csv(index=False, header=first)
+        first = False
+
+def export_user(username, fmt=FORMAT_CSV):
+    """匯出一位使用者的寄杯記錄（產生文字區塊）"""
+    return iter_export(storage.load_deposits(username), fmt)
+
+def export_all(fmt=FORMAT_CSV):
+    """匯出所有使用者的寄杯記錄（管理員用），多一個 username 欄位"""
+    records = ({'username': username, **deposit} for username, deposit in storage.iter_all_deposits())
+    return iter_export(records, fmt, columns=['username'] + EXPORT_COLUMNS)
+
+def _prune_exports():
+    global _export_dir
+    if _export_dir is None:
+        _export_dir = tempfile.mkdtemp(prefix='coffee-exports-')
+        atexit.register(shutil.rmtree, _export_dir, True)
+    cutoff = time.time() - settings.EXPORT_FILE_TTL_MINUTES * 60
+    for name in os.listdir(_export_dir):
+        path = os.path.join(_export_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+    return _export_dir
+
+def export_to_file(chunks, fmt=FORMAT_CSV, prefix='deposits'):
+    """將匯出的文字區塊逐塊寫入暫存檔，回傳檔案路徑（供下載）"""
+    fd, path = tempfile.mkstemp(prefix=f'{prefix}-', suffix=f'.{fmt}', dir=_prune_exports())
+    # CSV 加上 BOM，讓 Excel 正確辨識中文
+    with os.fdopen(fd, 'w', encoding='utf-8-sig' if fmt == FORMAT_CSV else 'utf-8', newline='') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return path
+
+def is_admin(username):
+    return bool(username) and username in settings.ADMIN_USERS
+
+# === 匯入 ===
+
+def _json_chunks(path, chunk_size):
+    # JSON 陣列無法串流解析，整份讀入後再分塊；索引延續前一塊，錯誤訊息的列號才正確
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        deposits, _, _ = load_deposits_text(f.read())
+    for start in range(0, len(deposits), chunk_size):
+        chunk = deposits[start:start + chunk_size]
+        yield pd.DataFrame.from_records(chunk, index=range(start, start + len(chunk)))
+
+def read_chunks(path, fmt=None, chunk_size=None):
+    """逐塊讀取 CSV / NDJSON / JSON，所有欄位先以原始值讀入，留給 normalize_chunk 驗證"""
+    fmt = fmt or detect_format(path)
+    chunk_size = chunk_size or settings.TRANSFER_CHUNK_ROWS
+    if fmt == FORMAT_JSON:
+        return _json_chunks(path, chunk_size)
+    if fmt == FORMAT_NDJSON:
+        return pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    return pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+
+def _text(frame, column):
+    if column not in frame:
+        return pd.Series('', index=frame.index, dtype=object)
+    return frame[column].fillna('').astype(str).str.strip()
+
+def normalize_chunk(frame, created_at):
+    """驗證並整理一塊資料，規則與 add_deposit 相同
+
+    品項、商店、兌換途徑不可空白；數量須為大於 0 的整數；
+    到期日去掉時間部分後須為 YYYY-MM-DD。沒有 id 的列取得新的 ULID，重複的 id 留給匯入時處理。
+    回傳 (記錄列表, [(列號, 原因)])，列號從 1 起算、不含標題列。
+    """
+    item = _text(frame, 'item')
+    store = _text(frame, 'store')
+    method = _text(frame, 'redeemMethod')
+    quantity = pd.to_numeric(frame['quantity'] if 'quantity' in frame else pd.Series(index=frame.index, dtype=float),
+                             errors='coerce')
+    expiry_text = _text(frame, 'expiryDate').str.split('T').str[0].str.split(' ').str[0]
+    expiry = pd.to_datetime(expiry_text, format='%Y-%m-%d', errors='coerce')
+
+    missing = (item == '') | (store == '') | (method == '')
+    bad_quantity = quantity.isna() | (quantity < 1) | (quantity != quantity.round())
+    bad_date = expiry.isna()
+    valid = ~(missing | bad_quantity | bad_date)
+
+    errors = []
+    for reason, mask in (('欄位空白', missing), ('數量錯誤', bad_quantity & ~missing),
+                         ('日期格式錯誤', bad_date & ~missing & ~bad_quantity)):
+        errors.extend((int(i) + 1, reason) for i in frame.index[mask])
+
+    ids = _text(frame, 'id')
+    no_id = ids == ''
+    ids[no_id] = [id_utils.new_id() for _ in range(int(no_id.sum()))]
+    created = _text(frame, 'createdAt').replace('', created_at)
+
+    records = pd.DataFrame({
+        'id': ids,
+        'item': item,
+        'quantity': quantity.fillna(0).astype('int64'),
+        'store': store,
+        'redeemMethod': method,
+        'expiryDate': expiry.dt.strftime('%Y-%m-%d'),
+        'createdAt': created
+    })[valid].to_dict('records')
+    return records, errors
+
+def _renumber(records, existing_ids):
+    """檔案中重複、或與既有記錄相同的 id 取得新的 ULID（第一次出現的檔案內 id 保留），回傳新的記錄列表"""
+    seen = set(existing_ids)
+    result = []
+    for record in records:
+        if record['id'] in seen:
+            record = {**record, 'id': id_utils.new_id()}
+        seen.add(record['id'])
+        result.append(record)
+    return result
+
+def import_deposits(username, path, fmt=None):
+    """匯入寄杯記錄：逐塊驗證、整理，最後以一次寫入提交
+
+    匯入只新增記錄、不覆蓋既有記錄：id 在檔案中重複或已存在的列會取得新 id。
+    回傳 (訊息, 實際寫入筆數)。
+    """
+    if not username:
+        return "❌ 請先登入", 0
+    if not path:
+        return "❌ 請選擇要匯入的檔案", 0
+
+    now = datetime.now()
+    records = []
+    errors = []
+    try:
+        for frame in read_chunks(path, fmt):
+            chunk_records, chunk_errors = normalize_chunk(frame, now.isoformat())
+            records.extend(chunk_records)
+            errors.extend(chunk_errors)
+    except Exception as e:
+        print(f"匯入讀取錯誤: {e}")
+        return f"❌ 無法讀取檔案：{e}", 0
+
+    if not records:
+        return f"❌ 沒有可匯入的記錄（{len(errors)} 列格式錯誤）", 0
+
+    def plan(deposits):
+        added = _renumber(records, (d['id'] for d in deposits))
+        return [{'op': 'add', 'deposits': added}], added
+
+    with stats_store.stats.mutation(username) as delta:
+        ok, added = storage.mutate_deposits(username, plan, on_commit=delta.committed)
+        if not ok:
+            return "❌ 儲存失敗", 0
+        delta.added(added)
+    expiry_index.index.add(username, added)
+
+    message = f"✅ 已匯入 {len(added)} 筆記錄"
+    if errors:
+        sample = '、'.join(f"第 {row} 列（{reason}）" for row, reason in errors[:5])
+        message += f"，略過 {len(errors)} 列：{sample}" + ("…" if len(errors) > 5 else "")
+    return message, len(added)
@@ -0,0 +1,69 @@
+# src/services/user_store.py
+
+import threading
+from . import storage
+
+
+class UserRepository:
+    """帳號查詢/新增，不必載入或改寫其他帳號
+
+    啟動時在背景建立一次 username -> 帳號資料 的記憶體索引，之後登入查詢皆為 O(1)；
+    索引尚未建好前改用儲存層的單點查詢（只讀該帳號所在的分片）。
+    """
+
+    def __init__(self, load_all_fn, get_fn, add_fn):
+        self._load_all_fn = load_all_fn
+        self._get_fn = get_fn
+        self._add_fn = add_fn
+        self._index = None
+        self._added_during_build = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.build_index, name='user-index', daemon=True)
+        self._thread.start()
+        return self
+
+    def build_index(self):
+        users = self._load_all_fn()
+        with self._lock:
+            # 建索引期間新增的帳號不在 users 裡，補上
+            users.update(self._added_during_build)
+            self._added_during_build = {}
+            self._index = users
+        print(f"使用者索引建立完成，共 {len(users)} 個帳號")
+
+    def is_ready(self):
+        return self._index is not None
+
+    def get(self, username):
+        """回傳帳號資料，不存在時回傳 None"""
+        if not username:
+            return None
+        index = self._index
+        if index is not None:
+            return index.get(username)
+        return self._get_fn(username)
+
+    def exists(self, username):
+        return self.get(username) is not None
+
+    def add(self, username, info):
+        """新增帳號；帳號已存在或寫入失敗時回傳 False"""
+        with self._lock:
+            if self.get(username) is not None:
+                return False
+            if not self._add_fn(username, info):
+                return False
+            if self._index is not None:
+                self._index[username] = info
+            else:
+                self._added_during_build[username] = info
+            return True
+
+    def __len__(self):
+        return len(self._index) if self._index is not None else 0
+
+
+users = UserRepository(storage.load_users, storage.get_user, storage.add_user).start()
@@ -4,8 +4,16 @@ from .components import (
     get_deposits_display,
     get_statistics
 )
+from .view_model import (
+    DepositView,
+    build_view,
+    empty_view
+)
 
 __all__ = [
     'get_deposits_display',
-    'get_statistics'
+    'get_statistics',
+    'DepositView',
+    'build_view',
+    'empty_view'
 ]
\ No newline at end of file
@@ -1,122 +1,206 @@
 # src/ui/components.py
 
+import threading
+from collections import OrderedDict
 import gradio as gr
-from ..config import ui_config
-from ..services import storage
+from ..config import settings, ui_config
+from ..services import stats_store, storage
 from ..utils import date_utils
 
-def get_deposits_display(username):
-    """取得寄杯記錄顯示"""
-    if not username:
-        return """
+# 卡片上會顯示的欄位，任一變動即重新產生該張卡片
+CARD_FIELDS = ('item', 'quantity', 'store', 'redeemMethod', 'expiryDate')
+
+LOGIN_PROMPT_HTML = """
         <div style="text-align: center; padding: 60px 20px; background: white; border-radius: 16px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
             <div style="font-size: 64px; margin-bottom: 20px;">🔒</div>
             <p style="font-size: 20px; color: #6b7280; margin-bottom: 10px;">請先登入</p>
             <p style="font-size: 16px; color: #9ca3af;">登入後即可查看您的寄杯記錄</p>
         </div>
         """
-    
-    deposits = storage.load_deposits(username)
-    
-    if not deposits:
-        return """
+
+EMPTY_DEPOSITS_HTML = """
         <div style="text-align: center; padding: 60px 20px; background: white; border-radius: 16px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
             <div style="font-size: 64px; margin-bottom: 20px;">☕</div>
             <p style="font-size: 20px; color: #6b7280; margin-bottom: 10px;">還沒有寄杯記錄</p>
             <p style="font-size: 16px; color: #9ca3af;">點擊上方「新增寄杯記錄」開始記錄吧！</p>
         </div>
         """
-    
-    deposits.sort(key=lambda x: x.get('expiryDate', '9999-12-31'))
-    
-    html = '<div style="display: flex; flex-direction: column; gap: 20px;">'
-    
-    for deposit in deposits:
-        expired = date_utils.is_expired(deposit['expiryDate'])
-        expiring_today = date_utils.is_expiring_today(deposit['expiryDate'])
-        expiring_soon = date_utils.is_expiring_soon(deposit['expiryDate']) and not expired and not expiring_today
-        
-        # 根據狀態設置樣式
-        if expired:
-            card_style = "background: #fef2f2; border: 2px solid #fca5a5;"
-            status_text = "（已過期）"
-            status_color = "#dc2626"
-            status_emoji = "❌"
-        elif expiring_today:
-            card_style = "background: #fff4ed; border: 2px solid #fb923c;"
-            status_text = "（今天到期）"
-            status_color = "#ea580c"
-            status_emoji = "⚠️"
-        elif expiring_soon:
-            card_style = "background: #fefce8; border: 2px solid #fde047;"
-            status_text = "（即將到期）"
-            status_color = "#ca8a04"
-            status_emoji = "⏰"
+
+NO_MATCH_HTML = """
+        <div style="text-align: center; padding: 40px 20px; background: white; border-radius: 16px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            <div style="font-size: 48px; margin-bottom: 16px;">🔍</div>
+            <p style="font-size: 18px; color: #6b7280; margin: 0;">沒有符合篩選條件的記錄</p>
+        </div>
+        """
+
+class CardFragmentCache:
+    """寄杯卡片 HTML 片段快取
+
+    每位使用者保留 deposit id -> (簽章, HTML)，簽章為 (卡片欄位內容, 到期狀態, 日期)，
+    內容、狀態或日期不同時才重新產生該張卡片；每次顯示時重建對照表，
+    已刪除記錄的片段隨之淘汰。使用者數量超過上限時淘汰最久未顯示者。
+    """
+
+    def __init__(self, max_users=256):
+        self.max_users = max_users
+        self._users = OrderedDict()  # username -> {deposit_id: (簽章, HTML)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, username, deposits, statuses, today, live_ids=None):
+        """回傳每筆記錄的卡片 HTML（順序與 deposits 相同）
+
+        只顯示部分記錄（分頁）時傳入 live_ids（使用者目前所有記錄的 id），
+        其他頁的片段會保留，只淘汰已不存在的記錄。
+        """
+        with self._lock:
+            previous = self._users.pop(username, {})
+        if live_ids is not None:
+            fragments = {i: f for i, f in previous.items() if i in live_ids}
         else:
-            card_style = "background: white; border: 1px solid #e5e7eb;"
-            status_text = ""
-            status_color = "#6b7280"
-            status_emoji = ""
-        
-        redeem_info = ui_config.REDEEM_LINKS.get(deposit['redeemMethod'], {
-            'app': '#',
-            'name': deposit['redeemMethod']
-        })
-        app_link = redeem_info['app']
-        app_name = redeem_info['name']
-        google_maps_link = f"https://www.google.com/maps/search/{deposit['store']}"
-        
-        html += f"""
-        <div style="padding: 24px; border-radius: 16px; {card_style} box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-            <div style="margin-bottom: 16px;">
-                <div style="display: flex; align-items: center; gap: 12px; margin-bottom: 12px; flex-wrap: wrap;">
-                    <h3 style="font-size: 24px; font-weight: bold; color: #1f2937; margin: 0;">{deposit['item']}</h3>
-                    <span style="background: #fef3c7; color: #92400e; padding: 6px 14px; border-radius: 20px; font-size: 14px; font-weight: 600;">
-                        {deposit['quantity']} 杯
-                    </span>
-                </div>
-                <div style="color: #4b5563; line-height: 2; font-size: 15px;">
-                    <div style="margin-bottom: 6px;">🏪 <strong>商店：</strong>{deposit['store']}</div>
-                    <div style="margin-bottom: 6px;">📦 <strong>兌換途徑：</strong>{deposit['redeemMethod']}</div>
-                    <div>📅 <strong>到期日：</strong>{date_utils.format_date(deposit['expiryDate'])} 
-                        <span style="color: {status_color}; font-weight: 600;">{status_emoji} {status_text}</span>
-                    </div>
-                </div>
-            </div>
-            <div style="display: flex; gap: 10px; flex-wrap: wrap; margin-bottom: 12px;">
-                <a href="{app_link}" target="_blank" 
-                   style="background: #9333ea; color: white; padding: 10px 18px; border-radius: 8px; text-decoration: none; font-size: 14px; font-weight: 500; display: inline-block; transition: all 0.2s; box-shadow: 0 2px 4px rgba(147, 51, 234, 0.3);">
-                    📱 開啟 {app_name} App
-                </a>
-                <a href="{google_maps_link}" target="_blank" 
-                   style="background: #2563eb; color: white; padding: 10px 18px; border-radius: 8px; text-decoration: none; font-size: 14px; font-weight: 500; display: inline-block; transition: all 0.2s;">
-                    🗺️ 查看商店位置
-                </a>
+            fragments = {}
+        cards = []
+        hits = 0
+        for deposit, status in zip(deposits, statuses):
+            deposit_id = deposit.get('id')
+            signature = (tuple(deposit.get(field) for field in CARD_FIELDS), status, today)
+            cached = previous.get(deposit_id)
+            if cached is not None and cached[0] == signature:
+                html = cached[1]
+                hits += 1
+            else:
+                html = _render_card(deposit, status)
+            fragments[deposit_id] = (signature, html)
+            cards.append(html)
+        with self._lock:
+            self._users[username] = fragments
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            self.hits += hits
+            self.misses += len(cards) - hits
+        return cards
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._users),
+                'fragments': sum(len(f) for f in self._users.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+card_cache = CardFragmentCache(settings.CARD_CACHE_USERS)
+
+def _render_card(deposit, status):
+    """產生單張寄杯卡片的 HTML"""
+    # 根據狀態設置樣式
+    if status == date_utils.STATUS_EXPIRED:
+        card_style = "background: #fef2f2; border: 2px solid #fca5a5;"
+        status_text = "（已過期）"
+        status_color = "#dc2626"
+        status_emoji = "❌"
+    elif status == date_utils.STATUS_TODAY:
+        card_style = "background: #fff4ed; border: 2px solid #fb923c;"
+        status_text = "（今天到期）"
+        status_color = "#ea580c"
+        status_emoji = "⚠️"
+    elif status == date_utils.STATUS_SOON:
+        card_style = "background: #fefce8; border: 2px solid #fde047;"
+        status_text = "（即將到期）"
+        status_color = "#ca8a04"
+        status_emoji = "⏰"
+    else:
+        card_style = "background: white; border: 1px solid #e5e7eb;"
+        status_text = ""
+        status_color = "#6b7280"
+        status_emoji = ""
+
+    redeem_info = ui_config.REDEEM_LINKS.get(deposit['redeemMethod'], {
+        'app': '#',
+        'name': deposit['redeemMethod']
+    })
+    app_link = redeem_info['app']
+    app_name = redeem_info['name']
+    google_maps_link = f"https://www.google.com/maps/search/{deposit['store']}"
+
+    return f"""
+    <div style="padding: 24px; border-radius: 16px; {card_style} box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+        <div style="margin-bottom: 16px;">
+            <div style="display: flex; align-items: center; gap: 12px; margin-bottom: 12px; flex-wrap: wrap;">
+                <h3 style="font-size: 24px; font-weight: bold; color: #1f2937; margin: 0;">{deposit['item']}</h3>
+                <span style="background: #fef3c7; color: #92400e; padding: 6px 14px; border-radius: 20px; font-size: 14px; font-weight: 600;">
+                    {deposit['quantity']} 杯
+                </span>
             </div>
-            <div style="padding: 12px; background: #f9fafb; border-radius: 8px; font-size: 12px; color: #6b7280;">
-                💡 <strong>提示：</strong>點擊「開啟 App」會嘗試開啟對應的手機應用程式
+            <div style="color: #4b5563; line-height: 2; font-size: 15px;">
+                <div style="margin-bottom: 6px;">🏪 <strong>商店：</strong>{deposit['store']}</div>
+                <div style="margin-bottom: 6px;">📦 <strong>兌換途徑：</strong>{deposit['redeemMethod']}</div>
+                <div>📅 <strong>到期日：</strong>{date_utils.format_date(deposit['expiryDate'])} 
+                    <span style="color: {status_color}; font-weight: 600;">{status_emoji} {status_text}</span>
+                </div>
             </div>
         </div>
-        """
+        <div style="display: flex; gap: 10px; flex-wrap: wrap; margin-bottom: 12px;">
+            <a href="{app_link}" target="_blank" 
+               style="background: #9333ea; color: white; padding: 10px 18px; border-radius: 8px; text-decoration: none; font-size: 14px; font-weight: 500; display: inline-block; transition: all 0.2s; box-shadow: 0 2px 4px rgba(147, 51, 234, 0.3);">
+                📱 開啟 {app_name} App
+            </a>
+            <a href="{google_maps_link}" target="_blank" 
+               style="background: #2563eb; color: white; padding: 10px 18px; border-radius: 8px; text-decoration: none; font-size: 14px; font-weight: 500; display: inline-block; transition: all 0.2s;">
+                🗺️ 查看商店位置
+            </a>
+        </div>
+        <div style="padding: 12px; background: #f9fafb; border-radius: 8px; font-size: 12px; color: #6b7280;">
+            💡 <strong>提示：</strong>點擊「開啟 App」會嘗試開啟對應的手機應用程式
+        </div>
+    </div>
+    """
+
+def get_deposits_display(username):
+    """取得寄杯記錄顯示"""
+    if not username:
+        return LOGIN_PROMPT_HTML
     
-    html += '</div>'
-    return html
+    deposits = storage.load_deposits(username)
+    deposits.sort(key=lambda x: x.get('expiryDate', '9999-12-31'))
+    today = date_utils.today()
+    statuses, _ = date_utils.classify_deposits(deposits, today)
+    return render_deposits(username, deposits, statuses, today)
+
+def render_deposits(username, deposits, statuses, today, live_ids=None, empty_html=EMPTY_DEPOSITS_HTML):
+    """以已排序、已分類的記錄產生寄杯列表 HTML（分頁時只傳入當頁記錄）"""
+    if not deposits:
+        return empty_html
+    
+    cards = card_cache.render(username, deposits, statuses, today, live_ids)
+    
+    return ''.join(['<div style="display: flex; flex-direction: column; gap: 20px;">', *cards, '</div>'])
 
 def get_statistics(username):
     """取得統計資訊"""
     if not username:
         return ""
     
-    deposits = storage.load_deposits(username)
-    
-    if not deposits:
+    return render_statistics(stats_store.stats.get(username))
+
+def render_statistics(stats):
+    """以統計彙總（見 stats_store）產生統計資訊 HTML，不需要逐筆掃描記錄"""
+    if not stats['records']:
         return ""
     
-    total_cups = sum(d['quantity'] for d in deposits)
-    valid_records = len([d for d in deposits if not date_utils.is_expired(d['expiryDate'])])
-    expired_records = len([d for d in deposits if date_utils.is_expired(d['expiryDate'])])
-    expiring_today = len([d for d in deposits if date_utils.is_expiring_today(d['expiryDate'])])
-    expiring_soon = len([d for d in deposits if date_utils.is_expiring_soon(d['expiryDate']) and not date_utils.is_expired(d['expiryDate']) and not date_utils.is_expiring_today(d['expiryDate'])])
+    total_cups = stats['cups']
+    expired_records = stats[date_utils.STATUS_EXPIRED]
+    valid_records = stats['records'] - expired_records
+    expiring_today = stats[date_utils.STATUS_TODAY]
+    expiring_soon = stats[date_utils.STATUS_SOON]
     
     html = f"""
     <div style="background: white; padding: 24px; border-radius: 16px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); margin-top: 24px;">
@@ -0,0 +1,129 @@
+# src/ui/queue_monitor.py
+
+import threading
+import time
+from collections import deque
+from ..config import settings
+
+
+class QueueMonitor:
+    """Gradio 佇列各並行群組（concurrency_id）的深度與等待時間
+
+    Gradio 沒有公開佇列統計的 API，這裡讀取 blocks._queue 的內部結構（以 requirements.txt 固定的 gradio 4.44 為準）：
+    每個 concurrency_id 一個 EventQueue，queue 為等待中的事件、current_concurrency 為執行中的數量，
+    事件進入佇列的時間記在 event_analytics。升級 Gradio 後這些私有屬性可能改名或消失，
+    因此一律以 getattr 讀取：找不到的部分以空值/None 代替，統計變少但不會讓 /metrics 出錯。
+    背景每 interval 秒取樣一次：記錄各群組的佇列深度峰值，並以事件離開佇列的取樣時間估計等待時間
+    （誤差不超過 interval）。等待時間只統計取樣時仍在排隊的事件（waited 為其數量），
+    不到一個取樣間隔就開始執行的事件不列入。沒有指定 concurrency_id 的事件以函式 id 為群組名稱。
+    """
+
+    def __init__(self, interval=1.0, window=1000):
+        self.interval = interval
+        self.window = window
+        self._blocks = None
+        self._lock = threading.Lock()
+        self._waiting = {}   # 群組 -> {event_id: 進入佇列的時間}
+        self._waits = {}     # 群組 -> 最近 window 筆的等待秒數
+        self._peaks = {}     # 群組 -> 佇列深度峰值
+        self._started = {}   # 群組 -> 取樣時在排隊、之後開始執行的事件數
+        self._last_sample = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def attach(self, blocks):
+        """開始監看 blocks 的佇列"""
+        self._blocks = blocks
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='queue-monitor', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _event_queues(self):
+        queue = getattr(self._blocks, '_queue', None)
+        event_queues = getattr(queue, 'event_queue_per_concurrency_id', None)
+        analytics = getattr(queue, 'event_analytics', None)
+        if not isinstance(event_queues, dict):
+            return {}, {}
+        # 在另一個執行緒讀取，先複製一份避免迭代時被修改
+        return dict(event_queues), analytics if isinstance(analytics, dict) else {}
+
+    @staticmethod
+    def _queued_events(event_queue):
+        return list(getattr(event_queue, 'queue', None) or ())
+
+    @staticmethod
+    def _queued_at(analytics, event, default=None):
+        entry = analytics.get(getattr(event, '_id', None))
+        return entry.get('time', default) if isinstance(entry, dict) else default
+
+    def snapshot(self):
+        """目前各群組的 {limit, running, queued, oldest_wait}"""
+        now = time.time()
+        event_queues, analytics = self._event_queues()
+        result = {}
+        for group, event_queue in event_queues.items():
+            waiting = self._queued_events(event_queue)
+            oldest = self._queued_at(analytics, waiting[0]) if waiting else None
+            result[str(group)] = {
+                'limit': getattr(event_queue, 'concurrency_limit', None),
+                'running': getattr(event_queue, 'current_concurrency', None),
+                'queued': len(waiting),
+                'oldest_wait': round(now - oldest, 3) if oldest else 0.0
+            }
+        return result
+
+    def sample(self):
+        now = time.time()
+        previous = self._last_sample or now
+        event_queues, analytics = self._event_queues()
+        with self._lock:
+            for group, event_queue in event_queues.items():
+                group = str(group)
+                current = {
+                    getattr(event, '_id', id(event)): self._queued_at(analytics, event, now)
+                    for event in self._queued_events(event_queue)
+                }
+                waiting = self._waiting.get(group, {})
+                # 上次還在等、這次已不在佇列的事件，在兩次取樣之間開始執行
+                left = [queued_at for event_id, queued_at in waiting.items() if event_id not in current]
+                if left:
+                    waits = self._waits.setdefault(group, deque(maxlen=self.window))
+                    started_at = (previous + now) / 2
+                    waits.extend(max(0.0, started_at - queued_at) for queued_at in left)
+                    self._started[group] = self._started.get(group, 0) + len(left)
+                self._waiting[group] = current
+                self._peaks[group] = max(self._peaks.get(group, 0), len(current))
+            self._last_sample = now
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"佇列取樣失敗: {e}")
+
+    def metrics(self):
+        """各群組目前的狀態，加上佇列深度峰值與最近的等待時間統計（秒）"""
+        current = self.snapshot()
+        with self._lock:
+            for group, stats in current.items():
+                waits = sorted(self._waits.get(group, ()))
+                stats['peak_queued'] = self._peaks.get(group, 0)
+                stats['waited'] = self._started.get(group, 0)
+                stats['avg_wait'] = round(sum(waits) / len(waits), 3) if waits else 0.0
+                stats['p95_wait'] = round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0
+                stats['max_wait'] = round(waits[-1], 3) if waits else 0.0
+        return current
+
+    def reset(self):
+        with self._lock:
+            self._waits.clear()
+            self._peaks.clear()
+            self._started.clear()
+
+
+monitor = QueueMonitor(interval=settings.QUEUE_METRICS_SECONDS)
@@ -0,0 +1,67 @@
+# src/ui/view_model.py
+
+from collections import namedtuple
+import gradio as gr
+from ..services import deposit_service, stats_store, storage
+from ..services.deposit_query import ViewQuery, query_deposits
+from ..utils import date_utils
+from . import components
+
+# 一次事件要更新的輸出：寄杯列表、統計資訊、下拉選單、分頁資訊、目前頁碼，
+# 以及這次輸出的版本標記（存在 gr.State，下次事件時傳回 build_view）
+DepositView = namedtuple('DepositView', ['deposits_html', 'statistics_html', 'choices', 'page_info', 'page', 'etag'])
+
+def empty_view():
+    """未登入時的畫面"""
+    return DepositView(components.LOGIN_PROMPT_HTML, "", gr.update(choices=[], value=[]), "", 1, None)
+
+def view_etag(username, query, today):
+    """各輸出的版本標記：列表（含下拉選單與分頁）取決於資料版本、日期與查詢條件，統計只取決於前兩者"""
+    base = (username, storage.data_version(username), today.isoformat())
+    return {'list': repr((base, tuple(query))), 'stats': repr(base)}
+
+def build_view(username, query=None, known_etag=None):
+    """載入一次使用者的寄杯記錄，排序、分類一次，同時產生列表、統計與下拉選單
+
+    三個輸出來自同一份快照與同一個參考日期，彼此一致。
+    統計涵蓋全部記錄，取自增量維護的統計彙總：彙總的修訂號與這份快照相同時直接使用，
+    不同時才以分類結果重新計數；列表與下拉選單只包含篩選後的當頁記錄。
+    known_etag 為瀏覽器目前畫面的版本標記，版本相同的輸出回傳 gr.update()（不重新產生、不傳送）。
+    """
+    if not username:
+        return empty_view()
+    query = query or ViewQuery()
+    today = date_utils.today()
+    # 版本在讀取資料前取得：讀取期間若有寫入，下次比對時版本不同，會再重新產生
+    etag = view_etag(username, query, today)
+    known_etag = known_etag or {}
+
+    # 列表的版本包含統計的版本，列表未變時統計也未變
+    if known_etag.get('list') == etag['list']:
+        return DepositView(gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), etag)
+
+    result = query_deposits(username, query, today)
+    deposits = result.deposits
+
+    if known_etag.get('stats') == etag['stats']:
+        statistics_html = gr.update()
+    else:
+        stats = stats_store.stats.get(username, today, snapshot=(deposits, result.statuses, result.revision))
+        statistics_html = components.render_statistics(stats)
+
+    if result.total:
+        page_info = (f"第 {result.page} / {result.pages} 頁，"
+                     f"顯示第 {result.start + 1}-{result.end} 筆，共 {result.total} 筆符合條件")
+    else:
+        page_info = ""
+    empty_html = components.NO_MATCH_HTML if deposits else components.EMPTY_DEPOSITS_HTML
+    live_ids = {d.get('id') for d in deposits}
+
+    return DepositView(
+        components.render_deposits(username, result.page_deposits, result.page_statuses, today, live_ids, empty_html),
+        statistics_html,
+        deposit_service.build_deposit_choices(result.page_deposits, result.page_statuses),
+        page_info,
+        result.page,
+        etag
+    )
@@ -5,13 +5,28 @@ from .date_utils import (
     is_expiring_today,
     is_expired,
     format_date,
-    calculate_expiry_date_display
+    calculate_expiry_date_display,
+    classify_deposits,
+    expiry_status,
+    count_statuses,
+    parse_date,
+    today,
+    DayClock
 )
+from .ids import new_id, is_ulid
 
 __all__ = [
     'is_expiring_soon',
     'is_expiring_today',
     'is_expired',
     'format_date',
-    'calculate_expiry_date_display'
+    'calculate_expiry_date_display',
+    'classify_deposits',
+    'expiry_status',
+    'count_statuses',
+    'parse_date',
+    'today',
+    'DayClock',
+    'new_id',
+    'is_ulid'
 ]
\ No newline at end of file
@@ -1,42 +1,133 @@
 # src/utils/date_utils.py
 
-from datetime import datetime, timedelta
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from ..config import settings
+
+# 到期狀態分類
+STATUS_EXPIRED = 'expired'    # 已過期
+STATUS_TODAY = 'today'        # 今天到期
+STATUS_SOON = 'soon'          # 7 天內到期（不含今天）
+STATUS_VALID = 'valid'        # 其他（含日期無法解析者）
+SOON_DAYS = 7
+
+class DayClock:
+    """以日為單位的時鐘：快取「今天」，在指定時區的午夜才換日
+
+    伺服器跑在 UTC，但使用者在台灣，到期判斷一律以 tz（預設 settings.APP_TIMEZONE）的日期為準。
+    now_fn 可注入固定時間供測試使用，需回傳帶時區的 datetime。
+    """
+
+    def __init__(self, tz=None, now_fn=None):
+        self.tz = _resolve_timezone(tz if tz is not None else settings.APP_TIMEZONE)
+        self._now_fn = now_fn or (lambda: datetime.now(self.tz))
+        self._today = None
+        self._next_midnight = None
+        self._lock = threading.Lock()
+
+    def now(self):
+        """目前時間（帶時區）"""
+        return self._now_fn()
+
+    def today(self):
+        """目前時區的今天日期；同一天內回傳同一個 date 物件"""
+        now = self.now()
+        next_midnight = self._next_midnight
+        if next_midnight is not None and now < next_midnight:
+            return self._today
+        with self._lock:
+            tzinfo = self.tz if now.tzinfo else None
+            today = now.astimezone(tzinfo).date() if tzinfo else now.date()
+            self._today = today
+            self._next_midnight = datetime.combine(today + timedelta(days=1), time(), tzinfo=tzinfo)
+            return today
+
+# 沒有時區資料庫（精簡的 Docker 映像、未安裝 tzdata）時改用固定時差；只列出沒有日光節約時間的時區
+_FIXED_OFFSETS = {
+    'Asia/Taipei': timezone(timedelta(hours=8), 'Asia/Taipei'),
+}
+
+def _resolve_timezone(tz):
+    if not isinstance(tz, str):
+        return tz
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        if tz in _FIXED_OFFSETS:
+            print(f"找不到時區資料 {tz}，改用固定時差 {_FIXED_OFFSETS[tz]}")
+            return _FIXED_OFFSETS[tz]
+        print(f"找不到時區 {tz}，改用伺服器本地時間")
+        return None
+
+# 全域時鐘；測試時可用 set_clock 換成固定時間的 DayClock
+clock = DayClock()
+
+def set_clock(new_clock):
+    """替換全域時鐘，回傳原本的時鐘以便還原"""
+    global clock
+    previous, clock = clock, new_clock
+    return previous
+
+def today():
+    """目前時區的今天日期"""
+    return clock.today()
+
+# fromisoformat 也接受 20241005、2024-W40-6 等寫法，只有完整的 YYYY-MM-DD 才走快速路徑
+_ISO_DATE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+@lru_cache(maxsize=4096)
+def _parse_date_cached(date_str):
+    if _ISO_DATE.fullmatch(date_str):
+        try:
+            # 標準 YYYY-MM-DD 走 fromisoformat，比 strptime 快一個數量級
+            return date.fromisoformat(date_str)
+        except ValueError:
+            return None
+    try:
+        # 相容未補零的寫法（例如 2024-1-5）
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def parse_date(date_str):
+    """解析 YYYY-MM-DD 為 date，結果有上限地快取；無法解析回傳 None"""
+    if not isinstance(date_str, str):
+        return None
+    return _parse_date_cached(date_str)
+
+def _days_until(expiry_date_str):
+    expiry_date = parse_date(expiry_date_str)
+    if expiry_date is None:
+        return None
+    return (expiry_date - clock.today()).days
 
 def is_expiring_soon(expiry_date_str):
     """檢查是否即將到期（7天內，包含到期日當天）"""
-    try:
-        expiry_date = datetime.strptime(expiry_date_str, '%Y-%m-%d').date()
-        today = datetime.now().date()
-        days_until_expiry = (expiry_date - today).days
-        return 0 <= days_until_expiry <= 7  # 0 表示今天到期（還可以用）
-    except:
+    days_until_expiry = _days_until(expiry_date_str)
+    if days_until_expiry is None:
         return False
+    return 0 <= days_until_expiry <= 7  # 0 表示今天到期（還可以用）
 
 def is_expiring_today(expiry_date_str):
     """檢查是否今天到期"""
-    try:
-        expiry_date = datetime.strptime(expiry_date_str, '%Y-%m-%d').date()
-        today = datetime.now().date()
-        return expiry_date == today
-    except:
-        return False
+    return _days_until(expiry_date_str) == 0
 
 def is_expired(expiry_date_str):
     """檢查是否已過期"""
-    try:
-        expiry = datetime.strptime(expiry_date_str, '%Y-%m-%d')
-        today = datetime.now().date()  # 只取日期
-        return today > expiry.date()
-    except:
-        return False
+    days_until_expiry = _days_until(expiry_date_str)
+    return days_until_expiry is not None and days_until_expiry < 0
 
 def format_date(date_str):
     """格式化日期"""
-    try:
-        date = datetime.strptime(date_str, '%Y-%m-%d')
-        return date.strftime('%Y/%m/%d')
-    except:
+    parsed = parse_date(date_str)
+    if parsed is None:
         return date_str
+    return parsed.strftime('%Y/%m/%d')
 
 def calculate_expiry_date_display(days):
     """根據天數計算到期日並顯示"""
@@ -45,7 +136,7 @@ def calculate_expiry_date_display(days):
     
     try:
         days = int(days)
-        expiry_date = datetime.now() + timedelta(days=days)
+        expiry_date = clock.today() + timedelta(days=days)
         formatted_date = expiry_date.strftime('%Y年%m月%d日 (%A)')
         weekday_map = {
             'Monday': '星期一', 'Tuesday': '星期二', 'Wednesday': '星期三',
@@ -56,4 +147,52 @@ def calculate_expiry_date_display(days):
         
         return f"📅 **計算結果：{formatted_date}**"
     except:
-        return "❌ 計算錯誤"
\ No newline at end of file
+        return "❌ 計算錯誤"
+
+def classify_deposits(deposits, today=None):
+    """一次分類整批寄杯的到期狀態
+
+    每筆到期日經 parse_date 快取解析、所有記錄共用同一個參考日期（預設為 clock 的今天），
+    回傳 (狀態陣列, 剩餘天數陣列)；無法解析的日期狀態為 STATUS_VALID、天數為 NaN。
+    """
+    if not deposits:
+        return np.array([], dtype=object), np.array([], dtype=float)
+    if today is None:
+        today = clock.today()
+    ordinals = np.fromiter(
+        (_date_ordinal(d.get('expiryDate')) for d in deposits),
+        dtype=float,
+        count=len(deposits)
+    )
+    days = ordinals - today.toordinal()
+    with np.errstate(invalid='ignore'):
+        statuses = np.select(
+            [days < 0, days == 0, days <= SOON_DAYS],
+            [STATUS_EXPIRED, STATUS_TODAY, STATUS_SOON],
+            default=STATUS_VALID
+        ).astype(object)
+    return statuses, days
+
+def _date_ordinal(date_str):
+    parsed = parse_date(date_str)
+    return parsed.toordinal() if parsed is not None else np.nan
+
+def expiry_status(expiry_date_str, today=None):
+    """單筆記錄的到期狀態（與 classify_deposits 的分類一致）"""
+    expiry_date = parse_date(expiry_date_str)
+    if expiry_date is None:
+        return STATUS_VALID
+    days = (expiry_date - (today or clock.today())).days
+    if days < 0:
+        return STATUS_EXPIRED
+    if days == 0:
+        return STATUS_TODAY
+    if days <= SOON_DAYS:
+        return STATUS_SOON
+    return STATUS_VALID
+
+def count_statuses(statuses):
+    """統計各狀態的筆數"""
+    counts = {STATUS_EXPIRED: 0, STATUS_TODAY: 0, STATUS_SOON: 0, STATUS_VALID: 0}
+    counts.update(Counter(statuses))
+    return counts
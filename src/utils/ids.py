@@ -0,0 +1,68 @@
+# src/utils/ids.py
+
+import os
+import threading
+import time
+
+# ULID：48 位元毫秒時間戳 + 80 位元亂數，以 Crockford Base32 編碼成 26 個字元。
+# 字串排序即時間排序；同一毫秒內由產生器遞增亂數部分，保證單調遞增、不重複。
+_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+ID_LENGTH = 26
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+def _random():
+    return int.from_bytes(os.urandom(_RANDOM_BITS // 8), 'big')
+
+def format_id(timestamp_ms, randomness):
+    return _encode(timestamp_ms, 10) + _encode(randomness, 16)
+
+
+class IdGenerator:
+    """單調遞增的 ULID 產生器（執行緒安全）
+
+    clock 回傳毫秒時間戳，可注入固定時間供測試使用。
+    時鐘倒退或同一毫秒內連續產生時，沿用上一個時間戳並將亂數部分加一。
+    """
+
+    def __init__(self, clock=None):
+        self._clock = clock or (lambda: int(time.time() * 1000))
+        self._last_ms = -1
+        self._last_random = 0
+        self._lock = threading.Lock()
+
+    def new(self):
+        with self._lock:
+            now = self._clock()
+            if now > self._last_ms:
+                self._last_ms = now
+                self._last_random = _random()
+            elif self._last_random < _RANDOM_MAX:
+                self._last_random += 1
+            else:
+                # 亂數部分用盡（實務上不會發生），借用下一毫秒
+                self._last_ms += 1
+                self._last_random = _random()
+            return format_id(self._last_ms, self._last_random)
+
+
+generator = IdGenerator()
+
+def new_id():
+    """產生新的寄杯 id"""
+    return generator.new()
+
+def id_for_timestamp(timestamp_ms):
+    """以指定的毫秒時間戳產生 id（遷移舊資料用，不影響產生器的單調狀態）"""
+    return format_id(int(timestamp_ms), _random())
+
+def is_ulid(value):
+    return isinstance(value, str) and len(value) == ID_LENGTH and all(c in _ALPHABET for c in value)
@@ -0,0 +1,17 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+# 服務模組在匯入時就會建立資料夾、同步排程與背景執行緒，結束時還會由 atexit 寫回 Session 與上傳，
+# 因此在匯入 src 之前把資料夾指到暫存的絕對路徑（pytest 結束時會切回原本的工作目錄），
+# 並關閉遠端同步、提醒與 id 遷移，避免碰到工作目錄中的正式資料
+_tmp_root = tempfile.mkdtemp()
+os.environ.setdefault('DATA_DIR', os.path.join(_tmp_root, 'data'))
+os.environ.setdefault('HYDRATION_MODE', 'off')
+os.environ.setdefault('DATA_REMOTE', tempfile.mkdtemp())
+os.environ.setdefault('REMINDER_SINKS', '')
+os.environ.setdefault('ID_MIGRATION', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(_tmp_root)
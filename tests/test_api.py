@@ -0,0 +1,66 @@
+# tests/test_api.py
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api import register_metrics, router, routes
+from src.config import settings, ui_config
+from src.services import auth, session_store, storage, user_store
+
+
+def make_client():
+    api = FastAPI()
+    api.include_router(router)
+    return TestClient(api, base_url='http://test' + settings.API_PREFIX)
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_only_api_tokens_are_accepted():
+    username = 'api-user'
+    user_store.users.add(username, {'password': auth.hash_password('password'), 'created_at': None})
+    client = make_client()
+
+    # 瀏覽器「記住我」的 Session id 由 IP 與 User-Agent 推算，不能拿來呼叫 API
+    browser_session = 'a' * 16
+    session_store.sessions.create(browser_session, username, session_store.SESSION_TTL)
+    assert client.get('/deposits', headers=bearer(browser_session)).status_code == 401
+    assert client.post('/logout', headers=bearer(browser_session)).status_code == 401
+    assert auth.validate_session(browser_session) == username
+
+    token = client.post('/login', json={'username': username, 'password': 'password'}).json()['token']
+    assert client.get('/deposits', headers=bearer(token)).status_code == 200
+    assert client.post('/logout', headers=bearer(token)).status_code == 200
+    assert client.get('/deposits', headers=bearer(token)).status_code == 401
+    assert auth.validate_session(browser_session) == username
+
+
+def test_errors_map_to_status_codes_by_error_kind(monkeypatch):
+    username = 'api-errors'
+    user_store.users.add(username, {'password': auth.hash_password('password'), 'created_at': None})
+    client = make_client()
+    headers = bearer(client.post('/login', json={'username': username, 'password': 'password'}).json()['token'])
+    body = {'items': ['拿鐵'], 'quantity': 1, 'store': ui_config.STORE_OPTIONS[0],
+            'redeemMethod': ui_config.REDEEM_METHODS[0], 'days': 30}
+    assert client.post('/deposits', json=body, headers=headers).status_code == 200
+    deposit_id = client.get('/deposits', headers=headers).json()['deposits'][0]['id']
+
+    assert client.post('/deposits/missing/redeem', headers=headers).status_code == 404
+    assert client.post(f'/deposits/{deposit_id}/redeem', json={'cups': 5}, headers=headers).status_code == 409
+    assert client.post('/deposits', json={**body, 'items': []}, headers=headers).status_code == 400
+    # 寫入失敗（例如版本衝突重試用盡）
+    monkeypatch.setattr(storage, 'mutate_deposits',
+                        lambda username, plan, **kwargs: (False, plan(storage.load_deposits(username))[1]))
+    assert client.delete(f'/deposits/{deposit_id}', headers=headers).status_code == 500
+
+
+def test_metrics_include_registered_sources(monkeypatch):
+    username = 'api-admin'
+    user_store.users.add(username, {'password': auth.hash_password('password'), 'created_at': None})
+    monkeypatch.setattr(settings, 'ADMIN_USERS', {username})
+    monkeypatch.setattr(routes, '_metrics_sources', {})
+    register_metrics('queue', lambda: {'depth': 0})
+
+    client = make_client()
+    headers = bearer(client.post('/login', json={'username': username, 'password': 'password'}).json()['token'])
+    assert client.get('/metrics', headers=headers).json()['queue'] == {'depth': 0}
@@ -0,0 +1,47 @@
+# tests/test_atomic.py
+
+import os
+import threading
+import pytest
+from src.services.backends.atomic import GroupCommitter, TEMP_SUFFIX, publish, write_temp
+
+
+def test_group_commit_batches_concurrent_writes(tmp_path):
+    committer = GroupCommitter(threading.Lock(), window=0.05)
+    barrier = threading.Barrier(8)
+
+    def writer(i):
+        target = str(tmp_path / f'{i}.json')
+        tmp = write_temp(target, f'[{i}]')
+        barrier.wait()
+        committer.commit([tmp], [(tmp, target)])
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 每個呼叫端返回時檔案都已生效，且同時到達的寫入合併成較少的批次
+    assert [(tmp_path / f'{i}.json').read_text() for i in range(8)] == [f'[{i}]' for i in range(8)]
+    assert committer.stats['writes'] == 8
+    assert committer.stats['batches'] < 8
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(TEMP_SUFFIX)]
+
+
+def test_failed_publish_keeps_old_file_and_removes_temp(tmp_path):
+    target = tmp_path / 'data.json'
+    target.write_text('old', encoding='utf-8')
+    tmp = write_temp(str(target), 'new')
+    with pytest.raises(OSError):
+        publish([tmp], [(tmp, str(tmp_path / 'missing' / 'data.json'))], threading.Lock())
+    assert target.read_text(encoding='utf-8') == 'old'
+    assert not os.path.exists(tmp)
+
+
+def test_group_commit_reports_errors_to_every_caller_in_the_batch(tmp_path):
+    committer = GroupCommitter(threading.Lock(), window=0.01)
+    tmp = write_temp(str(tmp_path / 'data.json'), 'new')
+    with pytest.raises(OSError):
+        committer.commit([tmp], [(tmp, str(tmp_path / 'missing' / 'data.json'))])
+    assert not os.path.exists(tmp)
@@ -0,0 +1,65 @@
+# tests/test_backends.py
+
+import threading
+import pytest
+from src.services.backends import JsonBackend, RevisionConflict, SQLiteBackend
+
+DEPOSIT = {'id': 'd1', 'item': '拿鐵', 'quantity': 2, 'store': '7-11', 'redeemMethod': 'App',
+           'expiryDate': '2030-01-01', 'createdAt': '2025-01-01T00:00:00'}
+
+def json_backend(tmp_path, **kwargs):
+    return JsonBackend(str(tmp_path / 'users.json'), str(tmp_path / 'sessions.json'),
+                       str(tmp_path / 'user_records'), threading.Lock(), **kwargs)
+
+BACKENDS = {
+    'json': lambda tmp_path: json_backend(tmp_path),
+    'json-journal': lambda tmp_path: json_backend(tmp_path, journal_threshold=64 * 1024),
+    'sqlite': lambda tmp_path: SQLiteBackend(str(tmp_path / 'coffee.db')),
+}
+
+
+@pytest.mark.parametrize('name', sorted(BACKENDS))
+def test_stale_revision_is_rejected_without_writing(tmp_path, name):
+    backend = BACKENDS[name](tmp_path)
+    assert backend.save_deposits('alice', [DEPOSIT], expected_revision=0)
+    deposits, revision = backend.load_versioned('alice')
+    assert (deposits, revision) == ([DEPOSIT], 1)
+
+    # 另一個寫入者搶先
+    assert backend.update_deposit('alice', 'd1', {'quantity': 1})
+    with pytest.raises(RevisionConflict) as conflict:
+        backend.save_deposits('alice', [], expected_revision=revision)
+    assert (conflict.value.expected, conflict.value.current) == (1, 2)
+    with pytest.raises(RevisionConflict):
+        backend.batch_deposits('alice', [{'op': 'delete', 'ids': ['d1']}], expected_revision=revision)
+    assert backend.load_versioned('alice') == ([{**DEPOSIT, 'quantity': 1}], 2)
+
+    assert backend.batch_deposits('alice', [{'op': 'delete', 'ids': ['d1']}], expected_revision=2)
+    assert backend.load_versioned('alice') == ([], 3)
+    backend.close()
+
+
+@pytest.mark.parametrize('name', sorted(BACKENDS))
+def test_compare_and_swap_admits_one_writer_per_revision(tmp_path, name):
+    backend = BACKENDS[name](tmp_path)
+    assert backend.save_deposits('alice', [DEPOSIT])
+    _, revision = backend.load_versioned('alice')
+    barrier = threading.Barrier(8)
+    outcomes = []
+
+    def writer(n):
+        barrier.wait()
+        try:
+            outcomes.append(backend.batch_deposits('alice', [{'op': 'update', 'id': 'd1', 'changes': {'quantity': n}}],
+                                                   expected_revision=revision))
+        except RevisionConflict:
+            outcomes.append(False)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert outcomes.count(True) == 1
+    assert backend.revision('alice') == revision + 1
+    backend.close()
@@ -0,0 +1,72 @@
+# tests/test_components.py
+
+from datetime import date, timedelta
+from src.config import ui_config
+from src.ui import components
+from src.ui.components import CardFragmentCache
+from src.utils import date_utils
+
+TODAY = date(2025, 1, 1)
+
+
+def make_deposit(deposit_id, days=30, **changes):
+    return {'id': deposit_id, 'item': f'拿鐵 {deposit_id}', 'quantity': 2, 'store': ui_config.STORE_OPTIONS[0],
+            'redeemMethod': ui_config.REDEEM_METHODS[0], 'expiryDate': (TODAY + timedelta(days=days)).isoformat(),
+            **changes}
+
+def render(cache, deposits, today=TODAY, live_ids=None):
+    statuses, _ = date_utils.classify_deposits(deposits, today)
+    return cache.render('alice', deposits, statuses, today, live_ids)
+
+
+def test_only_changed_cards_are_rerendered():
+    cache = CardFragmentCache()
+    deposits = [make_deposit(f'd{i}') for i in range(3)]
+    first = render(cache, deposits)
+    assert cache.stats()['misses'] == 3
+
+    deposits[1] = make_deposit('d1', quantity=1)
+    second = render(cache, deposits)
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert second[0] is first[0] and second[2] is first[2]
+    assert '1 杯' in second[1]
+    # 與不經快取直接產生的結果相同
+    statuses, _ = date_utils.classify_deposits(deposits, TODAY)
+    assert second == [components._render_card(d, s) for d, s in zip(deposits, statuses)]
+
+
+def test_status_and_day_changes_invalidate_cards():
+    cache = CardFragmentCache()
+    deposits = [make_deposit('d1', days=8), make_deposit('d2', days=100)]
+    first = render(cache, deposits)
+    # 換日後 d1 進入 7 天內，卡片需顯示「即將到期」
+    second = render(cache, deposits, today=TODAY + timedelta(days=1))
+    assert '即將到期' not in first[0] and '即將到期' in second[0]
+    assert cache.hits == 0
+
+
+def test_paged_renders_keep_other_pages_and_drop_deleted_records():
+    cache = CardFragmentCache()
+    deposits = [make_deposit(f'd{i}') for i in range(4)]
+    live_ids = {d['id'] for d in deposits}
+    render(cache, deposits[:2], live_ids=live_ids)
+    render(cache, deposits[2:], live_ids=live_ids)
+    assert cache.stats()['fragments'] == 4
+
+    render(cache, deposits[:1], live_ids=live_ids - {'d3'})
+    assert cache.stats()['fragments'] == 3
+    render(cache, deposits[2:3], live_ids=live_ids - {'d3'})
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_least_recently_shown_users_are_evicted():
+    cache = CardFragmentCache(max_users=2)
+    deposits = [make_deposit('d1')]
+    statuses, _ = date_utils.classify_deposits(deposits, TODAY)
+    for username in ('alice', 'bob', 'alice', 'carol'):
+        cache.render(username, deposits, statuses, TODAY)
+    assert cache.stats()['users'] == 2
+    # 最近顯示過的 alice 保留，bob 已被淘汰
+    cache.render('alice', deposits, statuses, TODAY)
+    cache.render('bob', deposits, statuses, TODAY)
+    assert (cache.hits, cache.misses) == (2, 4)
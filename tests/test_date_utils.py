@@ -0,0 +1,63 @@
+# tests/test_date_utils.py
+
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+import pytest
+from zoneinfo import ZoneInfoNotFoundError
+from src.utils import date_utils
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2024-10-05', date(2024, 10, 5)),
+    ('2024-1-5', date(2024, 1, 5)),
+    ('20241005', None),
+    ('2024-W40-6', None),
+    ('2024-02-30', None),
+    ('2024-10-05T00:00', None),
+    (None, None),
+])
+def test_parse_date_accepts_only_year_month_day(text, expected):
+    assert date_utils.parse_date(text) == expected
+
+
+def test_day_boundary_uses_taipei_offset_without_tz_database(monkeypatch):
+    def missing(key):
+        raise ZoneInfoNotFoundError(key)
+    monkeypatch.setattr(date_utils, 'ZoneInfo', missing)
+    now = datetime(2025, 1, 1, 15, 59, tzinfo=timezone.utc)
+    clock = date_utils.DayClock('Asia/Taipei', now_fn=lambda: now)
+
+    assert clock.today() == date(2025, 1, 1)
+    now = datetime(2025, 1, 1, 16, 0, tzinfo=timezone.utc)  # 台灣午夜
+    assert clock.today() == date(2025, 1, 2)
+
+
+def test_classify_deposits_matches_per_item_checks():
+    today = date(2025, 1, 10)
+    offsets = [-30, -1, 0, 1, 7, 8, 365]
+    deposits = [{'expiryDate': (today + timedelta(days=n)).isoformat()} for n in offsets]
+    deposits += [{'expiryDate': '2025-1-9'}, {'expiryDate': 'not a date'}, {}]
+
+    statuses, days = date_utils.classify_deposits(deposits, today)
+    assert list(statuses) == [date_utils.expiry_status(d.get('expiryDate'), today) for d in deposits]
+    assert list(statuses[:7]) == ['expired', 'expired', 'today', 'soon', 'soon', 'valid', 'valid']
+    assert list(days[:8]) == offsets + [-1]
+    assert np.isnan(days[8:]).all()
+    assert date_utils.count_statuses(statuses) == {'expired': 3, 'today': 1, 'soon': 2, 'valid': 4}
+
+    # 與原本逐筆判斷的函式一致
+    now = datetime(2025, 1, 10, tzinfo=timezone.utc)
+    clock = date_utils.set_clock(date_utils.DayClock(timezone.utc, now_fn=lambda: now))
+    try:
+        for deposit, status in zip(deposits, statuses):
+            expiry = deposit.get('expiryDate')
+            assert date_utils.is_expired(expiry) == (status == 'expired')
+            assert date_utils.is_expiring_today(expiry) == (status == 'today')
+            assert date_utils.is_expiring_soon(expiry) == (status in ('today', 'soon'))
+    finally:
+        date_utils.set_clock(clock)
+
+
+def test_classify_empty_list():
+    statuses, days = date_utils.classify_deposits([], date(2025, 1, 10))
+    assert len(statuses) == 0 and len(days) == 0
@@ -0,0 +1,57 @@
+# tests/test_deposit_query.py
+
+from datetime import date, timedelta
+import pytest
+from src.config import settings, ui_config
+from src.services import deposit_query, storage
+from src.utils import date_utils
+
+TODAY = date(2025, 1, 1)
+STORES = ui_config.STORE_OPTIONS
+
+
+def seed(username):
+    # 45 筆：到期日由晚到早寫入，商店輪流，前 5 筆（最晚寫入）已過期
+    deposits = [
+        {'id': f'd{i:02d}', 'item': '拿鐵', 'quantity': 1, 'store': STORES[i % len(STORES)],
+         'redeemMethod': ui_config.REDEEM_METHODS[0], 'expiryDate': (TODAY + timedelta(days=i - 5)).isoformat()}
+        for i in reversed(range(45))
+    ]
+    storage.save_deposits(username, deposits)
+    return deposits
+
+
+@pytest.mark.parametrize('total, page, expected', [
+    (0, 1, (1, 1, 0, 0)),
+    (45, 1, (1, 3, 0, 20)),
+    (45, 3, (3, 3, 40, 45)),
+    (45, 9, (3, 3, 40, 45)),
+    (45, -2, (1, 3, 0, 20)),
+])
+def test_paginate_clamps_page(total, page, expected):
+    assert deposit_query.paginate(total, 20, page) == expected
+
+
+def test_make_query_defaults_invalid_values():
+    assert deposit_query.make_query(None, '', None, 'x', None) == deposit_query.ViewQuery(
+        ui_config.FILTER_ALL, ui_config.FILTER_ALL, ui_config.FILTER_ALL, settings.PAGE_SIZE, 1)
+    assert deposit_query.make_query(page_size=0, page='2').page_size == 1
+
+
+def test_query_sorts_filters_and_pages():
+    username = 'query-user'
+    deposits = seed(username)
+
+    result = deposit_query.query_deposits(username, deposit_query.make_query(page_size=20, page=3), TODAY)
+    assert (result.total, result.page, result.pages, result.start, result.end) == (45, 3, 3, 40, 45)
+    assert [d['id'] for d in result.deposits] == sorted(d['id'] for d in deposits)
+    assert [d['id'] for d in result.page_deposits] == [f'd{i:02d}' for i in range(40, 45)]
+    assert result.revision == storage.deposit_revision(username)
+
+    query = deposit_query.make_query(status=date_utils.STATUS_EXPIRED, store=STORES[0], page_size=2)
+    result = deposit_query.query_deposits(username, query, TODAY)
+    assert [d['id'] for d in result.page_deposits] == ['d00', 'd03']
+    assert list(result.page_statuses) == [date_utils.STATUS_EXPIRED] * 2
+    assert (result.total, result.pages) == (2, 1)
+    # 統計與分頁無關，仍涵蓋全部記錄
+    assert len(result.deposits) == len(result.statuses) == 45
@@ -0,0 +1,58 @@
+# tests/test_deposit_service.py
+
+from datetime import timedelta
+from src.config import ui_config
+from src.services import deposit_service, storage
+from src.utils import date_utils
+
+
+def add(username, item, quantity, expiry_date):
+    message = deposit_service.add_deposit(username, item, quantity, ui_config.STORE_OPTIONS[0],
+                                          ui_config.REDEEM_METHODS[0], "選擇日期", expiry_date, None)[0]
+    assert message.startswith('✅'), message
+
+def quantities(username):
+    return {d['item']: d['quantity'] for d in storage.load_deposits(username)}
+
+
+def test_redeem_many_uses_valid_deposits_before_expired_ones():
+    username = 'redeem-mixed'
+    today = date_utils.today()
+    add(username, '過期', 2, (today - timedelta(days=3)).isoformat())
+    add(username, '較晚到期', 2, (today + timedelta(days=20)).isoformat())
+    add(username, '較早到期', 2, (today + timedelta(days=5)).isoformat())
+    ids = [d['id'] for d in storage.load_deposits(username)]
+
+    assert deposit_service.redeem_many(username, ids, 3)[0].startswith('✅')
+    assert quantities(username) == {'過期': 2, '較晚到期': 1}
+
+    # 未過期的不夠時才動用已過期的
+    assert deposit_service.redeem_many(username, [d['id'] for d in storage.load_deposits(username)], 2)[0].startswith('✅')
+    assert quantities(username) == {'過期': 1}
+
+
+def test_mutation_plans_only_use_their_snapshot(monkeypatch):
+    username = 'plan-snapshot'
+    add(username, '拿鐵', 3, (date_utils.today() + timedelta(days=5)).isoformat())
+    deposit_id = storage.load_deposits(username)[0]['id']
+
+    def fail(*args):
+        raise AssertionError('plan 不應查詢資料版本')
+    monkeypatch.setattr(storage, 'data_version', fail)
+
+    assert deposit_service.redeem_one(username, deposit_id)[0].startswith('✅')
+    assert deposit_service.redeem_many(username, [deposit_id], 1)[0].startswith('✅')
+    assert deposit_service.delete_many(username, [deposit_id, 'missing'])[0].startswith('✅')
+    assert storage.load_deposits(username) == []
+
+
+def test_zero_mutation_retries_still_tries_once(monkeypatch):
+    username = 'zero-retries'
+    add(username, '拿鐵', 2, (date_utils.today() + timedelta(days=5)).isoformat())
+    deposit_id = storage.load_deposits(username)[0]['id']
+    monkeypatch.setattr(storage.settings, 'MUTATION_RETRIES', 0)
+
+    assert deposit_service.redeem_many(username, [deposit_id], 1)[0].startswith('✅')
+    calls = []
+    assert storage.mutate_deposits(username, lambda deposits: calls.append(1) or ([], 'ok'), retries=0) == (True, 'ok')
+    assert calls == [1]
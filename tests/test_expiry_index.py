@@ -0,0 +1,44 @@
+# tests/test_expiry_index.py
+
+from datetime import date, timedelta
+from src.services.expiry_index import ExpiryIndex
+
+
+def make_index(deposits=()):
+    index = ExpiryIndex(lambda: iter(deposits))
+    index.build()
+    return index
+
+def deposit(deposit_id, expiry, item='拿鐵'):
+    return {'id': deposit_id, 'item': item, 'expiryDate': expiry.isoformat()}
+
+
+def test_due_and_next_expiry_follow_adds_and_removes():
+    today = date(2025, 1, 1)
+    index = make_index([('alice', deposit('a1', today + timedelta(days=3)))])
+    index.add('bob', [deposit('b1', today + timedelta(days=1), '美式'), deposit('b2', today + timedelta(days=9))])
+
+    assert index.next_expiry() == today + timedelta(days=1)
+    assert index.due(today, today + timedelta(days=3)) == [
+        (today + timedelta(days=1), 'bob', 'b1', '美式'),
+        (today + timedelta(days=3), 'alice', 'a1', '拿鐵'),
+    ]
+    # 更新到期日會從舊的桶移走
+    index.add('alice', [deposit('a1', today + timedelta(days=20))])
+    index.remove('bob', ['b1'])
+    assert index.due(today, today + timedelta(days=10)) == [(today + timedelta(days=9), 'bob', 'b2', '拿鐵')]
+    assert index.next_expiry() == today + timedelta(days=9)
+    assert len(index) == 2
+
+
+def test_heap_stays_bounded_under_churn():
+    today = date(2025, 1, 1)
+    index = make_index()
+    index.add('alice', [deposit('keep', today + timedelta(days=400))])
+    for i in range(5000):
+        day = today + timedelta(days=i % 300)
+        index.add('alice', [deposit(f'd{i}', day)])
+        index.remove('alice', [f'd{i}'])
+
+    assert len(index._days) <= 2 * len(index._buckets) + 64
+    assert index.next_expiry() == today + timedelta(days=400)
@@ -0,0 +1,38 @@
+# tests/test_formats.py
+
+import json
+import pytest
+from src.services.backends.formats import (
+    FORMAT_COLUMNAR, FORMAT_JSON, decode_deposits, encode_deposits, load_deposits_text
+)
+
+DEPOSITS = [
+    {'id': 'd1', 'item': '拿鐵', 'quantity': 2, 'store': '7-11', 'expiryDate': '2030-01-01'},
+    {'id': 'd2', 'item': '美式', 'quantity': 1, 'store': '全家', 'expiryDate': '2030-02-01'},
+]
+
+
+@pytest.mark.parametrize('deposits, layout', [
+    (DEPOSITS, 'columnar'),
+    # 欄位不一致（例如舊記錄缺欄位）時改用 records，不能遺失或補上欄位
+    ([DEPOSITS[0], {'id': 'd3', 'item': '紅茶', 'note': '少冰'}], 'records'),
+    ([], 'columnar'),
+], ids=['columnar', 'records', 'empty'])
+def test_v2_round_trip(deposits, layout):
+    text = encode_deposits(deposits, FORMAT_COLUMNAR, revision=7)
+    assert json.loads(text)['layout'] == layout
+    assert load_deposits_text(text) == (deposits, FORMAT_COLUMNAR, 7)
+
+
+def test_v1_files_are_read_with_revision_zero():
+    text = encode_deposits(DEPOSITS, FORMAT_JSON, revision=7)
+    assert load_deposits_text(text) == (DEPOSITS, FORMAT_JSON, 0)
+
+
+@pytest.mark.parametrize('data', [
+    {'format': 'deposits', 'version': 3, 'layout': 'columnar', 'columns': {}},
+    {'format': 'users'},
+])
+def test_unknown_formats_are_rejected(data):
+    with pytest.raises(ValueError):
+        decode_deposits(data)
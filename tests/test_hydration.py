@@ -0,0 +1,57 @@
+# tests/test_hydration.py
+
+import time
+from src.services.hydration import Hydrator
+from src.services.remote import LocalFolderRemote
+from src.services.sync import SyncScheduler
+
+
+class FlakyRemote(LocalFolderRemote):
+    """前幾次下載全部資料時失敗的遠端"""
+
+    def __init__(self, root, failures):
+        super().__init__(root)
+        self.failures = failures
+        self.uploads = []
+
+    def snapshot(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('hub unavailable')
+        return super().snapshot()
+
+    def upload(self, files, deletions=()):
+        self.uploads.append(dict(files))
+        super().upload(files, deletions)
+
+
+def test_failed_snapshot_keeps_fetching_and_blocks_uploads(tmp_path):
+    remote = FlakyRemote(str(tmp_path / 'remote'), failures=2)
+    (tmp_path / 'remote' / 'user_records').mkdir()
+    (tmp_path / 'remote' / 'user_records' / 'alice.json').write_text('[1]', encoding='utf-8')
+    local_dir = tmp_path / 'local'
+    hydrator = Hydrator(remote, str(local_dir), mode='eager', retry_initial=0.05)
+    scheduler = SyncScheduler(remote, str(local_dir), ready_fn=hydrator.is_ready)
+
+    hydrator.start()
+    assert hydrator.status()['state'] in ('failed', 'hydrating')
+    assert not hydrator.is_ready()
+    assert hydrator.wait_ready(0) is False
+
+    # 失敗期間仍按需下載使用者的檔案
+    hydrator.ensure(['user_records/alice.json'])
+    assert (local_dir / 'user_records' / 'alice.json').read_text(encoding='utf-8') == '[1]'
+
+    # 失敗期間不上傳本機變動
+    (local_dir / 'sessions.json').write_text('{}', encoding='utf-8')
+    scheduler.mark_dirty(str(local_dir / 'sessions.json'))
+    assert scheduler.push() is None
+    assert remote.uploads == []
+
+    deadline = time.time() + 5
+    while not hydrator.is_ready() and time.time() < deadline:
+        time.sleep(0.01)
+    assert hydrator.is_ready()
+    assert hydrator.status()['attempts'] == 3
+    assert scheduler.push()['files'] == 1
+    assert remote.uploads == [{'sessions.json': b'{}'}]
@@ -0,0 +1,148 @@
+# tests/test_json_backend.py
+
+import json
+import os
+import threading
+from src.services.backends import JsonBackend
+
+
+def make_backend(tmp_path, **kwargs):
+    return JsonBackend(
+        users_file=str(tmp_path / 'users.json'),
+        sessions_file=str(tmp_path / 'sessions.json'),
+        user_data_dir=str(tmp_path / 'user_records'),
+        sync_lock=threading.Lock(),
+        users_dir=str(tmp_path / 'users'),
+        **kwargs
+    )
+
+def call_with_timeout(fn, timeout=5):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('value', fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "呼叫逾時（疑似鎖死）"
+    return result.get('value')
+
+
+def test_legacy_users_migration_with_colliding_lock_stripes(tmp_path):
+    # 只有一段鎖時 users.json 與所有分片檔必定落在同一段
+    backend = make_backend(tmp_path, lock_stripes=1)
+    legacy = {f'user{i}': {'password': 'x', 'created_at': None} for i in range(10)}
+    (tmp_path / 'users.json').write_text(json.dumps(legacy), encoding='utf-8')
+
+    assert call_with_timeout(lambda: backend.get_user('user8')) == legacy['user8']
+    assert not os.path.exists(tmp_path / 'users.json')
+    assert backend.load_users() == legacy
+
+
+def test_journal_compaction_round_trip(tmp_path):
+    backend = make_backend(tmp_path, journal_threshold=1024 * 1024)
+    deposits = [{'id': f'd{i}', 'item': '拿鐵', 'quantity': 2, 'expiryDate': '2030-01-01'} for i in range(5)]
+    assert backend.add_deposits('alice', deposits)
+    assert backend.update_deposit('alice', 'd1', {'quantity': 1})
+    assert backend.delete_deposits('alice', ['d3']) == 1
+    assert backend.batch_deposits('alice', [{'op': 'delete', 'ids': ['d4']},
+                                            {'op': 'add', 'deposits': [{**deposits[0], 'quantity': 0}]}])
+    expected = backend.load_deposits('alice')
+    revision = backend.revision('alice')
+    assert revision == 4
+
+    backend.compact('alice')
+    assert not os.path.exists(backend.get_journal_file('alice'))
+    # 換一個新的後端實例，確保資料來自 checkpoint 而不是記憶體快取
+    reopened = make_backend(tmp_path, journal_threshold=1024 * 1024)
+    assert reopened.load_deposits('alice') == expected
+    assert [d['quantity'] for d in expected] == [0, 1, 2]
+    assert reopened.revision('alice') == revision
+
+
+def test_journal_replay_skips_torn_line_and_keeps_revision(tmp_path):
+    backend = make_backend(tmp_path, journal_threshold=1024 * 1024)
+    assert backend.add_deposits('alice', [{'id': 'd1', 'quantity': 2}])
+    assert backend.update_deposit('alice', 'd1', {'quantity': 1})
+    # 模擬寫到一半當機留下的殘缺行
+    with open(backend.get_journal_file('alice'), 'a', encoding='utf-8') as f:
+        f.write('{"op":"delete","ids":["d1"')
+
+    reopened = make_backend(tmp_path, journal_threshold=1024 * 1024)
+    assert reopened.load_deposits('alice') == [{'id': 'd1', 'quantity': 1}]
+    assert reopened.revision('alice') == 2
+    # 之後的寫入另起一行，不會接在殘缺行後面
+    assert reopened.add_deposits('alice', [{'id': 'd2', 'quantity': 3}])
+    again = make_backend(tmp_path, journal_threshold=1024 * 1024)
+    assert [d['id'] for d in again.load_deposits('alice')] == ['d1', 'd2']
+    assert again.revision('alice') == 3
+
+
+def test_compaction_is_triggered_in_the_background(tmp_path):
+    backend = make_backend(tmp_path, journal_threshold=256)
+    for i in range(20):
+        assert backend.add_deposits('alice', [{'id': f'd{i}', 'item': '拿鐵' * 5, 'quantity': 1}])
+    backend.compactor.join()
+    assert backend.load_deposits('alice') == [{'id': f'd{i}', 'item': '拿鐵' * 5, 'quantity': 1} for i in range(20)]
+    assert os.path.getsize(backend.get_user_data_file('alice')) > 0
+    reopened = make_backend(tmp_path, journal_threshold=256)
+    assert len(reopened.load_deposits('alice')) == 20
+    assert reopened.revision('alice') == 20
+
+
+def test_held_user_stripe_does_not_block_other_users(tmp_path):
+    backend = make_backend(tmp_path)
+    other = next(f'user{i}' for i in range(100)
+                 if backend.locks.for_key(f'user{i}') is not backend.locks.for_key('alice'))
+    with backend.locks.for_key('alice'):
+        assert call_with_timeout(lambda: backend.save_deposits(other, [{'id': 'd1', 'quantity': 1}]))
+    assert backend.load_deposits(other) == [{'id': 'd1', 'quantity': 1}]
+
+
+def test_concurrent_writers_lose_no_updates(tmp_path):
+    backend = make_backend(tmp_path, journal_threshold=4096, lock_stripes=4)
+    usernames = ['alice', 'bob', 'carol']
+
+    def writer(username, n):
+        for i in range(10):
+            assert backend.add_deposits(username, [{'id': f'{n}-{i}', 'quantity': 1}])
+
+    threads = [threading.Thread(target=writer, args=(username, n)) for username in usernames for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    backend.compactor.join()
+
+    reopened = make_backend(tmp_path, journal_threshold=4096)
+    for username in usernames:
+        assert len(reopened.load_deposits(username)) == 40
+        assert reopened.revision(username) == 40
+
+
+def test_group_durability_round_trip(tmp_path):
+    backend = make_backend(tmp_path, durability='group')
+    threads = [threading.Thread(target=backend.save_deposits, args=(f'user{i}', [{'id': 'd1', 'quantity': i}]))
+               for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reopened = make_backend(tmp_path)
+    assert [reopened.load_deposits(f'user{i}') for i in range(6)] == [[{'id': 'd1', 'quantity': i}] for i in range(6)]
+    assert backend.committer.stats['writes'] == 6
+
+
+def test_legacy_deposit_file_is_migrated_on_next_write(tmp_path):
+    backend = make_backend(tmp_path)
+    legacy = [{'id': 'd1', 'item': '拿鐵', 'quantity': 2}, {'id': 'd2', 'item': '美式', 'quantity': 1}]
+    path = backend.get_user_data_file('alice')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(legacy, f, ensure_ascii=False, indent=2)
+
+    # 讀取不改寫檔案，下一次寫入才轉成 v2
+    assert backend.load_deposits('alice') == legacy
+    with open(path, encoding='utf-8') as f:
+        assert isinstance(json.load(f), list)
+    assert backend.update_deposit('alice', 'd1', {'quantity': 1})
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    assert (data['format'], data['version'], data['revision']) == ('deposits', 2, 1)
+    assert make_backend(tmp_path).load_deposits('alice') == [{**legacy[0], 'quantity': 1}, legacy[1]]
@@ -0,0 +1,88 @@
+# tests/test_reminders.py
+
+import json
+import threading
+from datetime import date, timedelta
+from src.config import ui_config
+from src.services import deposit_service, expiry_index, storage
+from src.services.expiry_index import ExpiryIndex
+from src.services.reminders import FileSink, ReminderScheduler
+from src.utils import date_utils
+
+
+class ListSink:
+    def __init__(self):
+        self.reminders = []
+        self.sent = threading.Event()
+
+    def send(self, reminder):
+        self.reminders.append(reminder)
+        self.sent.set()
+
+
+class BrokenSink:
+    def send(self, reminder):
+        raise OSError("sink unavailable")
+
+
+class FixedClock:
+    def __init__(self, day):
+        self.day = day
+
+    def today(self):
+        return self.day
+
+def make_index(deposits):
+    index = ExpiryIndex(lambda: iter(deposits))
+    index.build()
+    return index
+
+
+def test_reminders_run_once_per_day(tmp_path):
+    today = date(2025, 1, 1)
+    index = make_index([
+        ('alice', {'id': 'a1', 'item': '拿鐵', 'expiryDate': '2025-01-02'}),
+        ('bob', {'id': 'b1', 'item': '美式', 'expiryDate': '2025-01-03'}),
+    ])
+    sink, clock = ListSink(), FixedClock(today)
+    file_sink = FileSink(str(tmp_path / 'out' / 'reminders.ndjson'))
+    scheduler = ReminderScheduler(index, [BrokenSink(), sink, file_sink], lead_days=1, interval=0.01, clock=clock)
+    scheduler.start()
+    try:
+        assert sink.sent.wait(5)
+        # 同一天內多次檢查只送一次
+        scheduler._stop.wait(0.1)
+        assert sink.reminders == [{'username': 'alice', 'depositId': 'a1', 'item': '拿鐵',
+                                   'expiryDate': '2025-01-02', 'daysLeft': 1}]
+        sink.sent.clear()
+        clock.day = today + timedelta(days=1)
+        assert sink.sent.wait(5)
+    finally:
+        scheduler.stop()
+        scheduler._thread.join(5)
+
+    assert [(r['depositId'], r['daysLeft']) for r in sink.reminders] == [('a1', 1), ('a1', 0), ('b1', 1)]
+    lines = (tmp_path / 'out' / 'reminders.ndjson').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == sink.reminders
+
+
+def test_reminders_follow_deposit_writes():
+    username = 'reminder-user'
+    assert expiry_index.index.wait_ready(5)
+    deposit_service.add_many(username, ['拿鐵', '美式'], 1, ui_config.STORE_OPTIONS[0],
+                             ui_config.REDEEM_METHODS[0], "輸入天數", None, 1)
+    deposits = storage.load_deposits(username)
+    today = date_utils.today()
+    scheduler = ReminderScheduler(expiry_index.index, [], lead_days=1)
+
+    def due_ids():
+        sink = ListSink()
+        scheduler.sinks = [sink]
+        scheduler.run_once(today)
+        return sorted(r['depositId'] for r in sink.reminders if r['username'] == username)
+
+    assert due_ids() == sorted(d['id'] for d in deposits)
+    # 兌換完畢與刪除的記錄不再提醒
+    deposit_service.redeem_one(username, deposits[0]['id'])
+    deposit_service.delete_deposit(username, deposits[1]['id'])
+    assert due_ids() == []
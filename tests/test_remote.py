@@ -0,0 +1,42 @@
+# tests/test_remote.py
+
+from src.services.remote import HubRemote
+
+
+class FakeApi:
+    def __init__(self, files):
+        self.files = files
+        self.calls = []
+
+    def create_repo(self, **kwargs):
+        self.calls.append('create_repo')
+
+    def list_repo_files(self, repo_id, repo_type=None):
+        self.calls.append('list_repo_files')
+        return list(self.files)
+
+    def file_exists(self, *args, **kwargs):
+        self.calls.append('file_exists')
+        return True
+
+    def create_commit(self, operations, **kwargs):
+        self.calls.append('create_commit')
+        self.operations = operations
+
+
+def test_upload_checks_deletions_against_one_file_listing():
+    remote = HubRemote('owner/data')
+    remote._api = api = FakeApi(['a.json', 'b.json', 'c.json'])
+    deletions = ['a.json', 'b.json', 'c.json', 'never-uploaded.journal']
+
+    remote.upload({'d.json': b'{}'}, deletions)
+
+    assert api.calls == ['create_repo', 'list_repo_files', 'create_commit']
+    assert [op.path_in_repo for op in api.operations] == ['d.json', 'a.json', 'b.json', 'c.json']
+
+
+def test_upload_without_deletions_skips_the_listing():
+    remote = HubRemote('owner/data')
+    remote._api = api = FakeApi([])
+    remote.upload({'d.json': b'{}'})
+    assert api.calls == ['create_repo', 'create_commit']
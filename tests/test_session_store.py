@@ -0,0 +1,81 @@
+# tests/test_session_store.py
+
+from datetime import datetime, timedelta
+from src.services.session_store import SessionStore
+
+
+class MemoryStorage:
+    """以 dict 代替 sessions.json，記錄每次寫回的內容"""
+
+    def __init__(self, sessions=None, fail=False):
+        self.sessions = dict(sessions or {})
+        self.saves = []
+        self.fail = fail
+
+    def load(self):
+        return dict(self.sessions)
+
+    def save(self, sessions):
+        if self.fail:
+            return False
+        self.saves.append(sessions)
+        self.sessions = dict(sessions)
+        return True
+
+
+def make_store(**kwargs):
+    backing = MemoryStorage(**kwargs)
+    return SessionStore(backing.load, backing.save), backing
+
+
+def test_writes_are_coalesced_until_flush():
+    store, backing = make_store()
+    for i in range(5):
+        store.create(f's{i}', f'user{i}', timedelta(hours=1))
+    store.delete('s0')
+    assert backing.saves == []
+
+    assert store.flush() is True
+    assert store.flush() is False
+    assert len(backing.saves) == 1
+    assert sorted(backing.sessions) == ['s1', 's2', 's3', 's4']
+
+    reloaded, _ = make_store(sessions=backing.sessions)
+    assert reloaded.get('s3') == 'user3'
+    assert reloaded.get('s0') is None
+
+
+def test_failed_flush_is_retried():
+    store, backing = make_store(fail=True)
+    store.create('s1', 'alice', timedelta(hours=1))
+    assert store.flush() is False
+    backing.fail = False
+    assert store.flush() is True
+    assert list(backing.sessions) == ['s1']
+
+
+def test_expired_sessions_are_dropped_and_persisted():
+    expired = (datetime.now() - timedelta(minutes=1)).isoformat()
+    store, backing = make_store(sessions={
+        'old': {'username': 'alice', 'created_at': expired, 'expires_at': expired},
+        'broken': {'username': 'bob'},
+    })
+    store.create('new', 'carol', timedelta(hours=1))
+    assert len(store) == 2
+    assert store.purge_expired() == 1
+    assert store.get('old') is None
+    assert store.get('new') == 'carol'
+    store.flush()
+    assert list(backing.sessions) == ['new']
+
+
+def test_expiry_heap_stays_bounded_when_sessions_are_renewed():
+    store, _ = make_store()
+    # 同一個 Session 反覆續期，heap 中的舊項目由 purge_expired 清掉
+    for _ in range(1000):
+        store.create('s1', 'alice', timedelta(hours=1))
+        store.purge_expired()
+    assert len(store._heap) <= 2 * len(store) + 64
+    later = (datetime.now() + timedelta(hours=2)).timestamp()
+    assert store.purge_expired(now=later) == 1
+    assert len(store) == 0
@@ -0,0 +1,49 @@
+# tests/test_sqlite_backend.py
+
+import sqlite3
+from src.services.backends import SQLiteBackend
+
+DEPOSIT = {'id': 'd1', 'item': '拿鐵', 'quantity': 2, 'store': '7-11', 'redeemMethod': 'App',
+           'expiryDate': '2030-01-01', 'createdAt': '2025-01-01T00:00:00'}
+
+
+def make_backend(tmp_path):
+    writes = []
+    backend = SQLiteBackend(str(tmp_path / 'coffee.db'), on_write=writes.append)
+    return backend, writes
+
+
+def test_noop_update_and_delete_keep_revision_and_skip_upload(tmp_path):
+    backend, writes = make_backend(tmp_path)
+    assert backend.save_deposits('alice', [DEPOSIT])
+    revision, version = backend.revision('alice'), backend.data_version('alice')
+    writes.clear()
+
+    assert backend.update_deposit('alice', 'missing', {'quantity': 1}) is False
+    assert backend.delete_deposits('alice', ['missing']) == 0
+    assert backend.revision('alice') == revision
+    assert backend.data_version('alice') == version
+    assert writes == []
+
+    assert backend.update_deposit('alice', 'd1', {'quantity': 1}) is True
+    assert backend.delete_deposits('alice', ['d1', 'missing']) == 1
+    assert backend.revision('alice') == revision + 2
+    assert len(writes) == 2
+    assert backend.load_deposits('alice') == []
+    backend.close()
+
+
+def test_update_and_delete_return_failure_when_database_is_locked(tmp_path):
+    backend, _ = make_backend(tmp_path)
+    assert backend.save_deposits('alice', [DEPOSIT])
+    backend._conn().execute('PRAGMA busy_timeout = 0')
+    blocker = sqlite3.connect(str(tmp_path / 'coffee.db'))
+    blocker.execute('BEGIN EXCLUSIVE')
+    try:
+        assert backend.update_deposit('alice', 'd1', {'quantity': 1}) is False
+        assert backend.delete_deposits('alice', ['d1']) == 0
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert backend.load_deposits('alice')[0]['quantity'] == 2
+    backend.close()
@@ -0,0 +1,45 @@
+# tests/test_stats_store.py
+
+import threading
+from src.config import ui_config
+from src.services import deposit_service, stats_store, storage
+from src.utils import date_utils
+
+
+def add(username, items, quantity=10, days=30):
+    message = deposit_service.add_many(username, items, quantity, ui_config.STORE_OPTIONS[0],
+                                       ui_config.REDEEM_METHODS[0], "輸入天數", None, days)[0]
+    assert message.startswith('✅'), message
+
+def recount(username):
+    return stats_store.count_deposits(storage.load_deposits(username), date_utils.today())
+
+
+def test_concurrent_redeems_keep_stats_consistent():
+    username = 'stats-concurrent'
+    add(username, ['拿鐵', '美式'], quantity=100)
+    deposit_id = storage.load_deposits(username)[0]['id']
+    stats_store.stats.get(username)
+
+    def redeem():
+        for _ in range(10):
+            assert deposit_service.redeem_one(username, deposit_id)[0].startswith('✅')
+    threads = [threading.Thread(target=redeem) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = stats_store.stats.get(username)
+    assert stats['cups'] == 100
+    assert stats['revision'] == storage.deposit_revision(username)
+    assert {k: v for k, v in stats.items() if k != 'revision'} == recount(username)
+
+
+def test_stats_follow_writes_that_bypass_the_aggregate():
+    username = 'stats-external'
+    add(username, ['拿鐵', '美式'])
+    assert stats_store.stats.get(username)['records'] == 2
+    # 不經過 mutation() 的寫入（例如匯入、其他行程）只改變修訂號
+    storage.delete_deposits(username, [storage.load_deposits(username)[0]['id']])
+    assert stats_store.stats.get(username)['records'] == 1
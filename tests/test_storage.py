@@ -0,0 +1,34 @@
+# tests/test_storage.py
+
+import threading
+from src.services import storage
+
+
+def test_concurrent_mutations_retry_instead_of_losing_updates():
+    username = 'storage-counter'
+    storage.save_deposits(username, [{'id': 'd1', 'item': '拿鐵', 'quantity': 0, 'store': '7-11',
+                                      'redeemMethod': 'App', 'expiryDate': '2030-01-01', 'createdAt': None}])
+    revision = storage.deposit_revision(username)
+    committed, results = [], []
+
+    def increment(deposits):
+        # 以快照算出的絕對值寫回；衝突時會重新讀取再算一次
+        quantity = deposits[0]['quantity'] + 1
+        return [{'op': 'update', 'id': 'd1', 'changes': {'quantity': quantity}}], quantity
+
+    def worker():
+        for _ in range(5):
+            ok, _ = storage.mutate_deposits(username, increment, retries=200, on_commit=committed.append)
+            results.append(ok)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [True] * 30
+    assert storage.load_deposits(username)[0]['quantity'] == 30
+    assert storage.deposit_revision(username) == revision + 30
+    # 每次提交所依據的修訂號都不同
+    assert sorted(committed) == list(range(revision, revision + 30))
@@ -0,0 +1,123 @@
+# tests/test_transfer.py
+
+import json
+import os
+import threading
+import pytest
+from src.services import storage, transfer
+from src.services.backends import JsonBackend, SQLiteBackend
+from src.services.backends.formats import encode_deposits
+
+RECORDS = [
+    {'id': f'01JTEST{i:019d}', 'item': f'拿鐵 {i}', 'quantity': 2, 'store': '7-11', 'redeemMethod': 'App',
+     'expiryDate': '2030-01-01', 'createdAt': '2025-01-01T00:00:00'}
+    for i in range(4)
+]
+
+def json_backend(tmp_path, **kwargs):
+    return JsonBackend(str(tmp_path / 'users.json'), str(tmp_path / 'sessions.json'),
+                       str(tmp_path / 'user_records'), threading.Lock(), **kwargs)
+
+BACKENDS = {
+    'json': lambda tmp_path: json_backend(tmp_path),
+    'json-journal': lambda tmp_path: json_backend(tmp_path, journal_threshold=64 * 1024),
+    'sqlite': lambda tmp_path: SQLiteBackend(str(tmp_path / 'coffee.db')),
+}
+
+
+@pytest.mark.parametrize('fmt', transfer.FORMATS)
+@pytest.mark.parametrize('name', sorted(BACKENDS))
+def test_export_then_import_twice_does_not_duplicate(tmp_path, name, fmt):
+    backend = BACKENDS[name](tmp_path)
+    assert backend.add_deposits('alice', RECORDS)
+    path = tmp_path / f'export.{fmt}'
+    path.write_text(''.join(transfer.iter_export(backend.load_deposits('alice'), fmt)), encoding='utf-8')
+
+    for _ in range(2):
+        for frame in transfer.read_chunks(str(path), fmt):
+            records, errors = transfer.normalize_chunk(frame, '2025-01-01T00:00:00')
+            assert not errors
+            assert backend.add_deposits('alice', records)
+
+    deposits = backend.load_deposits('alice')
+    assert sorted(d['id'] for d in deposits) == [r['id'] for r in RECORDS]
+    backend.close()
+
+
+@pytest.mark.parametrize('text', [
+    lambda records: json.dumps(records, ensure_ascii=False),
+    lambda records: encode_deposits(records),
+], ids=['array', 'deposit-file'])
+def test_import_reads_json_arrays_and_deposit_files(tmp_path, text):
+    path = tmp_path / 'records.json'
+    path.write_text(text(RECORDS), encoding='utf-8')
+    assert transfer.detect_format(str(path)) == transfer.FORMAT_JSON
+
+    imported = []
+    for frame in transfer.read_chunks(str(path), chunk_size=3):
+        records, errors = transfer.normalize_chunk(frame, '2025-01-01T00:00:00')
+        assert not errors
+        imported.extend(records)
+    assert imported == RECORDS
+
+
+def test_export_files_are_pruned(monkeypatch):
+    first = transfer.export_to_file(transfer.iter_export(RECORDS), prefix='old')
+    monkeypatch.setattr(transfer.settings, 'EXPORT_FILE_TTL_MINUTES', -1)
+    second = transfer.export_to_file(transfer.iter_export(RECORDS), prefix='new')
+    assert os.path.dirname(first) == os.path.dirname(second)
+    assert not os.path.exists(first)
+
+
+def test_import_renumbers_duplicate_and_existing_ids(tmp_path):
+    storage.save_deposits('import-dup', [RECORDS[0]])
+    path = tmp_path / 'records.json'
+    # RECORDS[0] 已存在，RECORDS[1] 在檔案中出現兩次
+    path.write_text(json.dumps([RECORDS[0], RECORDS[1], {**RECORDS[1], 'item': '美式'}], ensure_ascii=False),
+                    encoding='utf-8')
+
+    message, count = transfer.import_deposits('import-dup', str(path))
+    assert count == 3
+    assert '已匯入 3 筆' in message
+    deposits = storage.load_deposits('import-dup')
+    assert len(deposits) == 4
+    assert len({d['id'] for d in deposits}) == 4
+    assert sorted(d['item'] for d in deposits) == sorted(['拿鐵 0', '拿鐵 0', '拿鐵 1', '美式'])
+    assert {d['id'] for d in deposits} >= {RECORDS[0]['id'], RECORDS[1]['id']}
+
+
+@pytest.mark.parametrize('fmt', transfer.FORMATS)
+def test_chunked_export_file_round_trip(fmt):
+    records = [{**record, 'id': f'01JCHUNK{i:018d}', 'quantity': i + 1} for i, record in enumerate(RECORDS * 2)]
+    path = transfer.export_to_file(transfer.iter_export(records, fmt, chunk_size=3), fmt)
+    if fmt == transfer.FORMAT_CSV:
+        with open(path, encoding='utf-8-sig') as f:
+            assert f.read().count('expiryDate') == 1  # 只有第一塊輸出標題列
+
+    imported = []
+    for frame in transfer.read_chunks(path, chunk_size=3):
+        chunk, errors = transfer.normalize_chunk(frame, '2025-01-01T00:00:00')
+        assert not errors
+        imported.extend(chunk)
+    assert imported == records
+
+
+def test_invalid_rows_are_reported_with_file_row_numbers(tmp_path):
+    rows = [RECORDS[0], {**RECORDS[1], 'quantity': 0}, RECORDS[2], {**RECORDS[3], 'expiryDate': '2030/01/01'}]
+    path = tmp_path / 'records.csv'
+    path.write_text(''.join(transfer.iter_export(rows)), encoding='utf-8')
+
+    errors = []
+    for frame in transfer.read_chunks(str(path), chunk_size=2):
+        errors.extend(transfer.normalize_chunk(frame, '2025-01-01T00:00:00')[1])
+    assert errors == [(2, '數量錯誤'), (4, '日期格式錯誤')]
+
+
+def test_only_expired_export_files_are_pruned(monkeypatch):
+    monkeypatch.setattr(transfer.settings, 'EXPORT_FILE_TTL_MINUTES', 60)
+    first = transfer.export_to_file(transfer.iter_export(RECORDS), prefix='keep')
+    os.utime(first, (0, 0))
+    recent = transfer.export_to_file(transfer.iter_export(RECORDS), prefix='keep')
+    second = transfer.export_to_file(transfer.iter_export(RECORDS), prefix='keep')
+    assert not os.path.exists(first)
+    assert os.path.exists(recent) and os.path.exists(second)
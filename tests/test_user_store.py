@@ -0,0 +1,58 @@
+# tests/test_user_store.py
+
+import os
+import threading
+from src.services.backends import JsonBackend
+from src.services.user_store import UserRepository
+
+
+def make_backend(tmp_path):
+    return JsonBackend(str(tmp_path / 'users.json'), str(tmp_path / 'sessions.json'),
+                       str(tmp_path / 'user_records'), threading.Lock(),
+                       users_dir=str(tmp_path / 'users'), user_shards=16)
+
+def make_repository(backend, load_all_fn=None):
+    return UserRepository(load_all_fn or backend.load_users, backend.get_user, backend.add_user)
+
+
+def test_accounts_added_while_the_index_builds_are_kept(tmp_path):
+    backend = make_backend(tmp_path)
+    assert backend.add_user('alice', {'password': 'a'})
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_load_all():
+        users = backend.load_users()
+        loading.set()
+        release.wait(5)
+        return users
+
+    repository = make_repository(backend, slow_load_all).start()
+    assert loading.wait(5)
+    # 索引建立前的查詢與新增只經過單一分片
+    assert not repository.is_ready()
+    assert repository.get('alice') == {'password': 'a'}
+    assert repository.add('bob', {'password': 'b'})
+    assert not repository.add('alice', {'password': 'x'})
+    release.set()
+    repository._thread.join(5)
+
+    assert repository.is_ready()
+    assert len(repository) == 2
+    assert repository.get('bob') == {'password': 'b'}
+
+
+def test_index_rebuilds_from_shards_after_restart(tmp_path):
+    backend = make_backend(tmp_path)
+    repository = make_repository(backend)
+    repository.build_index()
+    for i in range(40):
+        assert repository.add(f'user{i}', {'password': str(i)})
+
+    # 每個帳號只寫進自己的分片，沒有集中的 users.json
+    assert not os.path.exists(tmp_path / 'users.json')
+    assert 1 < len(os.listdir(tmp_path / 'users')) <= 16
+    restarted = make_repository(make_backend(tmp_path))
+    restarted.build_index()
+    assert len(restarted) == 40
+    assert all(restarted.get(f'user{i}') == {'password': str(i)} for i in range(40))
+    assert restarted.get('nobody') is None
@@ -0,0 +1,86 @@
+# tests/test_view_model.py
+
+from datetime import datetime, timedelta, timezone
+import gradio as gr
+from src.config import ui_config
+from src.services import deposit_query, deposit_service, stats_store, storage
+from src.services.backends.journal import append_op
+from src.ui import components, view_model
+from src.utils import date_utils
+
+
+def test_etag_changes_when_data_changes_outside_this_process():
+    username = 'view-external'
+    deposit_service.add_many(username, ['拿鐵', '美式'], 2, ui_config.STORE_OPTIONS[0],
+                             ui_config.REDEEM_METHODS[0], "輸入天數", None, 30)
+    first = view_model.build_view(username)
+    assert view_model.build_view(username, known_etag=first.etag).etag == first.etag
+
+    # 模擬同步下載或其他行程直接改動資料檔
+    deposit_id = storage.load_deposits(username)[0]['id']
+    if storage.backend.name == 'json' and storage.backend.compactor is not None:
+        append_op(storage.backend.get_journal_file(username), {'op': 'delete', 'ids': [deposit_id]})
+    else:
+        storage.backend.delete_deposits(username, [deposit_id])
+    second = view_model.build_view(username, known_etag=first.etag)
+    assert second.etag != first.etag
+    assert second.deposits_html != first.deposits_html
+
+
+def test_statistics_come_from_the_aggregate_until_it_falls_behind(monkeypatch):
+    username = 'view-stats'
+    deposit_service.add_many(username, ['拿鐵', '美式'], 2, ui_config.STORE_OPTIONS[0],
+                             ui_config.REDEEM_METHODS[0], "輸入天數", None, 30)
+    first = view_model.build_view(username)
+    deposit_id = storage.load_deposits(username)[0]['id']
+    assert deposit_service.redeem_one(username, deposit_id)[0].startswith('✅')
+
+    # 兌換以增量更新彙總，畫面直接使用彙總，不重新計數
+    calls = []
+    summarize = stats_store.summarize
+    monkeypatch.setattr(stats_store, 'summarize', lambda *args: calls.append(args) or summarize(*args))
+    second = view_model.build_view(username, known_etag=first.etag)
+    assert calls == []
+    assert second.statistics_html == components.render_statistics(
+        stats_store.count_deposits(storage.load_deposits(username), date_utils.today()))
+
+    # 不經過彙總的寫入讓修訂號超前，以這次讀取的快照重新計數
+    calls.clear()
+    storage.delete_deposits(username, [deposit_id])
+    third = view_model.build_view(username, known_etag=second.etag)
+    assert len(calls) == 1
+    assert third.statistics_html == components.render_statistics(
+        stats_store.count_deposits(storage.load_deposits(username), date_utils.today()))
+
+
+def test_unchanged_outputs_are_skipped(monkeypatch):
+    username = 'view-skip'
+    deposit_service.add_many(username, [f'拿鐵 {i}' for i in range(3)], 2, ui_config.STORE_OPTIONS[0],
+                             ui_config.REDEEM_METHODS[0], "輸入天數", None, 30)
+    first_page = deposit_query.make_query(page_size=2, page=1)
+    first = view_model.build_view(username, first_page)
+
+    # 版本相同時不讀取資料，所有輸出都不更新
+    def unexpected(*args):
+        raise AssertionError("不應重新查詢")
+    monkeypatch.setattr(view_model, 'query_deposits', unexpected)
+    same = view_model.build_view(username, first_page, known_etag=first.etag)
+    assert same.etag == first.etag
+    assert all(output == gr.update() for output in same[:5])
+    monkeypatch.undo()
+
+    # 只換頁：列表重新產生，統計不變
+    second = view_model.build_view(username, first_page._replace(page=2), known_etag=first.etag)
+    assert second.etag['stats'] == first.etag['stats']
+    assert second.statistics_html == gr.update()
+    assert second.deposits_html != gr.update() and second.page == 2
+
+    # 換日：統計也要重新產生
+    tomorrow = datetime.combine(date_utils.today() + timedelta(days=1), datetime.min.time(), timezone.utc)
+    clock = date_utils.set_clock(date_utils.DayClock(timezone.utc, now_fn=lambda: tomorrow))
+    try:
+        third = view_model.build_view(username, first_page._replace(page=2), known_etag=second.etag)
+    finally:
+        date_utils.set_clock(clock)
+    assert third.etag['stats'] != second.etag['stats']
+    assert third.statistics_html != gr.update()